@@ -7,4 +7,5 @@ setup(
     author="Alexander Ershov",
     packages=find_packages("src"),
     package_dir={"": "src"},
+    entry_points={"console_scripts": ["raytracer=raytracer.main:main"]},
 )
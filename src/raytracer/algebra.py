@@ -1,43 +1,69 @@
 import math
-from dataclasses import dataclass
 from typing import List
+from typing import Tuple
 
+import numpy as np
 
-def solve_quadratic(a, b, c) -> List[float]:
-    solver = _QuadraticSolver(a, b, c)
-    return solver.solve()
+# same as default relative tolerance of `math.isclose`
+_DUPLICATE_ROOTS_TOLERANCE = 1e-9
 
 
-@dataclass(frozen=True)
-class _QuadraticSolver:
-    a: float
-    b: float
-    c: float
+def solve_quadratic(a, b, c) -> List[float]:
+    # roots of ax^2 + bx + c = 0 in ascending order, close roots are merged
+    if a == 0:
+        return _solve_linear(b, c)
+    d = b**2 - 4 * a * c
+    if d < 0:
+        return []
+    # textbook formula subtracts close numbers when b^2 >> 4ac (far away spheres),
+    # so the root that is closer to zero is found as c / q instead
+    q = -(b + math.copysign(math.sqrt(d), b)) / 2
+    if q == 0:
+        return [0.0]
+    roots = sorted([q / a, c / q])
+    return _exclude_duplicates(roots)
 
-    def solve(self) -> List[float]:
-        if self.a == 0:
-            return self._solve_linear()
-        if self._get_discriminant() < 0:
-            return []
-        roots = [self._get_root(sign) for sign in [-1, 1]]
-        return _exclude_duplicates(roots)
 
-    def _solve_linear(self) -> List[float]:
-        assert self.a == 0
-        if self.b == 0:
-            raise ValueError(f"`{self.b}x + {self.c} = 0` is not a valid equation")
-        return [-self.c / self.b]
+def solve_quadratics(
+    a: np.ndarray, b: np.ndarray, c: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    # batched version of `solve_quadratic`, returns (N, 2) roots in ascending order
+    # and (N, 2) mask of valid roots, invalid roots are nan,
+    # equations without solutions (a == b == 0) have no valid roots instead of error
+    a, b, c = np.broadcast_arrays(*map(np.asarray, (a, b, c)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = b**2 - 4 * a * c
+        q = -(b + np.copysign(np.sqrt(d), b)) / 2
+        first = q / a
+        second = np.where(q == 0, 0.0, c / q)
+        quadratic = np.stack(
+            [np.minimum(first, second), np.maximum(first, second)], axis=-1
+        )
+        linear = np.stack([-c / b, np.full(b.shape, np.nan)], axis=-1)
+    roots = np.where((a == 0)[..., np.newaxis], linear, quadratic)
+    roots[..., 1] = np.where(
+        _are_close(roots[..., 0], roots[..., 1]), np.nan, roots[..., 1]
+    )
+    valid = np.isfinite(roots)
+    roots[~valid] = np.nan
+    return roots, valid
 
-    def _get_discriminant(self) -> float:
-        return self.b ** 2 - 4 * self.a * self.c
 
-    def _get_root(self, sign: float) -> float:
-        d = self._get_discriminant()
-        return (-self.b + sign * math.sqrt(d)) / (2 * self.a)
+def _solve_linear(b, c) -> List[float]:
+    if b == 0:
+        raise ValueError(f"`{b}x + {c} = 0` is not a valid equation")
+    return [-c / b]
 
 
 def _exclude_duplicates(roots: List[float]) -> List[float]:
     assert len(roots) == 2
-    if math.isclose(roots[0], roots[1]):
+    if math.isclose(roots[0], roots[1], rel_tol=_DUPLICATE_ROOTS_TOLERANCE):
         return [roots[0]]
     return roots
+
+
+def _are_close(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # batched version of `math.isclose`
+    return np.abs(a - b) <= _DUPLICATE_ROOTS_TOLERANCE * np.maximum(
+        np.abs(a), np.abs(b)
+    )
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+import numpy as np
+
+from raytracer import geometry
+from raytracer.image import Image
+
+# reprojected pixels whose color differs from the traced one by more than
+# this in any rgb component are counted as mismatches
+MISMATCH_THRESHOLD = 8
+# frame is traced from scratch when the validation sample has more mismatches
+MAX_MISMATCH_SHARE = 0.05
+
+
+@dataclass(frozen=True)
+class Frame:
+    # frame of `Scene.render_animation`
+    index: int
+    camera: geometry.Point
+    image: Image
+    # pixels that were traced instead of reprojected from the previous frame
+    num_traced_pixels: int
+
+
+def linear_path(
+    start: geometry.Point, end: geometry.Point, num_frames: int
+) -> List[geometry.Point]:
+    # camera positions from start to end inclusive, evenly spaced
+    return list(np.linspace(start, end, num_frames))
+
+
+def reproject(
+    points: np.ndarray,
+    colors: np.ndarray,
+    body_indices: np.ndarray,
+    camera: geometry.Point,
+    width: int,
+    height: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (N, 3) hit points of the previous frame (nan if there's none), their
+    # (N, 3) colors & (N,) body indices are moved to the pixels that see them
+    # from the new camera, returns (height * width, ...) colors, body indices
+    # & points, pixels that got nothing (disoccluded) have -1 body index,
+    # pixels that got many points keep the closest one
+    num_pixels = width * height
+    new_colors = np.zeros((num_pixels, 3), dtype=np.uint8)
+    new_body_indices = np.full(num_pixels, -1)
+    new_points = np.full((num_pixels, 3), np.nan)
+    hit = np.isfinite(points).all(axis=1)
+    points, colors, body_indices = points[hit], colors[hit], body_indices[hit]
+    offsets = points - camera
+    # pixel (x, y) is the point (x, y, 0), so the point is seen through the pixel
+    # where its ray from the camera crosses z == 0 plane
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ts = -camera[2] / offsets[:, 2]
+    screen = camera[:2] + offsets[:, :2] * ts[:, np.newaxis]
+    visible = np.isfinite(screen).all(axis=1) & (ts > 0)
+    xs = np.rint(np.where(visible, screen[:, 0], -1)).astype(np.int64)
+    ys = np.rint(np.where(visible, screen[:, 1], -1)).astype(np.int64)
+    visible &= (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    pixels = (ys * width + xs)[visible]
+    distances = geometry.norm(offsets[visible])
+    # closest point is the first one of its pixel after sorting
+    order = np.lexsort((distances, pixels))
+    _, first = np.unique(pixels[order], return_index=True)
+    chosen = np.flatnonzero(visible)[order[first]]
+    targets = pixels[order[first]]
+    new_colors[targets] = colors[chosen]
+    new_body_indices[targets] = body_indices[chosen]
+    new_points[targets] = points[chosen]
+    return new_colors, new_body_indices, new_points
+
+
+def get_frame_path(output: str, index: int) -> str:
+    # fly.png -> fly_0000.png
+    root, ext = os.path.splitext(output)
+    return f"{root}_{index:04d}{ext}"
+
+
+def save_frames(frames: Iterable[Frame], output: str) -> Iterator[str]:
+    # every frame is saved as soon as it's rendered, yields saved paths
+    for frame in frames:
+        path = get_frame_path(output, frame.index)
+        frame.image.save(path)
+        yield path
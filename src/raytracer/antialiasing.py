@@ -0,0 +1,47 @@
+import math
+
+import numpy as np
+
+# pixels with smaller difference in any rgb component aren't considered an edge,
+# so smooth shading gradients aren't supersampled
+COLOR_THRESHOLD = 8
+
+
+def find_edges(colors: np.ndarray, body_indices: np.ndarray) -> np.ndarray:
+    # colors is (height, width, 3) array of rgb, body_indices is (height, width)
+    # array of hit bodies, returns (height, width) mask of pixels that differ
+    # from any of their 4 neighbours
+    colors = np.pad(colors.astype(int), ((1, 1), (1, 1), (0, 0)), mode="edge")
+    body_indices = np.pad(body_indices, 1, mode="edge")
+    center = (slice(1, -1), slice(1, -1))
+    edges = np.zeros(body_indices[center].shape, dtype=bool)
+    for neighbour in [
+        (slice(None, -2), slice(1, -1)),
+        (slice(2, None), slice(1, -1)),
+        (slice(1, -1), slice(None, -2)),
+        (slice(1, -1), slice(2, None)),
+    ]:
+        edges |= body_indices[center] != body_indices[neighbour]
+        color_diff = np.abs(colors[center] - colors[neighbour]).max(axis=2)
+        edges |= color_diff > COLOR_THRESHOLD
+    return edges
+
+
+def check_samples(samples: int) -> None:
+    # subpixels are a regular n x n grid, so other counts can't be traced exactly
+    if samples < 1 or math.isqrt(samples) ** 2 != samples:
+        raise ValueError(f"samples should be a square number, got {samples}")
+
+
+def get_subpixel_offsets(samples: int) -> np.ndarray:
+    # (samples, 2) array of xy offsets of a regular grid inside the pixel
+    check_samples(samples)
+    n = math.isqrt(samples)
+    steps = (np.arange(n) + 0.5) / n - 0.5
+    xs, ys = np.meshgrid(steps, steps)
+    return np.stack([xs.ravel(), ys.ravel()], axis=1)
+
+
+def average(colors: np.ndarray) -> np.ndarray:
+    # (N, M, 3) rgb of M samples per pixel -> (N, 3) uint8 rgb
+    return np.round(colors.mean(axis=1)).astype(np.uint8)
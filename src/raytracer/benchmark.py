@@ -0,0 +1,408 @@
+import argparse
+import dataclasses
+import json
+import os
+import sys
+import time
+import timeit
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import numpy as np
+
+from raytracer import algebra
+from raytracer import animation
+from raytracer import fastpath
+from raytracer import geometry
+from raytracer import main as raytracer_main
+from raytracer import material
+from raytracer import performance
+from raytracer import scene
+from raytracer.color import Color
+from raytracer.color import Palette
+from raytracer.fastpath import Vec3
+
+# results are flat {metric: value} dicts, metrics with these suffixes are
+# better when higher, all the others (durations) are better when lower
+_HIGHER_IS_BETTER_SUFFIXES = ("_per_sec", "_efficiency")
+_MICRO_REPEAT = 5
+_RESOLUTIONS = [(150, 100), (300, 200)]
+_BODY_COUNTS = [10, 100, 1_000]
+_SYNTHETIC_RESOLUTION = (150, 100)
+_BVH_BODY_COUNTS = [10, 1_000, 100_000]
+_MICRO_BATCH_SIZE = 1024
+_ANIMATION_FRAMES = 6
+# slow camera move, so most pixels are reprojected
+_ANIMATION_STEP = (1, 0.5, 1)
+_RELIGHT_FRAMES = 6
+_RELIGHT_STEP = (50, -50, 0)
+
+
+def benchmark_micro() -> Dict[str, float]:
+    # nanoseconds per call of the hot scalar functions
+    # ray from the main scene camera to the center of its mirror sphere
+    sphere = geometry.Sphere(geometry.make_point(200, 150, 500), 50)
+    ray = geometry.make_ray(geometry.make_point(150, 100, -300), sphere.center)
+    plane = geometry.make_plane(0, 0, 1, -2000)
+    [point, _] = sphere.intersections(ray)
+    checkered = material.Checkered(
+        square_width=80,
+        lighter=Palette.WHITE,
+        darker=Palette.BLACK,
+        projection=material.Checkered.project_to_local_xy,
+    )
+    color = Color(15, 171, 18)
+    fast_sphere = fastpath.from_shape(sphere)
+    fast_plane = fastpath.from_shape(plane)
+    fast_ray = fastpath.make_ray(Vec3.from_point(ray.point), fast_sphere.center)
+    [fast_point, _] = fast_sphere.intersections(fast_ray)
+    # the same reflection for many rays at once, as the wavefront engine does
+    ray_points = np.tile(ray.point, (_MICRO_BATCH_SIZE, 1))
+    hits = np.tile(point, (_MICRO_BATCH_SIZE, 1))
+    functions = {
+        "plane.intersections": lambda: plane.intersections(ray),
+        "sphere.intersections": lambda: sphere.intersections(ray),
+        "algebra.solve_quadratic": lambda: algebra.solve_quadratic(1, -3, 2),
+        "geometry.reflect": lambda: geometry.reflect(ray, point, sphere),
+        f"geometry.reflections.{_MICRO_BATCH_SIZE}_rays": lambda: geometry.reflections(
+            ray_points, hits, sphere
+        ),
+        "checkered.get_color": lambda: checkered.get_color(point),
+        "color.mul": lambda: color * 0.7,
+        "fast.plane.intersections": lambda: fast_plane.intersections(fast_ray),
+        "fast.sphere.intersections": lambda: fast_sphere.intersections(fast_ray),
+        "fast.reflect": lambda: fastpath.reflect(fast_ray, fast_point, fast_sphere),
+    }
+    return {
+        f"micro.{name}_ns": _measure_call(fn) * 1e9 for name, fn in functions.items()
+    }
+
+
+def benchmark_render(
+    name: str,
+    s: scene.Scene,
+    engine: scene.Engine,
+    num_processes: int,
+    samples: int = 1,
+    repeat: int = 1,
+) -> Dict[str, float]:
+    # first render warms up the pool, builds the acceleration structures and
+    # counts rays of all kinds, the best of the next renders is reported
+    prefix = f"render.{name}.{s.width}x{s.height}.{engine.value}"
+    if samples > 1:
+        prefix += f".{samples}_samples"
+    if num_processes > 1:
+        prefix += f".{num_processes}_workers"
+    with performance.RenderPool(num_processes) as pool:
+        stats = performance.Stats()
+        s._render(engine, None, None, pool, samples, stats)
+        num_rays = stats.primary_rays + stats.reflection_rays + stats.shadow_rays
+        duration = min(
+            _measure(lambda: s._render(engine, None, None, pool, samples))
+            for _ in range(repeat)
+        )
+    return {
+        f"{prefix}.duration_s": duration,
+        f"{prefix}.pixels_per_sec": s.width * s.height / duration,
+        f"{prefix}.rays_per_sec": num_rays / duration,
+    }
+
+
+def benchmark_renders(engine: scene.Engine, repeat: int = 1) -> Dict[str, float]:
+    # main scene at several resolutions and synthetic scenes with more and more bodies
+    results = {}
+    main_scene = raytracer_main.make_scene()
+    for width, height in _RESOLUTIONS:
+        s = dataclasses.replace(main_scene, width=width, height=height)
+        results.update(benchmark_render("main", s, engine, 1, repeat=repeat))
+    s = dataclasses.replace(
+        main_scene, width=_RESOLUTIONS[0][0], height=_RESOLUTIONS[0][1]
+    )
+    results.update(benchmark_render("main", s, engine, 1, samples=4, repeat=repeat))
+    width, height = _SYNTHETIC_RESOLUTION
+    for num_spheres in _BODY_COUNTS:
+        s = make_spheres_scene(num_spheres, width, height)
+        results.update(
+            benchmark_render(f"spheres_{num_spheres}", s, engine, 1, repeat=repeat)
+        )
+    return results
+
+
+def benchmark_scaling(
+    engine: scene.Engine, worker_counts: List[int], repeat: int = 1
+) -> Dict[str, float]:
+    # efficiency is speedup over a single worker divided by the number of workers
+    s = raytracer_main.make_scene()
+    results = {}
+    durations = {}
+    for num_processes in sorted(set([1] + worker_counts)):
+        render = benchmark_render("main", s, engine, num_processes, repeat=repeat)
+        results.update(render)
+        [durations[num_processes]] = [
+            value for name, value in render.items() if name.endswith(".duration_s")
+        ]
+    for num_processes, duration in durations.items():
+        efficiency = durations[1] / (duration * num_processes)
+        results[f"scaling.main.{engine.value}.{num_processes}_workers_efficiency"] = (
+            efficiency
+        )
+    return results
+
+
+def benchmark_animation(engine: scene.Engine) -> Dict[str, float]:
+    # camera path rendered with reprojection vs independent renders of every frame
+    width, height = _RESOLUTIONS[0]
+    s = dataclasses.replace(raytracer_main.make_scene(), width=width, height=height)
+    end = s.camera + np.array(_ANIMATION_STEP) * (_ANIMATION_FRAMES - 1)
+    cameras = animation.linear_path(s.camera, end, _ANIMATION_FRAMES)
+    prefix = f"animation.main.{width}x{height}.{engine.value}"
+    with performance.RenderPool(1) as pool:
+        frames = []
+        reprojected = _measure(
+            lambda: frames.extend(s.render_animation(cameras, engine, pool=pool))
+        )
+        independent = _measure(
+            lambda: [
+                dataclasses.replace(s, camera=camera)._render(
+                    engine, None, None, pool, 1
+                )
+                for camera in cameras
+            ]
+        )
+    num_traced_pixels = sum(frame.num_traced_pixels for frame in frames)
+    return {
+        f"{prefix}.reprojected_frames_per_sec": _ANIMATION_FRAMES / reprojected,
+        f"{prefix}.independent_frames_per_sec": _ANIMATION_FRAMES / independent,
+        f"{prefix}.traced_pixels_share": num_traced_pixels
+        / (_ANIMATION_FRAMES * width * height),
+    }
+
+
+def benchmark_relight(engine: scene.Engine) -> Dict[str, float]:
+    # light moved along a path, relit from the g-buffer vs rendered from scratch
+    width, height = _RESOLUTIONS[0]
+    s = dataclasses.replace(raytracer_main.make_scene(), width=width, height=height)
+    scenes = [
+        dataclasses.replace(s, lights=[s.lights[0] + np.array(_RELIGHT_STEP) * i])
+        for i in range(_RELIGHT_FRAMES)
+    ]
+    prefix = f"relight.main.{width}x{height}.{engine.value}"
+    with performance.RenderPool(1) as pool:
+        gbuffers = []
+        gbuffer = _measure(lambda: gbuffers.append(s.render_gbuffer(pool=pool)))
+        relit = _measure(lambda: [lit.relight(gbuffers[0]) for lit in scenes])
+        rendered = _measure(
+            lambda: [lit._render(engine, None, None, pool, 1) for lit in scenes]
+        )
+    return {
+        f"{prefix}.gbuffer_duration_s": gbuffer,
+        f"{prefix}.relit_frames_per_sec": _RELIGHT_FRAMES / relit,
+        f"{prefix}.rendered_frames_per_sec": _RELIGHT_FRAMES / rendered,
+    }
+
+
+def find_regressions(
+    results: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> List[str]:
+    # metrics that got worse than baseline by more than threshold (0.1 is 10%)
+    regressions = []
+    for name, value in sorted(results.items()):
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        change = (value - expected) / expected
+        if name.endswith(_HIGHER_IS_BETTER_SUFFIXES):
+            change = -change
+        if change > threshold:
+            regressions.append(
+                f"{name}: {expected:.4g} -> {value:.4g} ({change:.0%} worse)"
+            )
+    return regressions
+
+
+def append_to_history(path: str, results: Dict[str, float]) -> None:
+    # history is a json list of runs, the latest run is the last one
+    history = _load_json(path, default=[])
+    history.append({"timestamp": time.time(), "results": results})
+    _save_json(path, history)
+
+
+def benchmark_bvh(num_spheres: int, num_rays: int = 1000) -> Dict[str, float]:
+    s = make_spheres_scene(num_spheres)
+    rng = np.random.default_rng(0)
+    targets = rng.uniform(-1000, 1000, size=(num_rays, 3)) + (0, 0, 2000)
+    rays = [geometry.make_ray(s.camera, target) for target in targets]
+    lights = [geometry.make_line_segment(s.camera, target) for target in targets]
+    directions = targets - s.camera
+    points = np.broadcast_to(s.camera, directions.shape)
+
+    build = _measure(lambda: s._bvh)
+    closest = _measure(lambda: [s._get_closest_point_on_body(r, set()) for r in rays])
+    any_hit = _measure(
+        lambda: [s._in_the_shadow(l.point, l.point + l.direction) for l in lights]
+    )
+    batch_closest = _measure(lambda: s._get_closest_hits(points, directions))
+    prefix = f"bvh.spheres_{num_spheres}"
+    return {
+        f"{prefix}.build_s": build,
+        f"{prefix}.closest_hit_us_per_ray": closest / num_rays * 1e6,
+        f"{prefix}.any_hit_us_per_ray": any_hit / num_rays * 1e6,
+        f"{prefix}.batch_closest_hit_us_per_ray": batch_closest / num_rays * 1e6,
+    }
+
+
+def compare_shadows(engine: scene.Engine = scene.Engine.BATCH) -> Dict[str, float]:
+    # how far shadow map mode is from exact shadows on the main scene
+    exact_scene = raytracer_main.make_scene()
+    map_scene = dataclasses.replace(exact_scene, shadows=scene.Shadows.MAP)
+    exact = _to_array(exact_scene.render(engine=engine))
+    approximate = _to_array(map_scene.render(engine=engine))
+    different = (exact != approximate).any(axis=2)
+    prefix = f"shadows.main.{engine.value}"
+    return {
+        f"{prefix}.different_pixels": int(different.sum()),
+        f"{prefix}.different_pixels_share": float(different.mean()),
+        f"{prefix}.mean_abs_rgb_diff": float(np.abs(exact - approximate).mean()),
+        f"{prefix}.max_abs_rgb_diff": int(np.abs(exact - approximate).max()),
+    }
+
+
+def make_spheres_scene(
+    num_spheres: int, width: int = 300, height: int = 200
+) -> scene.Scene:
+    rng = np.random.default_rng(num_spheres)
+    centers = rng.uniform(-1000, 1000, size=(num_spheres, 3)) + (0, 0, 2000)
+    radii = rng.uniform(1, 1000 / max(1.0, num_spheres ** (1 / 3)), size=num_spheres)
+    gray = material.Monochrome(Palette.GRAY)
+    bodies = [
+        scene.Body(geometry.Sphere(center, radius), gray)
+        for center, radius in zip(centers, radii)
+    ]
+    floor = scene.Body(geometry.make_plane(0, 1, 0, 1000), gray)
+    return scene.Scene(
+        bodies=[floor] + bodies,
+        camera=geometry.make_point(0, 0, -300),
+        lights=[geometry.make_point(0, 2000, 0)],
+        width=width,
+        height=height,
+    )
+
+
+def _to_array(image) -> np.ndarray:
+    return image.to_array().astype(int)
+
+
+def _measure(fn: Callable) -> float:
+    started_at = time.perf_counter()
+    fn()
+    return time.perf_counter() - started_at
+
+
+def _measure_call(fn: Callable) -> float:
+    # best seconds per call, number of calls is picked so one run takes ~0.2s
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=_MICRO_REPEAT, number=number)) / number
+
+
+def _load_json(path: str, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_json(path: str, data) -> None:
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    engine = scene.Engine(args.engine)
+    results: Dict[str, float] = {}
+    if "micro" in args.suites:
+        results.update(benchmark_micro())
+    if "render" in args.suites:
+        results.update(benchmark_renders(engine, args.repeat))
+    if "scaling" in args.suites:
+        results.update(benchmark_scaling(engine, args.workers, args.repeat))
+    if "animation" in args.suites:
+        results.update(benchmark_animation(engine))
+    if "relight" in args.suites:
+        results.update(benchmark_relight(engine))
+    if "bvh" in args.suites:
+        for num_spheres in _BVH_BODY_COUNTS:
+            results.update(benchmark_bvh(num_spheres))
+    if "shadows" in args.suites:
+        results.update(compare_shadows(engine))
+    for name, value in sorted(results.items()):
+        print(f"{name}: {value:.4g}")
+    if args.history is not None:
+        append_to_history(args.history, results)
+    if args.save_baseline:
+        _save_json(args.baseline, results)
+        return 0
+    regressions = find_regressions(
+        results, _load_json(args.baseline, default={}), args.threshold
+    )
+    for regression in regressions:
+        print(f"regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="raytracer.benchmark")
+    parser.add_argument(
+        "--suites",
+        nargs="+",
+        choices=[
+            "micro",
+            "render",
+            "scaling",
+            "animation",
+            "relight",
+            "bvh",
+            "shadows",
+        ],
+        default=["micro", "render", "scaling"],
+    )
+    parser.add_argument(
+        "--engine",
+        choices=[engine.value for engine in scene.Engine],
+        default=scene.Engine.BATCH.value,
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=_get_default_worker_counts(),
+        help="worker counts for the scaling suite",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="renders per benchmark")
+    parser.add_argument(
+        "--history", default="benchmark_history.json", help="results are appended here"
+    )
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store results as new baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative change that is reported as regression",
+    )
+    return parser.parse_args(argv)
+
+
+def _get_default_worker_counts() -> List[int]:
+    # 1, 2, 4, ... up to the number of cpus
+    cpu_count = os.cpu_count() or 1
+    return [2**i for i in range(cpu_count.bit_length()) if 2**i <= cpu_count]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import functools
+import math
+from dataclasses import dataclass
+from typing import Callable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+
+Ks = Tuple[Optional[float], Optional[float]]
+# single line traversal accepts numpy points and tuples of floats
+Vector = Union[np.ndarray, Tuple[float, float, float]]
+
+_LEAF_SIZE = 4
+_PADDING = 1e-6
+
+
+def build(items: List[int], lows: np.ndarray, highs: np.ndarray) -> Bvh:
+    # builds bounding volume hierarchy over items with (N, 3) bounding boxes
+    builder = _Builder(items, lows, highs)
+    if len(lows):
+        builder.add_node(0, len(lows))
+    return Bvh(
+        lows=np.array(builder.lows).reshape(-1, 3),
+        highs=np.array(builder.highs).reshape(-1, 3),
+        children=np.array(builder.children, dtype=int).reshape(-1, 2),
+        items=builder.items,
+    )
+
+
+@dataclass(frozen=True)
+class Bvh:
+    # node 0 is the root, leaves have (-1, -1) children
+    lows: np.ndarray
+    highs: np.ndarray
+    children: np.ndarray
+    items: List[List[int]]
+
+    def __len__(self) -> int:
+        return sum(map(len, self.items))
+
+    def visit_closest(
+        self,
+        point: Vector,
+        direction: Vector,
+        ks: Ks,
+        visit: Callable[[int], float],
+    ) -> None:
+        # `visit` intersects the item and returns the distance from `point` to the
+        # closest intersection found so far, farther nodes are skipped
+        best = math.inf
+        point = _to_floats(point)
+        direction = _to_floats(direction)
+        scale = math.sqrt(sum(d * d for d in direction))
+        for node in self._iter_nodes(point, direction, ks, lambda: best / scale):
+            for item in self.items[node]:
+                best = min(best, visit(item))
+
+    def any_hit(
+        self,
+        point: Vector,
+        direction: Vector,
+        ks: Ks,
+        hit: Callable[[int], bool],
+    ) -> bool:
+        point = _to_floats(point)
+        direction = _to_floats(direction)
+        for node in self._iter_nodes(point, direction, ks, lambda: math.inf):
+            if any(hit(item) for item in self.items[node]):
+                return True
+        return False
+
+    def iter_leaves(
+        self,
+        points: np.ndarray,
+        directions: np.ndarray,
+        ks: Ks,
+        max_ks: Optional[np.ndarray] = None,
+    ) -> Iterator[Tuple[List[int], np.ndarray]]:
+        # batched traversal: yields leaf items & indices of lines that hit the leaf,
+        # caller can lower `max_ks` during iteration to skip farther nodes
+        if not len(self.items):
+            return
+        min_k, max_k = _get_k_range(ks)
+        if max_ks is None:
+            max_ks = np.full(len(points), max_k)
+        with np.errstate(divide="ignore"):
+            inv_directions = 1 / directions
+        stack = [(0, np.arange(len(points)))]
+        while stack:
+            node, lanes = stack.pop()
+            enter_ks, exit_ks = _get_enter_exit_ks(
+                self.lows[node], self.highs[node], points[lanes], inv_directions[lanes]
+            )
+            hit = (
+                (enter_ks <= exit_ks)
+                & (exit_ks >= min_k)
+                & (enter_ks <= np.minimum(max_ks[lanes], max_k))
+            )
+            lanes = lanes[hit]
+            if not len(lanes):
+                continue
+            left, right = self.children[node]
+            if left == -1:
+                yield self.items[node], lanes
+            else:
+                stack.append((right, lanes))
+                stack.append((left, lanes))
+
+    def _iter_nodes(
+        self,
+        point: tuple,
+        direction: tuple,
+        ks: Ks,
+        get_max_k: Callable[[], float],
+    ) -> Iterator[int]:
+        if not self.items:
+            return
+        min_k, max_k = _get_k_range(ks)
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            low, high, left, right = self._nodes[node]
+            k = _get_enter_k(low, high, point, direction, min_k, max_k)
+            if k is None or k > get_max_k():
+                continue
+            if left == -1:
+                yield node
+            else:
+                stack.append(right)
+                stack.append(left)
+
+    @functools.cached_property
+    def _nodes(self) -> List[Tuple[tuple, tuple, int, int]]:
+        # plain python floats are much faster than numpy for single line traversal
+        return list(
+            zip(
+                map(tuple, self.lows.tolist()),
+                map(tuple, self.highs.tolist()),
+                self.children[:, 0].tolist(),
+                self.children[:, 1].tolist(),
+            )
+        )
+
+
+class _Builder:
+    def __init__(self, items: List[int], lows: np.ndarray, highs: np.ndarray) -> None:
+        self._items = np.array(items, dtype=int)
+        scale = max(1.0, float(np.abs(np.concatenate([lows, highs])).max(initial=0)))
+        self._item_lows = lows - _PADDING * scale
+        self._item_highs = highs + _PADDING * scale
+        self._centers = (lows + highs) / 2
+        self._order = np.arange(len(lows))
+        self.lows: List[np.ndarray] = []
+        self.highs: List[np.ndarray] = []
+        self.children: List[Tuple[int, int]] = []
+        self.items: List[List[int]] = []
+
+    def add_node(self, start: int, end: int) -> int:
+        node = len(self.items)
+        indices = self._order[start:end]
+        self.lows.append(self._item_lows[indices].min(axis=0))
+        self.highs.append(self._item_highs[indices].max(axis=0))
+        self.children.append((-1, -1))
+        self.items.append([])
+        if end - start <= _LEAF_SIZE:
+            self.items[node] = sorted(self._items[indices].tolist())
+            return node
+        centers = self._centers[indices]
+        axis = int(np.argmax(centers.max(axis=0) - centers.min(axis=0)))
+        middle = (end - start) // 2
+        partition = np.argpartition(centers[:, axis], middle)
+        self._order[start:end] = indices[partition]
+        left = self.add_node(start, start + middle)
+        right = self.add_node(start + middle, end)
+        self.children[node] = (left, right)
+        return node
+
+
+def _to_floats(vector: Vector) -> tuple:
+    # plain python floats are much faster than numpy for single line traversal
+    if isinstance(vector, np.ndarray):
+        return tuple(vector.tolist())
+    return vector
+
+
+def _get_k_range(ks: Ks) -> Tuple[float, float]:
+    min_k, max_k = ks
+    return (
+        -math.inf if min_k is None else min_k,
+        math.inf if max_k is None else max_k,
+    )
+
+
+def _get_enter_k(
+    low: tuple,
+    high: tuple,
+    point: tuple,
+    direction: tuple,
+    min_k: float,
+    max_k: float,
+) -> Optional[float]:
+    # slab test, returns k where line enters the box or None if it misses the box
+    enter_k, exit_k = min_k, max_k
+    for lo, hi, p, d in zip(low, high, point, direction):
+        if d == 0:
+            if p < lo or p > hi:
+                return None
+            continue
+        k1 = (lo - p) / d
+        k2 = (hi - p) / d
+        if k1 > k2:
+            k1, k2 = k2, k1
+        enter_k = max(enter_k, k1)
+        exit_k = min(exit_k, k2)
+        if enter_k > exit_k:
+            return None
+    return enter_k
+
+
+def _get_enter_exit_ks(
+    low: np.ndarray, high: np.ndarray, points: np.ndarray, inv_directions: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    # batched version of `_get_enter_k`
+    with np.errstate(invalid="ignore"):
+        ks1 = (low - points) * inv_directions
+        ks2 = (high - points) * inv_directions
+    parallel = np.isinf(inv_directions)
+    inside = (low <= points) & (points <= high)
+    enter_ks = np.where(
+        parallel, np.where(inside, -np.inf, np.inf), np.minimum(ks1, ks2)
+    )
+    exit_ks = np.where(
+        parallel, np.where(inside, np.inf, -np.inf), np.maximum(ks1, ks2)
+    )
+    return enter_ks.max(axis=1), exit_ks.min(axis=1)
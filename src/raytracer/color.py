@@ -1,7 +1,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List
+from typing import Iterable
+from typing import Tuple
+from typing import Union
+
+import numpy as np
 
 
 @dataclass(frozen=True)
@@ -31,8 +35,8 @@ class Color:
             raise ValueError(f"can't multiply {self!r} by negative {mul!r}")
         return int(min((x * mul), Color._MAX_RGB))
 
-    def _components(self) -> List[int]:
-        return [self.r, self.g, self.b]
+    def _components(self) -> Tuple[int, int, int]:
+        return self.r, self.g, self.b
 
     def _check_valid_rgb(self, rgb: int) -> None:
         if not (Color._MIN_RGB <= rgb <= Color._MAX_RGB):
@@ -43,6 +47,54 @@ class Color:
         return f"{self!r} is not a valid color: {range_msg}"
 
 
+@dataclass(frozen=True)
+class ColorBuffer:
+    # many colors in (N, 3) uint8 array of rgb, arithmetic & validation are done
+    # once for the whole batch instead of once per `Color`
+    rgbs: np.ndarray
+
+    def __post_init__(self) -> None:
+        if self.rgbs.ndim != 2 or self.rgbs.shape[1] != 3:
+            raise ValueError(f"{self.rgbs.shape} is not a valid shape: (N, 3) expected")
+        if len(self.rgbs) and (
+            self.rgbs.min() < Color._MIN_RGB or self.rgbs.max() > Color._MAX_RGB
+        ):
+            raise ValueError(self._get_invalid_rgbs_msg())
+        object.__setattr__(self, "rgbs", self.rgbs.astype(np.uint8, copy=False))
+
+    @classmethod
+    def from_colors(cls, colors: Iterable[Color]) -> ColorBuffer:
+        rgbs = [color._components() for color in colors]
+        return cls(np.array(rgbs, dtype=np.uint8).reshape(-1, 3))
+
+    @classmethod
+    def filled(cls, color: Color, size: int) -> ColorBuffer:
+        return cls(np.tile(np.array(color._components(), dtype=np.uint8), (size, 1)))
+
+    def __len__(self) -> int:
+        return len(self.rgbs)
+
+    def __getitem__(self, index: int) -> Color:
+        return Color(*self.rgbs[index].tolist())
+
+    def __mul__(self, other: Union[int, float, np.ndarray]) -> ColorBuffer:
+        # other is a number or (N,) array of per color coefficients
+        if not isinstance(other, (int, float, np.ndarray)):
+            return NotImplemented
+        coeffs = np.asarray(other, dtype=float)
+        if (coeffs < 0).any():
+            raise ValueError(f"can't multiply {self!r} by negative coefficients")
+        if coeffs.ndim:
+            coeffs = coeffs[:, np.newaxis]
+        return ColorBuffer(
+            np.minimum(self.rgbs * coeffs, Color._MAX_RGB).astype(np.uint8)
+        )
+
+    def _get_invalid_rgbs_msg(self) -> str:
+        range_msg = f"rgb should be in range [{Color._MIN_RGB}; {Color._MAX_RGB}]"
+        return f"{self!r} is not a valid color buffer: {range_msg}"
+
+
 class Palette:
     BLACK = Color(0, 0, 0)
     GRAY = Color(100, 100, 100)
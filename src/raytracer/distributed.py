@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import argparse
+import collections
+import os
+import pickle
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+
+from raytracer import main as raytracer_main
+from raytracer import performance
+from raytracer import scene
+from raytracer import scenefile
+from raytracer.image import Image
+
+# messages are pickled tuples (kind, *args) prefixed with their length,
+# pickle runs arbitrary code on load, so nodes should trust each other:
+#   worker -> coordinator: ("hello", name), ("heartbeat",),
+#                          ("pixels", tile index, zlib compressed rgb, seconds)
+#   coordinator -> worker: ("scene", pickled scene, engine), ("tile", index, tile),
+#                          ("done",)
+_HEADER = struct.Struct("!Q")
+
+DEFAULT_PORT = 7777
+_DEFAULT_TILE_SIZE = 32
+_HEARTBEAT_INTERVAL = 1.0
+# worker that sent nothing for this long while rendering tiles is considered dead
+_HEARTBEAT_TIMEOUT = 10.0
+# tiles sent to a worker ahead of time, so it doesn't wait for the network
+_MAX_TILES_IN_FLIGHT = 2
+_COMPRESSION_LEVEL = 1
+_ACCEPT_TIMEOUT = 0.1
+
+
+@dataclass
+class NodeStats:
+    tiles: int = 0
+    pixels: int = 0
+    # seconds spent rendering, as reported by the worker
+    render_seconds: float = 0.0
+    # seconds from sending the first tile to receiving the last one
+    seconds: float = 0.0
+    # tiles that were taken from the node, because it died
+    reassigned_tiles: int = 0
+    alive: bool = True
+    # monotonic time when the first rendered tile was sent
+    started_at: Optional[float] = None
+
+    @property
+    def pixels_per_sec(self) -> float:
+        return self.pixels / self.seconds if self.seconds else 0.0
+
+
+class Coordinator:
+    # serves tiles of the scene to workers that connect over tcp, tiles of workers
+    # that disconnect or stop sending heartbeats are given to other workers,
+    # port 0 picks a free port, see `address`
+    def __init__(
+        self,
+        s: scene.Scene,
+        engine: scene.Engine = scene.Engine.BATCH,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        tile_size: int = _DEFAULT_TILE_SIZE,
+        heartbeat_timeout: float = _HEARTBEAT_TIMEOUT,
+    ) -> None:
+        self._scene = s
+        self._engine = engine
+        self._tiles = performance.make_tiles(s.width, s.height, tile_size)
+        self._heartbeat_timeout = heartbeat_timeout
+        self._pixels = np.zeros((s.height, s.width, 3), dtype=np.uint8)
+        self._condition = threading.Condition()
+        self._pending: Deque[int] = collections.deque(range(len(self._tiles)))
+        self._finished = [False] * len(self._tiles)
+        self._num_finished = 0
+        self._done = False
+        self._closed = threading.Event()
+        self._handlers: List[threading.Thread] = []
+        # node name -> stats
+        self.node_stats: Dict[str, NodeStats] = {}
+        self._server = socket.create_server((host, port))
+        self._server.settimeout(_ACCEPT_TIMEOUT)
+        self._acceptor = threading.Thread(target=self._accept, daemon=True)
+        self._acceptor.start()
+
+    def __enter__(self) -> Coordinator:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.getsockname()[:2]
+
+    def render(self, timeout: Optional[float] = None) -> Image:
+        # blocks until workers render all tiles, TimeoutError after timeout seconds
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._num_finished < len(self._tiles):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(
+                        f"{self._num_finished} of {len(self._tiles)} tiles rendered"
+                    )
+                self._condition.wait(remaining)
+            self._done = True
+            self._condition.notify_all()
+        for handler in list(self._handlers):
+            handler.join(self._heartbeat_timeout)
+        return Image.from_array(self._pixels)
+
+    def close(self) -> None:
+        self._closed.set()
+        with self._condition:
+            self._done = True
+            self._condition.notify_all()
+        self._acceptor.join()
+        self._server.close()
+
+    def _accept(self) -> None:
+        # scene is pickled once with its acceleration structures for all workers
+        self._scene._prepare()
+        scene_data = pickle.dumps(self._scene, protocol=pickle.HIGHEST_PROTOCOL)
+        while not self._closed.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            handler = threading.Thread(
+                target=self._serve, args=(conn, scene_data), daemon=True
+            )
+            self._handlers.append(handler)
+            handler.start()
+
+    def _serve(self, conn: socket.socket, scene_data: bytes) -> None:
+        # sends tiles to the worker and collects its pixels until all tiles
+        # are rendered, tiles in flight go back to the queue if the worker dies
+        in_flight: Dict[int, float] = {}
+        stats: Optional[NodeStats] = None
+        try:
+            conn.settimeout(self._heartbeat_timeout)
+            _, name = recv_message(conn)
+            stats = self._add_node(name)
+            send_message(conn, ("scene", scene_data, self._engine.value))
+            while True:
+                indices = self._take_tiles(_MAX_TILES_IN_FLIGHT - len(in_flight))
+                if indices is None:
+                    break
+                for index in indices:
+                    in_flight[index] = time.monotonic()
+                    send_message(conn, ("tile", index, self._tiles[index]))
+                if not in_flight:
+                    continue
+                message = recv_message(conn)
+                if message[0] == "pixels":
+                    _, index, data, seconds = message
+                    self._finish_tile(index, data, seconds, in_flight.pop(index), stats)
+            send_message(conn, ("done",))
+        except (OSError, EOFError, KeyError, ValueError, pickle.UnpicklingError):
+            with self._condition:
+                if stats is not None:
+                    stats.alive = False
+                    stats.reassigned_tiles += len(in_flight)
+                self._pending.extend(in_flight)
+                self._condition.notify_all()
+        finally:
+            conn.close()
+
+    def _add_node(self, name: str) -> NodeStats:
+        with self._condition:
+            key = name
+            while key in self.node_stats:
+                key = f"{name}#{len(self.node_stats)}"
+            stats = self.node_stats[key] = NodeStats()
+            return stats
+
+    def _take_tiles(self, max_tiles: int) -> Optional[List[int]]:
+        # indices of tiles to send to the worker, waits while the worker has
+        # nothing to do, None when all tiles are rendered
+        with self._condition:
+            while not self._done and max_tiles == _MAX_TILES_IN_FLIGHT:
+                if self._pending:
+                    break
+                self._condition.wait()
+            if self._done:
+                return None
+            indices = []
+            while self._pending and len(indices) < max_tiles:
+                index = self._pending.popleft()
+                if not self._finished[index]:
+                    indices.append(index)
+            return indices
+
+    def _finish_tile(
+        self, index: int, data: bytes, seconds: float, sent_at: float, stats: NodeStats
+    ) -> None:
+        tile = self._tiles[index]
+        pixels = np.frombuffer(zlib.decompress(data), dtype=np.uint8)
+        with self._condition:
+            if self._finished[index]:
+                return
+            self._pixels[
+                tile.y : tile.y + tile.height, tile.x : tile.x + tile.width
+            ] = pixels.reshape(tile.height, tile.width, 3)
+            self._finished[index] = True
+            self._num_finished += 1
+            if stats.started_at is None:
+                stats.started_at = sent_at
+            stats.tiles += 1
+            stats.pixels += len(tile)
+            stats.render_seconds += seconds
+            stats.seconds = time.monotonic() - stats.started_at
+            self._condition.notify_all()
+
+
+def run_worker(
+    host: str,
+    port: int,
+    name: Optional[str] = None,
+    heartbeat_interval: float = _HEARTBEAT_INTERVAL,
+) -> int:
+    # renders tiles of the coordinator until it's done, returns number of tiles
+    conn = socket.create_connection((host, port))
+    send_lock = threading.Lock()
+    stopped = threading.Event()
+
+    def send(message: Any) -> None:
+        with send_lock:
+            send_message(conn, message)
+
+    def send_heartbeats() -> None:
+        while not stopped.wait(heartbeat_interval):
+            try:
+                send(("heartbeat",))
+            except OSError:
+                return
+
+    heartbeats = threading.Thread(target=send_heartbeats, daemon=True)
+    num_tiles = 0
+    try:
+        send(("hello", name or f"{socket.gethostname()}:{os.getpid()}"))
+        heartbeats.start()
+        _, scene_data, engine_value = recv_message(conn)
+        s = pickle.loads(scene_data)
+        engine = scene.Engine(engine_value)
+        while True:
+            message = recv_message(conn)
+            if message[0] == "done":
+                return num_tiles
+            _, index, tile = message
+            started_at = time.perf_counter()
+            colors = s._get_tile_colors(tile, engine)
+            seconds = time.perf_counter() - started_at
+            data = zlib.compress(colors.tobytes(), _COMPRESSION_LEVEL)
+            send(("pixels", index, data, seconds))
+            num_tiles += 1
+    finally:
+        stopped.set()
+        conn.close()
+
+
+def send_message(conn: socket.socket, message: Any) -> None:
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    conn.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_message(conn: socket.socket) -> Any:
+    (size,) = _HEADER.unpack(_recv_exactly(conn, _HEADER.size))
+    return pickle.loads(_recv_exactly(conn, size))
+
+
+def _recv_exactly(conn: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = conn.recv(min(size, 1 << 20))
+        if not chunk:
+            raise EOFError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    if args.command == "worker":
+        host, _, port = args.address.rpartition(":")
+        num_tiles = run_worker(host, int(port), args.name)
+        print(f"rendered {num_tiles} tiles")
+        return 0
+    s = (
+        raytracer_main.make_scene()
+        if args.scene is None
+        else scenefile.load(args.scene)
+    )
+    with Coordinator(
+        s,
+        engine=scene.Engine(args.engine),
+        host=args.host,
+        port=args.port,
+        tile_size=args.tile_size,
+        heartbeat_timeout=args.heartbeat_timeout,
+    ) as coordinator:
+        host, port = coordinator.address
+        print(f"waiting for workers on {host}:{port}")
+        started_at = time.perf_counter()
+        image = coordinator.render()
+        duration = time.perf_counter() - started_at
+    image.save(args.output)
+    print(
+        f"rendered in {duration:.3f}s, {s.width * s.height / duration:.0f} pixels/sec"
+    )
+    for name, stats in sorted(coordinator.node_stats.items()):
+        print(
+            f"{name}: {stats.tiles} tiles, {stats.pixels_per_sec:.0f} pixels/sec,"
+            f" {stats.reassigned_tiles} reassigned tiles"
+        )
+    return 0
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="raytracer.distributed", description="Render the scene on many nodes."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    coordinator = commands.add_parser("coordinator", help="serve tiles to workers")
+    coordinator.add_argument("output", help="output .png or .ppm file")
+    coordinator.add_argument(
+        "--scene", help=".json or compiled .npz scene file, main scene if absent"
+    )
+    coordinator.add_argument(
+        "--engine",
+        choices=[engine.value for engine in scene.Engine],
+        default=scene.Engine.BATCH.value,
+    )
+    coordinator.add_argument("--host", default="0.0.0.0")
+    coordinator.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coordinator.add_argument("--tile-size", type=int, default=_DEFAULT_TILE_SIZE)
+    coordinator.add_argument(
+        "--heartbeat-timeout", type=float, default=_HEARTBEAT_TIMEOUT
+    )
+    worker = commands.add_parser("worker", help="render tiles of the coordinator")
+    worker.add_argument("address", help="host:port of the coordinator")
+    worker.add_argument("--name", help="node name in stats, host:pid if absent")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
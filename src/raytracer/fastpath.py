@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import math
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+
+from raytracer import algebra
+from raytracer import geometry
+
+# same geometry as `raytracer.geometry`, but on plain floats: numpy is slower than
+# python floats on 3-vectors, because every operation allocates a new array,
+# the order of float operations is the same, so results are the same,
+# except that numpy dot products may use fused multiply-add and differ in the last bit
+# (dot products of integer coordinates are exact, so they never differ)
+
+
+class Vec3:
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x: float, y: float, z: float) -> None:
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @classmethod
+    def from_point(cls, point: geometry.Point) -> Vec3:
+        x, y, z = point.tolist()
+        return cls(x, y, z)
+
+    def to_point(self) -> geometry.Point:
+        return geometry.make_point(self.x, self.y, self.z)
+
+    def to_tuple(self) -> Tuple[float, float, float]:
+        return self.x, self.y, self.z
+
+    def __getitem__(self, index: int) -> float:
+        # materials read coordinates by index
+        return (self.x, self.y, self.z)[index]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Vec3):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def __repr__(self) -> str:
+        return f"Vec3({self.x!r}, {self.y!r}, {self.z!r})"
+
+    def __add__(self, other: Vec3) -> Vec3:
+        return Vec3(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other: Vec3) -> Vec3:
+        return Vec3(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, k: float) -> Vec3:
+        return Vec3(self.x * k, self.y * k, self.z * k)
+
+    def dot(self, other: Vec3) -> float:
+        return self.x * other.x + self.y * other.y + self.z * other.z
+
+    def norm(self) -> float:
+        return math.sqrt(self.dot(self))
+
+    def is_zero(self) -> bool:
+        return self.x == 0 and self.y == 0 and self.z == 0
+
+
+class Ray:
+    # ray, line segment or infinite line depending on min_k and max_k (None is inf)
+    __slots__ = ("point", "direction", "min_k", "max_k")
+
+    def __init__(
+        self,
+        point: Vec3,
+        direction: Vec3,
+        min_k: Optional[float],
+        max_k: Optional[float],
+    ) -> None:
+        if direction.is_zero():
+            raise geometry.InvalidLineError(self)
+        self.point = point
+        self.direction = direction
+        self.min_k = min_k
+        self.max_k = max_k
+
+    @property
+    def ks(self) -> Tuple[Optional[float], Optional[float]]:
+        return self.min_k, self.max_k
+
+    def is_mine(self, k: float) -> bool:
+        if self.min_k is not None and k < self.min_k:
+            return False
+        return self.max_k is None or k <= self.max_k
+
+    def point_at(self, k: float) -> Vec3:
+        p = self.point
+        d = self.direction
+        return Vec3(p.x + d.x * k, p.y + d.y * k, p.z + d.z * k)
+
+    def perpendicular(self, other: Ray) -> Ray:
+        other_direction_squared = other.direction.dot(other.direction)
+        k = other.direction.dot(self.point - other.point) / other_direction_squared
+        return make_ray(self.point, other.point_at(k))
+
+    def mirror(self, axis: Ray) -> Ray:
+        perpendicular = self.perpendicular(axis)
+        return make_ray(axis.point, perpendicular.point_at(2))
+
+
+class Plane:
+    __slots__ = ("coeffs", "d")
+
+    def __init__(self, coeffs: Vec3, d: float) -> None:
+        self.coeffs = coeffs
+        self.d = d
+
+    def intersections(self, line: Ray) -> List[Vec3]:
+        # solving equation tk + s = 0
+        s = self.coeffs.dot(line.point) + self.d
+        t = self.coeffs.dot(line.direction)
+        if t == 0:
+            return []
+        k = -s / t
+        if not line.is_mine(k):
+            return []
+        return [line.point_at(k)]
+
+    def perpendicular(self, point: Vec3) -> Ray:
+        coeffs = self.coeffs.to_tuple()
+        assert coeffs.count(0) == 2, "only simple planes are supported"
+        length = self.coeffs.norm()
+        delta = Vec3(coeffs[0] / length, coeffs[1] / length, coeffs[2] / length)
+        return make_infinite_line(point, point + delta)
+
+
+class Sphere:
+    __slots__ = ("center", "radius")
+
+    def __init__(self, center: Vec3, radius: float) -> None:
+        self.center = center
+        self.radius = radius
+
+    def intersections(self, line: Ray) -> List[Vec3]:
+        v = line.point - self.center
+        a = line.direction.dot(line.direction)
+        b = 2 * v.dot(line.direction)
+        c = v.dot(v) - self.radius**2
+        ks = algebra.solve_quadratic(a, b, c)
+        return [line.point_at(k) for k in ks if line.is_mine(k)]
+
+    def perpendicular(self, point: Vec3) -> Ray:
+        return make_infinite_line(self.center, point)
+
+
+Shape = Union[Plane, Sphere]
+
+
+def from_shape(shape: geometry.Shape) -> Shape:
+    if isinstance(shape, geometry.Plane):
+        return Plane(Vec3.from_point(np.asarray(shape.coeffs)), _to_number(shape.d))
+    if isinstance(shape, geometry.Sphere):
+        return Sphere(Vec3.from_point(shape.center), _to_number(shape.radius))
+    raise ValueError(f"{shape!r} isn't supported by the fast path")
+
+
+def make_ray(start: Vec3, to: Vec3) -> Ray:
+    return Ray(start, to - start, 0, None)
+
+
+def make_line_segment(start: Vec3, to: Vec3) -> Ray:
+    return Ray(start, to - start, 0, 1)
+
+
+def make_infinite_line(a: Vec3, b: Vec3) -> Ray:
+    return Ray(a, b - a, None, None)
+
+
+def reflect(ray: Ray, point: Vec3, shape: Shape) -> Ray:
+    try:
+        return ray.mirror(shape.perpendicular(point))
+    except geometry.InvalidLineError as exc:
+        raise geometry.ImpossibleReflection from exc
+
+
+def _to_number(number) -> Union[int, float]:
+    # numpy scalars are much slower than python numbers in arithmetic
+    return number.item() if isinstance(number, np.generic) else number
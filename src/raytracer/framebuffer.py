@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from raytracer.image import Image
+from raytracer.performance import Tile
+
+
+@dataclass(frozen=True)
+class FramebufferRef:
+    # picklable reference to the `SharedFramebuffer`, workers write tiles through it
+    name: str
+    width: int
+    height: int
+    channels: int = 3
+    dtype: str = "uint8"
+
+    def write(self, tile: Tile, pixels: np.ndarray) -> None:
+        # pixels is (tile.height, tile.width, channels) array
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            frame = _as_frame(shm.buf, self)
+            frame[tile.y : tile.y + tile.height, tile.x : tile.x + tile.width] = pixels
+            del frame
+        finally:
+            shm.close()
+
+
+class SharedFramebuffer:
+    # (height, width, 3) uint8 rgb buffer in shared memory, so workers don't need
+    # to send pixels back to the parent process, other channels & dtypes can be
+    # used for non-color per pixel data
+    def __init__(
+        self, width: int, height: int, channels: int = 3, dtype: str = "uint8"
+    ) -> None:
+        size = width * height * channels * np.dtype(dtype).itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self.ref = FramebufferRef(self._shm.name, width, height, channels, dtype)
+
+    def __enter__(self) -> SharedFramebuffer:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.unlink()
+
+    def to_image(self) -> Image:
+        # image uses the shared memory without copying
+        return Image.from_array(self.to_array())
+
+    def to_array(self) -> np.ndarray:
+        # (height, width, channels) array over the shared memory
+        return np.asarray(_SharedFrame(self._shm, self.ref))
+
+    def unlink(self) -> None:
+        # memory stays mapped until image & shared memory block are garbage collected
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class _SharedFrame:
+    # numpy arrays created from it (and all their views) have it as a base, so they
+    # keep the shared memory block alive, and it's unmapped only when they're gone
+    def __init__(self, shm: shared_memory.SharedMemory, ref: FramebufferRef):
+        self.__array_interface__ = _as_frame(shm.buf, ref).__array_interface__
+        self._shm = shm
+
+
+def _as_frame(buffer, ref: FramebufferRef) -> np.ndarray:
+    shape = (ref.height, ref.width, ref.channels)
+    return np.ndarray(shape, dtype=ref.dtype, buffer=buffer)
@@ -162,10 +162,30 @@ class Shape(metaclass=abc.ABCMeta):
     def intersections(self, line: Line) -> List[Point]:
         raise NotImplemented
 
+    @abc.abstractmethod
+    def intersections_ks(
+        self, points: np.ndarray, directions: np.ndarray
+    ) -> np.ndarray:
+        # batched version of `intersections`: takes (N, 3) line points & directions,
+        # returns (N, M) array of ks, nan means that there's no intersection
+        raise NotImplementedError
+
     @abc.abstractmethod
     def perpendicular(self, point: Point) -> InfiniteLine:
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def perpendiculars(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # batched version of `perpendicular`: takes (N, 3) points, returns
+        # (N, 3) points & directions of lines, zero direction means that
+        # there's no line (`perpendicular` raises InvalidLineError)
+        raise NotImplementedError
+
+    @property
+    def bounds(self) -> Optional[Tuple[Point, Point]]:
+        # axis-aligned bounding box, None if shape is unbounded
+        return None
+
 
 @dataclass
 class Plane(Shape):
@@ -180,11 +200,25 @@ class Plane(Shape):
             return []
         return _get_line_points_at_ks(line, [-s / t])
 
+    def intersections_ks(
+        self, points: np.ndarray, directions: np.ndarray
+    ) -> np.ndarray:
+        s = dot(points, self.coeffs) + self.d
+        t = dot(directions, self.coeffs)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ks = np.where(t == 0, np.nan, -s / t)
+        return ks[:, np.newaxis]
+
     def perpendicular(self, point: Point) -> InfiniteLine:
         assert self._get_num_zero_coeffs() == 2, "only simple planes are supported"
         delta = _normalize(self.coeffs)
         return make_infinite_line(point, point + make_point(*delta))
 
+    def perpendiculars(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        assert self._get_num_zero_coeffs() == 2, "only simple planes are supported"
+        delta = _normalize(self.coeffs)
+        return points, (points + delta) - points
+
     def _get_num_zero_coeffs(self) -> int:
         return sum(self.coeffs == 0)
 
@@ -201,9 +235,26 @@ class Sphere(Shape):
         c = (v @ v) - self.radius ** 2
         return _get_line_points_at_ks(line, algebra.solve_quadratic(a, b, c))
 
+    def intersections_ks(
+        self, points: np.ndarray, directions: np.ndarray
+    ) -> np.ndarray:
+        v = points - self.center
+        a = dot(directions, directions)
+        b = 2 * dot(v, directions)
+        c = dot(v, v) - self.radius**2
+        ks, _ = algebra.solve_quadratics(a, b, c)
+        return ks
+
     def perpendicular(self, point: Point) -> InfiniteLine:
         return make_infinite_line(self.center, point)
 
+    def perpendiculars(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return np.broadcast_to(self.center, points.shape), points - self.center
+
+    @property
+    def bounds(self) -> Optional[Tuple[Point, Point]]:
+        return self.center - self.radius, self.center + self.radius
+
 
 def reflect(ray: Ray, point: Point, shape: Shape) -> Ray:
     try:
@@ -212,6 +263,44 @@ def reflect(ray: Ray, point: Point, shape: Shape) -> Ray:
         raise ImpossibleReflection from exc
 
 
+def reflections(
+    points: np.ndarray, hits: np.ndarray, shape: Shape
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # batched version of `reflect` for rays from (N, 3) points that hit the shape
+    # at (N, 3) hits, returns points & directions of reflected rays and (N,) mask
+    # of rays that can be reflected (`reflect` raises ImpossibleReflection for others)
+    axis_points, axis_directions = shape.perpendiculars(hits)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ks = dot(axis_directions, points - axis_points) / dot(
+            axis_directions, axis_directions
+        )
+    # same steps as `Ray.mirror`
+    perpendicular_directions = points_at(axis_points, axis_directions, ks) - points
+    directions = points + perpendicular_directions * 2 - axis_points
+    valid = (
+        axis_directions.any(axis=1)
+        & perpendicular_directions.any(axis=1)
+        & directions.any(axis=1)
+    )
+    return axis_points, directions, valid
+
+
+def dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # row-wise dot product of (N, 3) arrays, b can also be a single point
+    a, b = np.asarray(a).T, np.asarray(b).T
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def norm(a: np.ndarray) -> np.ndarray:
+    # row-wise vector length of (N, 3) array
+    return np.sqrt(dot(a, a))
+
+
+def points_at(points: np.ndarray, directions: np.ndarray, ks: np.ndarray) -> np.ndarray:
+    # batched version of `_point_at`
+    return points + directions * ks[:, np.newaxis]
+
+
 def _normalize(point: Point) -> Point:
     return point / np.linalg.norm(point)
 
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import enum
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from raytracer.image import Image
+
+# false colors from the cheapest to the most expensive pixels
+_GRADIENT = np.array(
+    [
+        [0, 0, 0],
+        [40, 0, 120],
+        [200, 30, 60],
+        [255, 160, 0],
+        [255, 255, 255],
+    ]
+)
+
+
+class Cost(enum.Enum):
+    # seconds spent on the pixel
+    TIME = "time"
+    # number of line & shape intersection tests for the pixel
+    TESTS = "tests"
+
+
+@dataclass
+class Heatmap:
+    # pass to `Scene.render` to record the cost of every pixel,
+    # costs is (height, width) array that's filled by the render
+    cost: Cost = Cost.TESTS
+    costs: Optional[np.ndarray] = None
+
+    def to_image(self) -> Image:
+        assert self.costs is not None, "heatmap wasn't rendered"
+        return to_image(self.costs)
+
+
+def to_image(costs: np.ndarray) -> Image:
+    # the cheapest pixel is the first color of the gradient, the most expensive
+    # is the last one, so small differences in cost are still visible
+    if not costs.size:
+        return Image.from_array(np.zeros((*costs.shape, 3), dtype=np.uint8))
+    low = costs.min()
+    span = costs.max() - low
+    levels = (costs - low) / span if span > 0 else np.zeros_like(costs)
+    stops = np.linspace(0, 1, len(_GRADIENT))
+    pixels = np.stack(
+        [np.interp(levels, stops, _GRADIENT[:, channel]) for channel in range(3)],
+        axis=-1,
+    )
+    return Image.from_array(np.round(pixels).astype(np.uint8))
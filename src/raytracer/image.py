@@ -1,3 +1,9 @@
+from __future__ import annotations
+
+import os
+from typing import Union
+
+import numpy as np
 import PIL.Image
 
 from raytracer.color import Color
@@ -5,14 +11,49 @@ from raytracer.color import Color
 
 class Image:
     def __init__(self, width: int, height: int) -> None:
-        self._image = PIL.Image.new("RGB", (width, height), "white")
-        self._pixels = self._image.load()
+        self._pixels = np.full((height, width, 3), 255, dtype=np.uint8)
+
+    @classmethod
+    def from_array(cls, pixels: np.ndarray) -> Image:
+        # pixels is (height, width, 3) uint8 rgb array, it's used without copying
+        # unless it's not contiguous
+        assert pixels.ndim == 3 and pixels.shape[2] == 3 and pixels.dtype == np.uint8
+        image = cls.__new__(cls)
+        image._pixels = np.ascontiguousarray(pixels)
+        return image
+
+    @property
+    def width(self) -> int:
+        return self._pixels.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self._pixels.shape[0]
+
+    def to_array(self) -> np.ndarray:
+        return self._pixels
 
     def show(self) -> None:
-        self._image.show()
+        PIL.Image.fromarray(self._pixels).show()
+
+    def save(self, path: Union[str, os.PathLike]) -> None:
+        # format is chosen by extension: .ppm is written directly, others go to PIL
+        if os.fspath(path).lower().endswith(".ppm"):
+            self._save_ppm(path)
+        else:
+            PIL.Image.fromarray(self._pixels).save(path)
+
+    def _save_ppm(self, path: Union[str, os.PathLike]) -> None:
+        # binary ppm is a header followed by raw rgb rows, so pixels are written
+        # straight from the buffer
+        with open(path, "wb") as f:
+            f.write(f"P6\n{self.width} {self.height}\n255\n".encode("ascii"))
+            f.write(memoryview(self._pixels))
 
     def set_pixel(self, x: int, y: int, color: Color) -> None:
-        self._pixels[x, y] = (color.r, color.g, color.b)
+        self._pixels[y, x] = (color.r, color.g, color.b)
 
     def get_pixel(self, x: int, y: int) -> Color:
-        return Color(*self._pixels[x, y])
+        # `item` returns python ints without creating intermediate arrays
+        item = self._pixels.item
+        return Color(item(y, x, 0), item(y, x, 1), item(y, x, 2))
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import contextlib
+from dataclasses import dataclass
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+from raytracer import geometry
+
+# segments are crossed a bit beyond their ends, so a moved body that is as far
+# as the old hit (up to rounding) still invalidates the pixel
+_SEGMENT_TOLERANCE = 1e-9
+
+# tracker of the running `tracking` block, None when dependencies aren't recorded,
+# so instrumented code costs a single check unless dependencies are requested
+active_tracker: Optional[Tracker] = None
+
+
+@dataclass(frozen=True)
+class Dependencies:
+    # pixels are flat indices (y * width + x),
+    # (pixel, body index) pairs: bodies that were hit by the rays of the pixel
+    # (primary hit & mirror bounces) or blocked its shadow segments
+    pixels: np.ndarray
+    body_indices: np.ndarray
+    # every traced segment of the pixel is point + k * direction, 0 <= k <= max_k,
+    # bodies that cross a segment can change the color of its pixel
+    segment_pixels: np.ndarray
+    segment_points: np.ndarray
+    segment_directions: np.ndarray
+    segment_max_ks: np.ndarray
+
+    @classmethod
+    def concatenate(cls, items: Sequence[Dependencies]) -> Dependencies:
+        if not items:
+            return _EMPTY
+        return cls(
+            pixels=np.concatenate([d.pixels for d in items]),
+            body_indices=np.concatenate([d.body_indices for d in items]),
+            segment_pixels=np.concatenate([d.segment_pixels for d in items]),
+            segment_points=np.concatenate([d.segment_points for d in items]),
+            segment_directions=np.concatenate([d.segment_directions for d in items]),
+            segment_max_ks=np.concatenate([d.segment_max_ks for d in items]),
+        )
+
+    def get_dirty_pixels(
+        self, removed: Sequence[int], added: Sequence[geometry.Shape]
+    ) -> np.ndarray:
+        # sorted pixels that depend on removed bodies or whose segments are
+        # crossed by added shapes, moved body is removed & added at the same time
+        dirty = [self.pixels[np.isin(self.body_indices, removed)]]
+        max_ks = self.segment_max_ks * (1 + _SEGMENT_TOLERANCE)
+        for shape in added:
+            ks = shape.intersections_ks(self.segment_points, self.segment_directions)
+            crossed = ((ks >= 0) & (ks <= max_ks[:, np.newaxis])).any(axis=1)
+            dirty.append(self.segment_pixels[crossed])
+        return np.unique(np.concatenate(dirty))
+
+    def without_pixels(self, pixels: np.ndarray) -> Dependencies:
+        kept = ~np.isin(self.pixels, pixels)
+        kept_segments = ~np.isin(self.segment_pixels, pixels)
+        return Dependencies(
+            pixels=self.pixels[kept],
+            body_indices=self.body_indices[kept],
+            segment_pixels=self.segment_pixels[kept_segments],
+            segment_points=self.segment_points[kept_segments],
+            segment_directions=self.segment_directions[kept_segments],
+            segment_max_ks=self.segment_max_ks[kept_segments],
+        )
+
+    def with_body_indices(self, new_indices: Dict[int, int]) -> Dependencies:
+        # renumbers bodies after the scene change, all bodies should be in new_indices
+        mapping = np.full(max(new_indices, default=-1) + 1, -1)
+        mapping[list(new_indices)] = list(new_indices.values())
+        body_indices = mapping[self.body_indices]
+        assert (body_indices >= 0).all(), "dependencies on removed bodies"
+        return Dependencies(
+            pixels=self.pixels,
+            body_indices=body_indices,
+            segment_pixels=self.segment_pixels,
+            segment_points=self.segment_points,
+            segment_directions=self.segment_directions,
+            segment_max_ks=self.segment_max_ks,
+        )
+
+
+class Tracker:
+    # records dependencies of the pixel that is traced right now,
+    # points & directions are numpy points or tuples of floats
+    def __init__(self) -> None:
+        self.pixel = -1
+        self._bodies: List[Tuple[int, int]] = []
+        self._segments: List[Tuple[float, ...]] = []
+
+    def add_body(self, index: int) -> None:
+        self._bodies.append((self.pixel, index))
+
+    def add_segment(self, point, direction, max_k: float) -> None:
+        self._segments.append((self.pixel, *point, *direction, max_k))
+
+    def to_dependencies(self) -> Dependencies:
+        bodies = np.array(self._bodies, dtype=np.int64).reshape(-1, 2)
+        segments = np.array(self._segments, dtype=float).reshape(-1, 8)
+        return Dependencies(
+            pixels=bodies[:, 0],
+            body_indices=bodies[:, 1],
+            segment_pixels=segments[:, 0].astype(np.int64),
+            segment_points=segments[:, 1:4],
+            segment_directions=segments[:, 4:7],
+            segment_max_ks=segments[:, 7],
+        )
+
+
+@contextlib.contextmanager
+def tracking(tracker: Tracker) -> Iterator[Tracker]:
+    global active_tracker
+    outer_tracker = active_tracker
+    active_tracker = tracker
+    try:
+        yield tracker
+    finally:
+        active_tracker = outer_tracker
+
+
+def diff_bodies(
+    old: Sequence, new: Sequence
+) -> Optional[Tuple[List[int], Dict[int, int], List[int]]]:
+    # bodies are frozen, so edited body is a new object and bodies are compared
+    # by identity, returns indices of removed old bodies, old -> new indices of
+    # kept bodies and indices of added new bodies, None if bodies are repeated
+    new_indices = {id(body): index for index, body in enumerate(new)}
+    if len(new_indices) != len(new) or len({id(body) for body in old}) != len(old):
+        return None
+    removed = []
+    kept = {}
+    for index, body in enumerate(old):
+        if id(body) in new_indices:
+            kept[index] = new_indices[id(body)]
+        else:
+            removed.append(index)
+    kept_new = set(kept.values())
+    added = [index for index in range(len(new)) if index not in kept_new]
+    return removed, kept, added
+
+
+_EMPTY = Tracker().to_dependencies()
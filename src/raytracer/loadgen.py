@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import sys
+import time
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+
+from raytracer import main as raytracer_main
+from raytracer import scenefile
+
+# status of requests that got no http response
+_CONNECTION_FAILED = 0
+
+
+async def request(
+    host: str, port: int, method: str, path: str, body: bytes = b""
+) -> Tuple[int, Dict[str, str], bytes]:
+    # minimal http/1.1 client for `raytracer.server`, returns status, headers
+    # with lowercase names and body, chunked bodies are joined
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+        _, status, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            data = await _read_chunks(reader)
+        else:
+            data = await reader.readexactly(int(headers.get("content-length", 0)))
+        return int(status), headers, data
+    finally:
+        writer.close()
+
+
+async def run(
+    host: str,
+    port: int,
+    body: bytes,
+    num_requests: int,
+    concurrency: int,
+    priority: int = 0,
+) -> Dict[str, float]:
+    # sends num_requests renders, at most concurrency at once
+    latencies: List[float] = []
+    statuses: List[int] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send() -> None:
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                status, _, _ = await request(
+                    host, port, "POST", f"/render?priority={priority}", body
+                )
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                # refused & reset connections or empty replies count as failed
+                status = _CONNECTION_FAILED
+            statuses.append(status)
+            if status == 200:
+                latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(send() for _ in range(num_requests)))
+    return summarize(latencies, statuses, time.perf_counter() - started_at)
+
+
+def summarize(
+    latencies: List[float], statuses: List[int], duration: float
+) -> Dict[str, float]:
+    # latencies are of successful requests only
+    return {
+        "requests": len(statuses),
+        "succeeded": len(latencies),
+        "rejected": sum(status == 503 for status in statuses),
+        "failed": sum(status not in (200, 503) for status in statuses),
+        "p50_latency_s": _percentile(latencies, 50),
+        "p99_latency_s": _percentile(latencies, 99),
+        "throughput_per_sec": len(latencies) / duration if duration else 0.0,
+    }
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+async def _read_chunks(reader: asyncio.StreamReader) -> bytes:
+    chunks = []
+    while True:
+        size = int((await reader.readline()).strip(), 16)
+        chunk = await reader.readexactly(size + 2)
+        if not size:
+            return b"".join(chunks)
+        chunks.append(chunk[:-2])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    if args.scene is None:
+        s = dataclasses.replace(
+            raytracer_main.make_scene(), width=args.width, height=args.height
+        )
+        body = json.dumps(scenefile.to_dict(s)).encode()
+    else:
+        with open(args.scene, "rb") as f:
+            body = f.read()
+    host, _, port = args.address.rpartition(":")
+    summary = asyncio.run(
+        run(host, int(port), body, args.requests, args.concurrency, args.priority)
+    )
+    for name, value in summary.items():
+        print(f"{name}: {value:.4g}")
+    return 0
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="raytracer.loadgen", description="Load `raytracer.server` with renders."
+    )
+    parser.add_argument("address", nargs="?", default="127.0.0.1:8080")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="max requests at once"
+    )
+    parser.add_argument("--priority", type=int, default=0)
+    parser.add_argument("--scene", help=".json scene file, small main scene if absent")
+    parser.add_argument("--width", type=int, default=60)
+    parser.add_argument("--height", type=int, default=40)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
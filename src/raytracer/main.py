@@ -1,11 +1,33 @@
+import argparse
+import dataclasses
+import json
+import os
+import sys
+import time
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
 import raytracer.material
+from raytracer import animation
+from raytracer import antialiasing
 from raytracer import geometry
+from raytracer import performance
+from raytracer import rendercache
 from raytracer import scene
+from raytracer import scenefile
 from raytracer.color import Color
 from raytracer.color import Palette
+from raytracer.heatmap import Cost
+from raytracer.heatmap import Heatmap
 
 
 def render():
+    return make_scene().render()
+
+
+def make_scene() -> scene.Scene:
     floor = scene.Body(
         shape=geometry.make_plane(0, 1, 0, -200),
         material=raytracer.material.Monochrome(Color(170, 170, 170)),
@@ -47,20 +69,210 @@ def render():
     right_light = geometry.make_point(450, 1000, 200)
     camera = geometry.make_point(150, 100, -300)
     bodies = [left_wall, right_wall, far_wall, floor, left_sphere, right_sphere]
-    s = scene.Scene(
+    return scene.Scene(
         bodies=bodies,
         camera=camera,
         lights=[left_light, right_light],
         width=300,
         height=200,
     )
-    image = s.render()
-    return image
 
 
-def main():
-    render().show()
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    try:
+        s = _make_scene_from_args(args)
+        if args.frames is not None:
+            _render_animation(s, args)
+            return 0
+        stats = performance.Stats() if args.stats else None
+        heatmap = None if args.heatmap is None else Heatmap(Cost(args.heatmap))
+        with performance.RenderPool(args.workers, profile=args.profile) as pool:
+            started_at = time.perf_counter()
+            if args.cache_dir is None:
+                image = s.render(
+                    engine=scene.Engine(args.engine),
+                    tile_size=args.tile_size,
+                    pool=pool,
+                    samples=args.samples,
+                    stats=stats,
+                    heatmap=heatmap,
+                )
+            else:
+                image = rendercache.RenderCache(args.cache_dir).render(
+                    s,
+                    engine=scene.Engine(args.engine),
+                    tile_size=args.tile_size,
+                    pool=pool,
+                    samples=args.samples,
+                )
+            duration = time.perf_counter() - started_at
+            if args.profile:
+                pool.get_profile().sort_stats("cumulative").print_stats(30)
+        if stats is not None:
+            summary = _summarize(s, pool.num_processes, duration, stats)
+            for name, value in summary.items():
+                print(f"{name}: {value}")
+        if args.output is None:
+            image.show()
+        else:
+            image.save(args.output)
+            if stats is not None:
+                with open(_get_sidecar_path(args.output, ".stats.json"), "w") as f:
+                    json.dump(summary, f, indent=2)
+            if heatmap is not None:
+                heatmap.to_image().save(_get_sidecar_path(args.output, ".heatmap.png"))
+    except Exception as exc:
+        print(f"render failed: {exc!r}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _render_animation(s: scene.Scene, args: argparse.Namespace) -> None:
+    end = geometry.make_point(*args.camera_to)
+    cameras = animation.linear_path(s.camera, end, args.frames)
+    with performance.RenderPool(args.workers) as pool:
+        frames = s.render_animation(
+            cameras, engine=scene.Engine(args.engine), pool=pool
+        )
+        for path in animation.save_frames(frames, args.output):
+            print(f"saved {path}")
+
+
+def _make_scene_from_args(args: argparse.Namespace) -> scene.Scene:
+    s = make_scene() if args.scene is None else scenefile.load(args.scene)
+    overrides = {
+        "width": args.width,
+        "height": args.height,
+        "max_depth": args.max_depth,
+        "shadows": None if args.shadows is None else scene.Shadows(args.shadows),
+    }
+    return dataclasses.replace(
+        s, **{name: value for name, value in overrides.items() if value is not None}
+    )
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="raytracer", description="Render the scene.")
+    parser.add_argument(
+        "output", nargs="?", help="output .png or .ppm file, shows the image if absent"
+    )
+    parser.add_argument(
+        "--scene", help=".json or compiled .npz scene file, main scene if absent"
+    )
+    parser.add_argument("--width", type=_positive_int)
+    parser.add_argument("--height", type=_positive_int)
+    parser.add_argument(
+        "--workers", type=_positive_int, help="number of processes, cpu count if absent"
+    )
+    parser.add_argument(
+        "--tile-size", type=_positive_int, help="tile side in pixels, picked if absent"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=[engine.value for engine in scene.Engine],
+        default=scene.Engine.SCALAR.value,
+    )
+    parser.add_argument(
+        "--shadows",
+        choices=[shadows.value for shadows in scene.Shadows],
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=_positive_int,
+        help="max number of rays in a chain of reflections",
+    )
+    parser.add_argument(
+        "--samples",
+        type=_square_int,
+        default=1,
+        help="max rays per pixel on the edges of bodies, 1, 4, 9, 16, ...",
+    )
+    parser.add_argument(
+        "--profile", action="store_true", help="print cProfile stats of the workers"
+    )
+    parser.add_argument(
+        "--heatmap",
+        choices=[cost.value for cost in Cost],
+        help="save per pixel cost next to the output as .heatmap.png",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print render stats and save them next to the output as .stats.json",
+    )
+    parser.add_argument(
+        "--frames",
+        type=_positive_int,
+        help="render animation of camera moving to --camera-to,"
+        " frames are saved as <output>_0000.png, <output>_0001.png, ...",
+    )
+    parser.add_argument(
+        "--camera-to",
+        type=float,
+        nargs=3,
+        metavar=("X", "Y", "Z"),
+        help="camera position in the last frame of animation",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="reuse the image of the identical scene rendered before with this dir",
+    )
+    args = parser.parse_args(argv)
+    if args.frames is not None:
+        if args.output is None or args.camera_to is None:
+            parser.error("--frames requires output and --camera-to")
+        if args.heatmap is not None or args.samples > 1 or args.stats:
+            parser.error("--frames can't be used with --heatmap, --samples or --stats")
+    if args.cache_dir is not None and (
+        args.frames is not None
+        or args.heatmap is not None
+        or args.stats
+        or args.profile
+    ):
+        parser.error(
+            "--cache-dir can't be used with --frames, --heatmap, --stats or --profile"
+        )
+    if args.heatmap is not None and args.output is None:
+        parser.error("--heatmap requires output")
+    if args.heatmap is not None and args.samples > 1:
+        parser.error("--heatmap can't be used with --samples")
+    return args
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def _square_int(value: str) -> int:
+    number = int(value)
+    try:
+        antialiasing.check_samples(number)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"{value} is not a square number") from exc
+    return number
+
+
+def _summarize(
+    s: scene.Scene, num_processes: int, duration: float, stats: performance.Stats
+) -> Dict[str, Any]:
+    return {
+        "width": s.width,
+        "height": s.height,
+        "workers": num_processes,
+        "duration_s": round(duration, 3),
+        "pixels_per_sec": round(s.width * s.height / duration),
+        **stats.to_dict(),
+    }
+
+
+def _get_sidecar_path(output: str, suffix: str) -> str:
+    # image.png -> image.stats.json
+    return os.path.splitext(output)[0] + suffix
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,9 +1,15 @@
 import abc
+import functools
 from dataclasses import dataclass
 from typing import Callable
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
 
 from raytracer import geometry
 from raytracer.color import Color
+from raytracer.color import ColorBuffer
 
 
 class Material(metaclass=abc.ABCMeta):
@@ -11,6 +17,10 @@ class Material(metaclass=abc.ABCMeta):
     def get_color(self, point: geometry.Point) -> Color:
         raise NotImplementedError
 
+    def get_colors(self, points: np.ndarray) -> ColorBuffer:
+        # batched version of `get_color`, points is (N, 3) array
+        return ColorBuffer.from_colors(self.get_color(point) for point in points)
+
 
 @dataclass(frozen=True)
 class Monochrome(Material):
@@ -19,6 +29,9 @@ class Monochrome(Material):
     def get_color(self, point: geometry.Point) -> Color:
         return self.color
 
+    def get_colors(self, points: np.ndarray) -> ColorBuffer:
+        return ColorBuffer.filled(self.color, len(points))
+
 
 @dataclass(frozen=True)
 class Checkered(Material):
@@ -40,17 +53,44 @@ class Checkered(Material):
         return geometry.make_point(geometry.get_y(point), geometry.get_z(point), 0)
 
     def get_color(self, point: geometry.Point) -> Color:
-        local = self.projection(point)
-        x = geometry.get_x(local)
-        y = geometry.get_y(local)
+        if self._axes is None:
+            local = self.projection(point)
+            x = geometry.get_x(local)
+            y = geometry.get_y(local)
+        else:
+            x_axis, y_axis = self._axes
+            x = point[x_axis]
+            y = point[y_axis]
         if (self._get_square_index(x) + self._get_square_index(y)) % 2:
             return self.darker
         return self.lighter
 
+    def get_colors(self, points: np.ndarray) -> ColorBuffer:
+        if self._axes is None:
+            return super().get_colors(points)
+        x_axis, y_axis = self._axes
+        width = self.square_width
+        indices = points[:, x_axis] // width + points[:, y_axis] // width
+        palette = ColorBuffer.from_colors([self.lighter, self.darker]).rgbs
+        return ColorBuffer(palette[(indices % 2 != 0).astype(int)])
+
+    @functools.cached_property
+    def _axes(self) -> Optional[Tuple[int, int]]:
+        # known projections just pick two coordinates of the point, so there's no
+        # need to call them, other projections are called as is
+        return _PROJECTION_AXES.get(self.projection)
+
     def _get_square_index(self, coordinate: float) -> int:
         return int(coordinate // self.square_width)
 
 
+_PROJECTION_AXES = {
+    Checkered.project_to_local_xy: (0, 1),
+    Checkered.project_to_local_xz: (0, 2),
+    Checkered.project_to_local_yz: (1, 2),
+}
+
+
 class Mirror(Material):
     def get_color(self, point: geometry.Point) -> Color:
         raise NotImplemented("Mirror have no color")
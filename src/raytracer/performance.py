@@ -1,7 +1,26 @@
+from __future__ import annotations
+
+import collections
+import cProfile
 import functools
+import math
 import multiprocessing
+import os
+import pickle
+import pstats
 import time
+import uuid
+from dataclasses import dataclass
+from dataclasses import field
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
+from typing import Optional
 
 
 def timed(fn):
@@ -16,18 +35,227 @@ def timed(fn):
     return inner
 
 
-def parallel(process_chunk, args, num_processes):
-    with multiprocessing.Pool(processes=num_processes) as pool:
-        chunks = _get_chunks(args, num_processes)
-        return _flatten(pool.map(process_chunk, chunks))
+_MIN_TILE_SIZE = 8
+_MAX_TILE_SIZE = 64
+_TILES_PER_PROCESS = 16
+
+# modules that forkserver imports once, so workers don't import them on start
+_PRELOADED_MODULES = ["raytracer.scene"]
+# number of broadcast objects that are kept in the parent and in every worker
+_MAX_BROADCAST_OBJECTS = 8
+
+# worker side cache of broadcast objects
+_broadcast_objects: Dict[str, Any] = collections.OrderedDict()
+
+# stats of the running `counting` call, None when stats are disabled,
+# so instrumented code costs a single check unless stats are requested
+active_stats: Optional[Stats] = None
+
+
+@dataclass
+class Stats:
+    primary_rays: int = 0
+    reflection_rays: int = 0
+    # segments from points to lights, that are intersected with bodies
+    shadow_rays: int = 0
+    shadow_map_lookups: int = 0
+    # shape type name -> number of line & shape intersection tests
+    intersection_tests: Dict[str, int] = field(default_factory=collections.Counter)
+    # deepest chain of reflections
+    max_depth: int = 0
+
+    def count_intersection_tests(self, shape: Any, num_tests: int = 1) -> None:
+        self.intersection_tests[type(shape).__name__] += num_tests
+
+    def count_depth(self, depth: int) -> None:
+        self.max_depth = max(self.max_depth, depth)
+
+    def merge(self, other: Stats) -> None:
+        self.primary_rays += other.primary_rays
+        self.reflection_rays += other.reflection_rays
+        self.shadow_rays += other.shadow_rays
+        self.shadow_map_lookups += other.shadow_map_lookups
+        self.intersection_tests.update(other.intersection_tests)
+        self.max_depth = max(self.max_depth, other.max_depth)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "primary_rays": self.primary_rays,
+            "reflection_rays": self.reflection_rays,
+            "shadow_rays": self.shadow_rays,
+            "shadow_map_lookups": self.shadow_map_lookups,
+            "intersection_tests": dict(sorted(self.intersection_tests.items())),
+            "max_depth": self.max_depth,
+        }
+
+
+@dataclass(frozen=True)
+class Tile:
+    x: int
+    y: int
+    width: int
+    height: int
+
+    def __len__(self) -> int:
+        return self.width * self.height
+
+
+class RenderPool:
+    # long-lived pool of workers, every object (usually a scene) is pickled
+    # and sent to workers once, so many renders in a row don't pay for process
+    # startup and scene serialization again and again
+    def __init__(
+        self,
+        num_processes: Optional[int] = None,
+        start_method: Optional[str] = None,
+        profile: bool = False,
+    ) -> None:
+        # with profile=True every task runs under cProfile in the worker,
+        # and the merged profile is available through `get_profile`
+        context = multiprocessing.get_context(start_method)
+        if context.get_start_method() == "forkserver":
+            context.set_forkserver_preload(_PRELOADED_MODULES)
+        # workers should share the parent's resource tracker, otherwise their own
+        # trackers unlink shared memory blocks of the parent when workers exit
+        resource_tracker.ensure_running()
+        self.num_processes = num_processes or os.cpu_count() or 1
+        self._pool = context.Pool(processes=self.num_processes)
+        self._broadcasts: Dict[int, _Broadcast] = collections.OrderedDict()
+        self._profile = profile
+        self._profile_stats: Optional[pstats.Stats] = None
+
+    def __enter__(self) -> RenderPool:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def imap_unordered(
+        self, fn: Callable[[Any, Any], Any], obj: Any, args: Iterable
+    ) -> Iterator:
+        # calls fn(obj, arg) in workers, objects are treated as immutable,
+        # results are yielded in the order of completion
+        broadcast = self._broadcast(obj)
+        tasks = ((fn, broadcast.key, broadcast.name, arg) for arg in args)
+        if not self._profile:
+            return self._pool.imap_unordered(_run_task, tasks)
+        return self._collect_profiles(
+            self._pool.imap_unordered(_run_profiled_task, tasks)
+        )
+
+    def get_profile(self) -> Optional[pstats.Stats]:
+        # profile of all tasks run so far, None if profiling is off or nothing ran
+        return self._profile_stats
+
+    def close(self) -> None:
+        self._pool.terminate()
+        self._pool.join()
+        for broadcast in self._broadcasts.values():
+            broadcast.unlink()
+        self._broadcasts.clear()
+
+    def _collect_profiles(self, results: Iterator) -> Iterator:
+        for result, stats in results:
+            if self._profile_stats is None:
+                self._profile_stats = pstats.Stats(_RawProfile(stats))
+            else:
+                self._profile_stats.add(_RawProfile(stats))
+            yield result
+
+    def _broadcast(self, obj: Any) -> _Broadcast:
+        # broadcast keeps reference to the object, so its id can't be reused
+        if id(obj) in self._broadcasts:
+            self._broadcasts.move_to_end(id(obj))
+            return self._broadcasts[id(obj)]
+        broadcast = _Broadcast(obj)
+        self._broadcasts[id(obj)] = broadcast
+        if len(self._broadcasts) > _MAX_BROADCAST_OBJECTS:
+            _, oldest = self._broadcasts.popitem(last=False)
+            oldest.unlink()
+        return broadcast
+
+
+class _Broadcast:
+    # pickled object in shared memory, workers unpickle it on the first use
+    def __init__(self, obj: Any) -> None:
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        self.obj = obj
+        self.key = uuid.uuid4().hex
+        self._shm = shared_memory.SharedMemory(create=True, size=len(data))
+        self._shm.buf[: len(data)] = data
+        self.name = self._shm.name
+
+    def unlink(self) -> None:
+        self._shm.close()
+        self._shm.unlink()
+
+
+class _RawProfile:
+    # pstats.Stats accepts anything with `create_stats` & `stats`,
+    # raw stats are plain dicts, so they can be sent from workers
+    def __init__(self, stats: dict) -> None:
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+def counting(fn: Callable) -> Callable:
+    # wraps fn, so it returns (result, stats counted during the call),
+    # wrapped fn can be sent to workers and stats merged in the parent
+    return functools.partial(_run_counting, fn)
+
+
+def make_tiles(width: int, height: int, tile_size: int) -> List[Tile]:
+    return [
+        Tile(x, y, min(tile_size, width - x), min(tile_size, height - y))
+        for y in range(0, height, tile_size)
+        for x in range(0, width, tile_size)
+    ]
+
+
+def get_tile_size(width: int, height: int, num_processes: int) -> int:
+    # enough tiles per process to balance the load, but tiles shouldn't be so small
+    # that scheduling overhead dominates
+    size = math.sqrt(width * height / (num_processes * _TILES_PER_PROCESS))
+    return int(min(max(size, _MIN_TILE_SIZE), _MAX_TILE_SIZE))
+
+
+def _run_counting(fn: Callable, *args, **kwargs):
+    # nested calls count into their own stats and then add them to the outer ones
+    global active_stats
+    outer_stats = active_stats
+    stats = active_stats = Stats()
+    try:
+        return fn(*args, **kwargs), stats
+    finally:
+        active_stats = outer_stats
+        if outer_stats is not None:
+            outer_stats.merge(stats)
+
+
+def _run_task(task):
+    fn, key, name, arg = task
+    return fn(_get_broadcast_object(key, name), arg)
 
 
-def _flatten(seq_of_seq: List[list]) -> list:
-    return [item for seq in seq_of_seq for item in seq]
+def _run_profiled_task(task):
+    profiler = cProfile.Profile()
+    result = profiler.runcall(_run_task, task)
+    profiler.create_stats()
+    return result, profiler.stats
 
 
-def _get_chunks(seq: list, n: int) -> List[list]:
-    chunks = []
-    for i in range(n):
-        chunks.append(seq[i::n])
-    return chunks
+def _get_broadcast_object(key: str, name: str) -> Any:
+    if key in _broadcast_objects:
+        _broadcast_objects.move_to_end(key)
+        return _broadcast_objects[key]
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        obj = pickle.loads(shm.buf)
+    finally:
+        shm.close()
+    _broadcast_objects[key] = obj
+    if len(_broadcast_objects) > _MAX_BROADCAST_OBJECTS:
+        _broadcast_objects.popitem(last=False)
+    return obj
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import collections
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+
+from raytracer import geometry
+from raytracer import material
+from raytracer import performance
+from raytracer import scene
+from raytracer import scenefile
+from raytracer.image import Image
+
+Path = Union[str, os.PathLike]
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "raytracer",
+    "renders",
+)
+DEFAULT_MAX_MEMORY_BYTES = 256 * 2**20
+DEFAULT_MAX_DISK_BYTES = 1024 * 2**20
+
+# bump when rendering changes the pixels, so stale images aren't served
+_VERSION = 1
+_SUFFIX = ".npy"
+# subclasses are described by `scenefile.to_dict` as their base classes,
+# so they could get the key of the scene that looks different
+_KNOWN_TYPES = frozenset(
+    [
+        geometry.Plane,
+        geometry.Sphere,
+        material.Monochrome,
+        material.Checkered,
+        material.Mirror,
+    ]
+)
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    # scenes that can't be hashed (e.g. with custom materials) are always rendered
+    uncacheable: int = 0
+    memory_evictions: int = 0
+    disk_evictions: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {**self.__dict__, "hits": self.hits, "hit_rate": self.hit_rate}
+
+
+class RenderCache:
+    # images are looked up by the hash of the scene content, so equal scenes
+    # share images even if they are different objects, recently used images
+    # are kept in memory, all of them are saved to cache_dir (None disables
+    # the disk), least recently used images are evicted when the size limit
+    # is reached
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+        max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = CacheStats()
+        self._images: Dict[str, np.ndarray] = collections.OrderedDict()
+        self._memory_bytes = 0
+
+    def render(
+        self,
+        s: scene.Scene,
+        engine: scene.Engine = scene.Engine.SCALAR,
+        num_processes: Optional[int] = None,
+        tile_size: Optional[int] = None,
+        pool: Optional[performance.RenderPool] = None,
+        samples: int = 1,
+    ) -> Image:
+        # same as `Scene.render`, processes and tiles don't change the pixels,
+        # so they aren't part of the key
+        key = get_key(s, engine, samples)
+        if key is None:
+            self.stats.uncacheable += 1
+            return s.render(engine, num_processes, tile_size, pool, samples)
+        pixels = self._get_from_memory(key)
+        if pixels is not None:
+            self.stats.memory_hits += 1
+        else:
+            pixels = self._get_from_disk(key, s)
+            if pixels is not None:
+                self.stats.disk_hits += 1
+            else:
+                self.stats.misses += 1
+                image = s.render(engine, num_processes, tile_size, pool, samples)
+                pixels = image.to_array()
+                self._save_to_disk(key, pixels)
+            self._save_to_memory(key, pixels)
+        # callers may change the image, cached pixels stay intact
+        return Image.from_array(pixels.copy())
+
+    def _get_from_memory(self, key: str) -> Optional[np.ndarray]:
+        pixels = self._images.get(key)
+        if pixels is not None:
+            self._images.move_to_end(key)
+        return pixels
+
+    def _save_to_memory(self, key: str, pixels: np.ndarray) -> None:
+        if pixels.nbytes > self.max_memory_bytes:
+            return
+        self._images[key] = pixels
+        self._memory_bytes += pixels.nbytes
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+            self.stats.memory_evictions += 1
+
+    def _get_from_disk(self, key: str, s: scene.Scene) -> Optional[np.ndarray]:
+        if self.cache_dir is None:
+            return None
+        path = self._get_path(key)
+        try:
+            pixels = np.load(path)
+            # mtime is the last use, see `_evict_from_disk`
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        if pixels.shape != (s.height, s.width, 3) or pixels.dtype != np.uint8:
+            return None
+        return pixels
+
+    def _save_to_disk(self, key: str, pixels: np.ndarray) -> None:
+        if self.cache_dir is None or pixels.nbytes > self.max_disk_bytes:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._get_path(key)
+        # concurrent renders of the same scene shouldn't see a half written file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, pixels)
+        os.replace(tmp_path, path)
+        self._evict_from_disk()
+
+    def _evict_from_disk(self) -> None:
+        entries: List[Tuple[float, int, str]] = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                return
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.stats.disk_evictions += 1
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + _SUFFIX)
+
+
+def get_key(s: scene.Scene, engine: scene.Engine, samples: int) -> Optional[str]:
+    # hash of everything that changes the pixels, None if the scene can't be
+    # described exactly
+    for body in s:
+        if not {type(body.shape), type(body.material)} <= _KNOWN_TYPES:
+            return None
+    try:
+        description = scenefile.to_dict(s)
+    except (scenefile.InvalidSceneError, ValueError):
+        # e.g. checkered material with a custom projection
+        return None
+    data = json.dumps(
+        {
+            "version": _VERSION,
+            "scene": description,
+            "engine": engine.value,
+            "samples": samples,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
@@ -1,20 +1,61 @@
 from __future__ import annotations
 
+import contextlib
+import dataclasses
+import enum
+import functools
 import math
+import time
 from dataclasses import dataclass
-from typing import List, Iterable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
 from typing import Set
 from typing import Tuple
 
 import numpy as np
 
+from raytracer import animation
+from raytracer import antialiasing
+from raytracer import bvh
+from raytracer import fastpath
 from raytracer import geometry
+from raytracer import incremental
 from raytracer import performance
+from raytracer import shadowmap
 from raytracer.color import Color
+from raytracer.color import ColorBuffer
+from raytracer.fastpath import Vec3
+from raytracer.framebuffer import FramebufferRef
+from raytracer.framebuffer import SharedFramebuffer
+from raytracer.heatmap import Cost
+from raytracer.heatmap import Heatmap
 from raytracer.image import Image
 from raytracer.material import Material
 from raytracer import material
-from raytracer.performance import parallel
+from raytracer.performance import RenderPool
+
+DEFAULT_MAX_DEPTH = 5
+
+
+class Engine(enum.Enum):
+    # one ray at a time through `geometry.Ray`
+    SCALAR = "scalar"
+    # all primary rays at once through `Shape.intersections_ks`
+    BATCH = "batch"
+    # one ray at a time on plain floats through `raytracer.fastpath`
+    FAST = "fast"
+    # like batch, but reflected rays are traced at once too, bounce by bounce
+    WAVEFRONT = "wavefront"
+
+
+class Shadows(enum.Enum):
+    # segment from the point to the light is intersected with all bodies
+    EXACT = "exact"
+    # depth cube map is built once per light and looked up with a bias
+    MAP = "map"
 
 
 @dataclass(frozen=True)
@@ -29,6 +70,29 @@ class PointOnBody:
     body: Body
 
 
+@dataclass(frozen=True)
+class IncrementalRender:
+    # result of `Scene.render_incremental`, pass it to the next call
+    scene: Scene
+    image: Image
+    dependencies: incremental.Dependencies
+    num_traced_pixels: int
+
+
+@dataclass(frozen=True)
+class GBuffer:
+    # result of `Scene.render_gbuffer`, per pixel in row-major order: the first
+    # hit that isn't on a mirror (after following mirror reflections), so
+    # lights can be changed without tracing primary & reflected rays again
+    scene: Scene
+    # (N, 3) hit points, nan if the pixel shows the sky
+    points: np.ndarray
+    # (N,) indices of hit bodies, -1 if the pixel shows the sky
+    body_indices: np.ndarray
+    # (N, 3) uint8 rgb of the material at the hit point before lighting
+    base_colors: np.ndarray
+
+
 @dataclass(frozen=True)
 class Scene:
     bodies: List[Body]
@@ -39,42 +103,749 @@ class Scene:
     width: int
     height: int
 
+    shadows: Shadows = Shadows.EXACT
+    # rays that went through max_depth - 1 reflections get the sky color
+    max_depth: int = DEFAULT_MAX_DEPTH
+
     def __iter__(self):
         return iter(self.bodies)
 
     @performance.timed
-    def render(self) -> Image:
-        image = Image(self.width, self.height)
-        points = self._points_on_screen()
-        for point, color in parallel(self._get_colored_points, points, num_processes=6):
-            _draw(color, image, point)
+    def render(
+        self,
+        engine: Engine = Engine.SCALAR,
+        num_processes: Optional[int] = None,
+        tile_size: Optional[int] = None,
+        pool: Optional[RenderPool] = None,
+        samples: int = 1,
+        stats: Optional[performance.Stats] = None,
+        heatmap: Optional[Heatmap] = None,
+    ) -> Image:
+        # pass long-lived pool to render many scenes in a row,
+        # otherwise temporary pool with num_processes workers is used,
+        # samples > 1 is the max number of rays per pixel on the edges of bodies,
+        # stats of all workers are added to `stats` if it's passed,
+        # per pixel costs are recorded into `heatmap` if it's passed
+        image, num_rays = self._render(
+            engine, num_processes, tile_size, pool, samples, stats, heatmap
+        )
+        if samples > 1:
+            num_uniform_rays = self.width * self.height * samples
+            _report_antialiasing(num_rays, num_uniform_rays)
         return image
 
-    def _get_colored_points(
-        self, points: List[geometry.Point]
-    ) -> List[Tuple[geometry.Point, Color]]:
-        result = []
-        for point in points:
-            result.append((point, self._get_color(point)))
-        return result
+    def _render(
+        self,
+        engine: Engine,
+        num_processes: Optional[int],
+        tile_size: Optional[int],
+        pool: Optional[RenderPool],
+        samples: int,
+        stats: Optional[performance.Stats] = None,
+        heatmap: Optional[Heatmap] = None,
+    ) -> Tuple[Image, int]:
+        # returns image & number of traced primary rays
+        if heatmap is not None and samples > 1:
+            raise ValueError("heatmap can't be recorded with antialiasing")
+        antialiasing.check_samples(samples)
+        with contextlib.ExitStack() as stack:
+            if pool is None:
+                pool = stack.enter_context(RenderPool(num_processes))
+            if tile_size is None:
+                tile_size = performance.get_tile_size(
+                    self.width, self.height, pool.num_processes
+                )
+            tiles = performance.make_tiles(self.width, self.height, tile_size)
+            self._prepare()
+            framebuffer = stack.enter_context(
+                SharedFramebuffer(self.width, self.height)
+            )
+            cost_buffer = None
+            if heatmap is not None:
+                cost_buffer = stack.enter_context(
+                    SharedFramebuffer(self.width, self.height, 1, "float64")
+                )
+            draw_tile = functools.partial(
+                Scene._draw_tile,
+                engine=engine,
+                framebuffer=framebuffer.ref,
+                samples=samples,
+                cost=None if heatmap is None else heatmap.cost,
+                cost_buffer=None if cost_buffer is None else cost_buffer.ref,
+            )
+            # workers draw tiles right into the framebuffer
+            if stats is None:
+                num_rays = sum(pool.imap_unordered(draw_tile, self, tiles))
+            else:
+                num_rays = 0
+                counting_draw_tile = performance.counting(draw_tile)
+                for tile_rays, tile_stats in pool.imap_unordered(
+                    counting_draw_tile, self, tiles
+                ):
+                    num_rays += tile_rays
+                    stats.merge(tile_stats)
+            if heatmap is not None:
+                heatmap.costs = cost_buffer.to_array()[..., 0]
+            return framebuffer.to_image(), num_rays
+
+    def _prepare(self) -> None:
+        # cached properties are built once here instead of being built in every worker
+        self._bvh
+        self._shadow_maps
+
+    def _draw_tile(
+        self,
+        tile: performance.Tile,
+        engine: Engine,
+        framebuffer: FramebufferRef,
+        samples: int = 1,
+        cost: Optional[Cost] = None,
+        cost_buffer: Optional[FramebufferRef] = None,
+    ) -> int:
+        # returns number of traced rays
+        if cost is not None:
+            colors, costs = self._get_tile_colors_and_costs(tile, engine, cost)
+            cost_buffer.write(tile, costs[..., np.newaxis])
+            num_rays = len(tile)
+        elif samples > 1:
+            colors, num_rays = self._get_antialiased_tile_colors(tile, engine, samples)
+        else:
+            colors, num_rays = self._get_tile_colors(tile, engine), len(tile)
+        if performance.active_stats is not None:
+            performance.active_stats.primary_rays += num_rays
+        framebuffer.write(tile, colors)
+        return num_rays
+
+    def _get_tile_colors_and_costs(
+        self, tile: performance.Tile, engine: Engine, cost: Cost
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # pixels are traced one by one to measure them, so it's slower than
+        # `_get_tile_colors`, especially with the batch engine
+        points = np.array(self._points_on_tile(tile))
+        colors = np.empty((len(points), 3), dtype=np.uint8)
+        costs = np.empty(len(points))
+        trace = performance.counting(self._get_points_colors)
+        for i in range(len(points)):
+            started_at = time.perf_counter()
+            [colors[i]], stats = trace(points[i : i + 1], engine)
+            if cost is Cost.TIME:
+                costs[i] = time.perf_counter() - started_at
+            else:
+                costs[i] = sum(stats.intersection_tests.values())
+        return (
+            colors.reshape(tile.height, tile.width, 3),
+            costs.reshape(tile.height, tile.width),
+        )
+
+    def _get_antialiased_tile_colors(
+        self, tile: performance.Tile, engine: Engine, samples: int
+    ) -> Tuple[np.ndarray, int]:
+        # tile is traced with 1 pixel margin to find edges on tile borders,
+        # then pixels on edges are traced again with subpixel rays
+        margin = self._get_tile_with_margin(tile)
+        points = np.array(self._points_on_tile(margin))
+        colors, body_indices = self._get_points_colors_and_body_indices(points, engine)
+        inner = (
+            slice(tile.y - margin.y, tile.y - margin.y + tile.height),
+            slice(tile.x - margin.x, tile.x - margin.x + tile.width),
+        )
+        colors = colors.reshape(margin.height, margin.width, 3)
+        edges = antialiasing.find_edges(
+            colors, body_indices.reshape(margin.height, margin.width)
+        )[inner]
+        colors = colors[inner].copy()
+        ys, xs = np.nonzero(edges)
+        offsets = antialiasing.get_subpixel_offsets(samples)
+        subpixels = np.zeros((len(ys), len(offsets), 3))
+        subpixels[:, :, 0] = (xs + tile.x)[:, np.newaxis] + offsets[:, 0]
+        subpixels[:, :, 1] = (ys + tile.y)[:, np.newaxis] + offsets[:, 1]
+        subpixel_colors = self._get_points_colors(subpixels.reshape(-1, 3), engine)
+        colors[ys, xs] = antialiasing.average(
+            subpixel_colors.reshape(len(ys), len(offsets), 3)
+        )
+        return colors, len(points) + len(subpixel_colors)
+
+    def _get_tile_with_margin(self, tile: performance.Tile) -> performance.Tile:
+        x = max(tile.x - 1, 0)
+        y = max(tile.y - 1, 0)
+        return performance.Tile(
+            x,
+            y,
+            min(tile.x + tile.width + 1, self.width) - x,
+            min(tile.y + tile.height + 1, self.height) - y,
+        )
+
+    def render_progressive(
+        self, deadline: float, engine: Engine = Engine.BATCH
+    ) -> Iterator[Image]:
+        # deadline is a time budget in seconds, coarse image is yielded first and
+        # then every pass halves the distance between traced pixels, the last
+        # yielded image is the best one that was traced within the budget
+        finish_at = time.monotonic() + deadline
+        self._prepare()
+        pixels = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        traced = np.zeros((self.height, self.width), dtype=bool)
+        step = _PROGRESSIVE_MAX_STEP
+        while step >= 1:
+            ys, xs = np.nonzero(~traced[::step, ::step])
+            ys, xs = ys * step, xs * step
+            for start in range(0, len(ys), _PROGRESSIVE_CHUNK_SIZE):
+                # coarse pass is always finished, so there's something to show
+                if step < _PROGRESSIVE_MAX_STEP and time.monotonic() >= finish_at:
+                    if start:
+                        yield Image.from_array(_fill_untraced(pixels, traced, step * 2))
+                    return
+                chunk = slice(start, start + _PROGRESSIVE_CHUNK_SIZE)
+                points = np.stack([xs[chunk], ys[chunk], np.zeros(len(ys[chunk]))], 1)
+                pixels[ys[chunk], xs[chunk]] = self._get_points_colors(points, engine)
+                traced[ys[chunk], xs[chunk]] = True
+            yield Image.from_array(_fill_untraced(pixels, traced, step))
+            step //= 2
+
+    def render_incremental(
+        self,
+        previous: Optional[IncrementalRender] = None,
+        engine: Engine = Engine.FAST,
+        num_processes: Optional[int] = None,
+        pool: Optional[RenderPool] = None,
+    ) -> IncrementalRender:
+        # bodies that every pixel depends on are recorded, so after body edits
+        # (previous render is of the scene before the edits) only pixels that
+        # depend on the changed bodies are traced again, other changes
+        # (camera, lights, shadow maps, ...) trace all pixels
+        if engine in (Engine.BATCH, Engine.WAVEFRONT):
+            raise ValueError("incremental render supports scalar & fast engines")
+        num_pixels = self.width * self.height
+        pixels = np.empty((num_pixels, 3), dtype=np.uint8)
+        dirty = np.arange(num_pixels)
+        dependencies = incremental.Dependencies.concatenate([])
+        diff = None
+        if previous is not None and self._has_same_view(previous.scene):
+            diff = incremental.diff_bodies(previous.scene.bodies, self.bodies)
+        # shadow maps depend on all bodies
+        if diff is not None and self.shadows is Shadows.MAP and (diff[0] or diff[2]):
+            diff = None
+        if diff is not None:
+            removed, kept, added = diff
+            pixels[:] = previous.image.to_array().reshape(-1, 3)
+            dirty = previous.dependencies.get_dirty_pixels(
+                removed, [self.bodies[index].shape for index in added]
+            )
+            dependencies = previous.dependencies.without_pixels(
+                dirty
+            ).with_body_indices(kept)
+        chunks = [
+            dirty[start : start + _INCREMENTAL_CHUNK_SIZE]
+            for start in range(0, len(dirty), _INCREMENTAL_CHUNK_SIZE)
+        ]
+        traced = [dependencies]
+        with contextlib.ExitStack() as stack:
+            if pool is None:
+                pool = stack.enter_context(RenderPool(num_processes))
+            self._prepare()
+            trace = functools.partial(Scene._trace_pixels, engine=engine)
+            for chunk, colors, chunk_dependencies in pool.imap_unordered(
+                trace, self, chunks
+            ):
+                pixels[chunk] = colors
+                traced.append(chunk_dependencies)
+        return IncrementalRender(
+            scene=self,
+            image=Image.from_array(pixels.reshape(self.height, self.width, 3)),
+            dependencies=incremental.Dependencies.concatenate(traced),
+            num_traced_pixels=len(dirty),
+        )
+
+    def _trace_pixels(
+        self, pixels: np.ndarray, engine: Engine
+    ) -> Tuple[np.ndarray, np.ndarray, incremental.Dependencies]:
+        # traces flat pixel indices one by one and records their dependencies,
+        # returns pixels, (N, 3) uint8 array of rgb and dependencies
+        colors = []
+        with incremental.tracking(incremental.Tracker()) as tracker:
+            for pixel in pixels.tolist():
+                tracker.pixel = pixel
+                y, x = divmod(pixel, self.width)
+                if engine is Engine.FAST:
+                    colors.append(self._get_fast_color(Vec3(float(x), float(y), 0.0)))
+                else:
+                    colors.append(self._get_color(geometry.make_point(x, y, 0)))
+        rgbs = ColorBuffer.from_colors(colors).rgbs
+        return pixels, rgbs, tracker.to_dependencies()
+
+    def render_animation(
+        self,
+        cameras: Iterable[geometry.Point],
+        engine: Engine = Engine.FAST,
+        num_processes: Optional[int] = None,
+        pool: Optional[RenderPool] = None,
+        validation_rate: float = 0.02,
+    ) -> Iterator[animation.Frame]:
+        # frame for every camera position, hit points of the previous frame are
+        # reprojected into the new view, so only disoccluded pixels, edges of
+        # bodies & colors, mirrors (their color depends on the view) and
+        # validation sample of reprojected pixels are traced, frame is traced from
+        # scratch if too many reprojected pixels of the sample have wrong colors
+        num_pixels = self.width * self.height
+        mirror_indices = [
+            index
+            for index, body in enumerate(self)
+            if isinstance(body.material, material.Mirror)
+        ]
+        previous = None
+        with contextlib.ExitStack() as stack:
+            if pool is None:
+                pool = stack.enter_context(RenderPool(num_processes))
+            for index, camera in enumerate(cameras):
+                frame_scene = dataclasses.replace(self, camera=camera)
+                frame_scene._prepare()
+                if previous is None:
+                    colors, body_indices, points = frame_scene._trace_hits(
+                        np.arange(num_pixels), engine, pool
+                    )
+                    num_traced = num_pixels
+                else:
+                    colors, body_indices, points, num_traced = (
+                        frame_scene._reproject_and_trace(
+                            *previous,
+                            engine,
+                            pool,
+                            mirror_indices,
+                            validation_rate,
+                            np.random.default_rng(index),
+                        )
+                    )
+                previous = colors, body_indices, points
+                image = Image.from_array(colors.reshape(self.height, self.width, 3))
+                yield animation.Frame(index, camera, image, num_traced)
+
+    def _reproject_and_trace(
+        self,
+        colors: np.ndarray,
+        body_indices: np.ndarray,
+        points: np.ndarray,
+        engine: Engine,
+        pool: RenderPool,
+        mirror_indices: List[int],
+        validation_rate: float,
+        rng: np.random.Generator,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        # returns colors, body indices & points of the new frame and number of
+        # traced pixels
+        colors, body_indices, _ = animation.reproject(
+            points, colors, body_indices, self.camera, self.width, self.height
+        )
+        # reprojected points are up to half a pixel away from the rays of their
+        # pixels, so they're moved onto the rays, otherwise the error accumulates
+        # from frame to frame, pixels whose rays miss their bodies are traced
+        points = self._get_hits_on_bodies(body_indices)
+        body_indices[np.isnan(points).any(axis=1)] = -1
+        shape = (self.height, self.width)
+        traced = (
+            (body_indices < 0)
+            | np.isin(body_indices, mirror_indices)
+            | antialiasing.find_edges(
+                colors.reshape(*shape, 3), body_indices.reshape(shape)
+            ).ravel()
+        )
+        sample = ~traced & (rng.random(len(traced)) < validation_rate)
+        pixels = np.flatnonzero(traced | sample)
+        reprojected_colors = colors[sample]
+        traced_colors, traced_body_indices, traced_points = self._trace_hits(
+            pixels, engine, pool
+        )
+        colors[pixels] = traced_colors
+        body_indices[pixels] = traced_body_indices
+        points[pixels] = traced_points
+        diff = np.abs(colors[sample].astype(int) - reprojected_colors).max(axis=1)
+        mismatches = diff > animation.MISMATCH_THRESHOLD
+        if len(mismatches) and mismatches.mean() > animation.MAX_MISMATCH_SHARE:
+            rest = np.setdiff1d(np.arange(len(colors)), pixels)
+            colors[rest], body_indices[rest], points[rest] = self._trace_hits(
+                rest, engine, pool
+            )
+            pixels = np.arange(len(colors))
+        return colors, body_indices, points, len(pixels)
+
+    def _get_hits_on_bodies(self, body_indices: np.ndarray) -> np.ndarray:
+        # (N, 3) closest hits of primary rays of all pixels with the given
+        # bodies (-1 is none), nan if the ray misses its body
+        ys, xs = np.divmod(np.arange(len(body_indices)), self.width)
+        screen_points = np.stack([xs, ys, np.zeros(len(xs))], axis=1).astype(float)
+        directions = screen_points - self.camera
+        ks = np.full(len(body_indices), np.nan)
+        for index in np.unique(body_indices[body_indices >= 0]).tolist():
+            lanes = np.flatnonzero(body_indices == index)
+            body_ks = self.bodies[index].shape.intersections_ks(
+                np.broadcast_to(self.camera, (len(lanes), 3)), directions[lanes]
+            )
+            # fmin ignores nan
+            ks[lanes] = np.fmin.reduce(np.where(body_ks >= 0, body_ks, np.nan), axis=1)
+        return geometry.points_at(self.camera, directions, ks)
+
+    def _trace_hits(
+        self, pixels: np.ndarray, engine: Engine, pool: RenderPool
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # traces flat pixel indices in the workers, returns (N, 3) colors,
+        # (N,) indices of bodies that primary rays hit (-1 if none) and
+        # (N, 3) hit points (nan if none)
+        colors = np.empty((len(pixels), 3), dtype=np.uint8)
+        body_indices = np.empty(len(pixels), dtype=np.int64)
+        points = np.empty((len(pixels), 3))
+        chunks = [
+            (start, pixels[start : start + _ANIMATION_CHUNK_SIZE])
+            for start in range(0, len(pixels), _ANIMATION_CHUNK_SIZE)
+        ]
+        trace = functools.partial(Scene._trace_chunk_hits, engine=engine)
+        for (
+            start,
+            chunk_colors,
+            chunk_body_indices,
+            chunk_points,
+        ) in pool.imap_unordered(trace, self, chunks):
+            end = start + len(chunk_colors)
+            colors[start:end] = chunk_colors
+            body_indices[start:end] = chunk_body_indices
+            points[start:end] = chunk_points
+        return colors, body_indices, points
+
+    def _trace_chunk_hits(
+        self, chunk: Tuple[int, np.ndarray], engine: Engine
+    ) -> Tuple[int, np.ndarray, np.ndarray, np.ndarray]:
+        # chunk is the start of pixels in the whole list & the pixels
+        start, pixels = chunk
+        ys, xs = np.divmod(pixels, self.width)
+        screen_points = np.stack([xs, ys, np.zeros(len(xs))], axis=1).astype(float)
+        colors = self._get_points_colors(screen_points, engine)
+        directions = screen_points - self.camera
+        ks, body_indices = self._get_closest_hits(
+            np.broadcast_to(self.camera, screen_points.shape), directions
+        )
+        hits = geometry.points_at(
+            self.camera, directions, np.where(ks == np.inf, np.nan, ks)
+        )
+        return start, colors, body_indices, hits
+
+    def render_gbuffer(
+        self,
+        num_processes: Optional[int] = None,
+        pool: Optional[RenderPool] = None,
+    ) -> GBuffer:
+        # primary rays are traced in batches, rays that hit mirrors follow
+        # their reflections one by one
+        num_pixels = self.width * self.height
+        points = np.empty((num_pixels, 3))
+        body_indices = np.empty(num_pixels, dtype=np.int64)
+        base_colors = np.empty((num_pixels, 3), dtype=np.uint8)
+        chunks = range(0, num_pixels, _GBUFFER_CHUNK_SIZE)
+        with contextlib.ExitStack() as stack:
+            if pool is None:
+                pool = stack.enter_context(RenderPool(num_processes))
+            self._prepare()
+            for (
+                start,
+                chunk_points,
+                chunk_body_indices,
+                chunk_base_colors,
+            ) in pool.imap_unordered(Scene._trace_chunk_gbuffer, self, chunks):
+                end = start + len(chunk_points)
+                points[start:end] = chunk_points
+                body_indices[start:end] = chunk_body_indices
+                base_colors[start:end] = chunk_base_colors
+        return GBuffer(self, points, body_indices, base_colors)
+
+    def _trace_chunk_gbuffer(
+        self, start: int
+    ) -> Tuple[int, np.ndarray, np.ndarray, np.ndarray]:
+        # pixels from start to start + _GBUFFER_CHUNK_SIZE
+        pixels = np.arange(
+            start, min(start + _GBUFFER_CHUNK_SIZE, self.width * self.height)
+        )
+        ys, xs = np.divmod(pixels, self.width)
+        screen_points = np.stack([xs, ys, np.zeros(len(xs))], axis=1).astype(float)
+        directions = screen_points - self.camera
+        ks, body_indices = self._get_closest_hits(
+            np.broadcast_to(self.camera, screen_points.shape), directions
+        )
+        points = geometry.points_at(
+            self.camera, directions, np.where(ks == np.inf, np.nan, ks)
+        )
+        for index, body in enumerate(self.bodies):
+            if not isinstance(body.material, material.Mirror):
+                continue
+            for lane in np.flatnonzero(body_indices == index).tolist():
+                ray = geometry.make_ray(self.camera, screen_points[lane])
+                pob = None
+                with contextlib.suppress(geometry.ImpossibleReflection):
+                    pob = self._get_final_hit(
+                        _reflect(ray, PointOnBody(points[lane], body)), {id(body)}, 1
+                    )
+                if pob is None:
+                    points[lane] = np.nan
+                    body_indices[lane] = -1
+                else:
+                    points[lane] = pob.point
+                    body_indices[lane] = self._body_indices[id(pob.body)]
+        base_colors = ColorBuffer.filled(self._sky_color, len(pixels)).rgbs
+        for index in np.unique(body_indices[body_indices >= 0]).tolist():
+            lanes = np.flatnonzero(body_indices == index)
+            base_colors[lanes] = (
+                self.bodies[index].material.get_colors(points[lanes]).rgbs
+            )
+        return start, points, body_indices, base_colors
+
+    def relight(self, gbuffer: GBuffer) -> Image:
+        # renders the scene from the g-buffer of the scene that differs only
+        # in lights & shadows, only shadows & light falloff are computed
+        if not (
+            self._has_same_geometry(gbuffer.scene)
+            and self.max_depth == gbuffer.scene.max_depth
+        ):
+            raise ValueError("g-buffer is of the scene with other bodies or view")
+        self._prepare()
+        colors = gbuffer.base_colors.copy()
+        lanes = np.flatnonzero(gbuffer.body_indices >= 0)
+        coeffs = self._lightning_coeffs(gbuffer.points[lanes])
+        colors[lanes] = (ColorBuffer(colors[lanes]) * coeffs).rgbs
+        return Image.from_array(colors.reshape(self.height, self.width, 3))
+
+    def _has_same_geometry(self, other: Scene) -> bool:
+        # same bodies seen from the same camera
+        return (
+            self.width == other.width
+            and self.height == other.height
+            and np.array_equal(self.camera, other.camera)
+            and len(self.bodies) == len(other.bodies)
+            and all(a is b for a, b in zip(self.bodies, other.bodies))
+        )
+
+    def _has_same_view(self, other: Scene) -> bool:
+        # everything except bodies is the same
+        return (
+            self.width == other.width
+            and self.height == other.height
+            and self.shadows is other.shadows
+            and self.max_depth == other.max_depth
+            and np.array_equal(self.camera, other.camera)
+            and len(self.lights) == len(other.lights)
+            and all(np.array_equal(a, b) for a, b in zip(self.lights, other.lights))
+        )
+
+    def _get_tile_colors(self, tile: performance.Tile, engine: Engine) -> np.ndarray:
+        # returns (tile.height, tile.width, 3) uint8 array of rgb
+        points = np.array(self._points_on_tile(tile))
+        colors = self._get_points_colors(points, engine)
+        return colors.reshape(tile.height, tile.width, 3)
+
+    def _get_points_colors(self, points: np.ndarray, engine: Engine) -> np.ndarray:
+        # returns (N, 3) uint8 array of rgb
+        if engine is Engine.BATCH:
+            colors, _ = self._get_colors(points)
+            return colors
+        if engine is Engine.WAVEFRONT:
+            colors, _ = self._get_wavefront_colors(points)
+            return colors
+        if engine is Engine.FAST:
+            colors = (self._get_fast_color(Vec3(*p)) for p in points.tolist())
+            return ColorBuffer.from_colors(colors).rgbs
+        return ColorBuffer.from_colors(self._get_color(p) for p in points).rgbs
+
+    def _get_points_colors_and_body_indices(
+        self, points: np.ndarray, engine: Engine
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # same as `_get_points_colors`, also returns (N,) indices of the bodies
+        # hit by the primary rays (-1 if none)
+        if engine is Engine.BATCH:
+            return self._get_colors(points)
+        if engine is Engine.WAVEFRONT:
+            return self._get_wavefront_colors(points)
+        if engine is Engine.FAST:
+            hits = [
+                self._get_fast_color_and_body_index(Vec3(*p)) for p in points.tolist()
+            ]
+        else:
+            hits = [self._get_color_and_body_index(p) for p in points]
+        colors = ColorBuffer.from_colors(color for color, _ in hits).rgbs
+        return colors, np.array([index for _, index in hits], dtype=int)
+
+    def _get_colors(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # batched version of `_get_color`, returns (N, 3) array of rgb and
+        # indices of the bodies hit by the primary rays
+        directions = points - self.camera
+        ks, body_indices = self._get_closest_hits(
+            np.broadcast_to(self.camera, points.shape), directions
+        )
+        hits = geometry.points_at(
+            self.camera, directions, np.where(ks == np.inf, 0, ks)
+        )
+        colors = ColorBuffer.filled(self._sky_color, len(points)).rgbs
+        for index, body in enumerate(self.bodies):
+            lanes = np.flatnonzero(body_indices == index)
+            if not len(lanes):
+                continue
+            if isinstance(body.material, material.Mirror):
+                mirror_colors = [
+                    self._get_mirror_color(
+                        geometry.make_ray(self.camera, points[lane]),
+                        PointOnBody(hits[lane], body),
+                        0,
+                    )
+                    for lane in lanes
+                ]
+                colors[lanes] = ColorBuffer.from_colors(mirror_colors).rgbs
+            else:
+                colors[lanes] = self._get_points_on_body_colors(body, hits[lanes]).rgbs
+        return colors, body_indices
+
+    def _get_wavefront_colors(
+        self, points: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # same as `_get_colors`, but rays that hit mirrors aren't traced one by
+        # one: all rays of the bounce are traced together, then rays that hit
+        # mirrors are reflected and only they are traced at the next bounce
+        colors = ColorBuffer.filled(self._sky_color, len(points)).rgbs
+        primary_body_indices = np.full(len(points), -1)
+        # indices of the pixels of active rays
+        lanes = np.arange(len(points))
+        origins = np.broadcast_to(self.camera, points.shape)
+        directions = points - self.camera
+        # ray reflected from the mirror doesn't hit it again
+        excluded_body_indices = None
+        stats = performance.active_stats
+        for depth in range(self.max_depth):
+            if not len(lanes):
+                break
+            if stats is not None and depth:
+                stats.reflection_rays += len(lanes)
+                stats.count_depth(depth)
+            ks, body_indices = self._get_closest_hits(
+                origins, directions, excluded_body_indices
+            )
+            if not depth:
+                primary_body_indices = body_indices
+            hits = geometry.points_at(
+                origins, directions, np.where(ks == np.inf, 0, ks)
+            )
+            reflected = []
+            for index in np.unique(body_indices[body_indices >= 0]).tolist():
+                body = self.bodies[index]
+                body_lanes = np.flatnonzero(body_indices == index)
+                if not isinstance(body.material, material.Mirror):
+                    colors[lanes[body_lanes]] = self._get_points_on_body_colors(
+                        body, hits[body_lanes]
+                    ).rgbs
+                    continue
+                mirror_origins, mirror_directions, valid = geometry.reflections(
+                    origins[body_lanes], hits[body_lanes], body.shape
+                )
+                # impossible reflections get the sky color
+                reflected.append(
+                    (body_lanes[valid], mirror_origins[valid], mirror_directions[valid])
+                )
+            if not reflected:
+                break
+            # only reflected rays stay active
+            active, origins, directions = (
+                np.concatenate(parts) for parts in zip(*reflected)
+            )
+            lanes = lanes[active]
+            excluded_body_indices = body_indices[active]
+        return colors, primary_body_indices
+
+    def _get_closest_hits(
+        self,
+        points: np.ndarray,
+        directions: np.ndarray,
+        excluded_body_indices: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # batched version of `_get_points_on_bodies` + `_closest`,
+        # returns ks of the closest hits (inf if none) and indices of hit bodies (-1 if none),
+        # line can skip the body with its index in excluded_body_indices
+        best_ks = np.full(len(points), np.inf)
+        best_distances = np.full(len(points), np.inf)
+        body_indices = np.full(len(points), -1)
+
+        def intersect(index: int, lanes: np.ndarray) -> None:
+            if excluded_body_indices is not None:
+                lanes = lanes[excluded_body_indices[lanes] != index]
+            line_points = points[lanes]
+            line_directions = directions[lanes]
+            shape = self.bodies[index].shape
+            if performance.active_stats is not None:
+                performance.active_stats.count_intersection_tests(shape, len(lanes))
+            for ks in shape.intersections_ks(line_points, line_directions).T:
+                intersections = geometry.points_at(line_points, line_directions, ks)
+                distances = geometry.norm(intersections - line_points)
+                # ties are resolved in favor of the first body
+                closer = (ks >= 0) & (
+                    (distances < best_distances[lanes])
+                    | (
+                        (distances == best_distances[lanes])
+                        & (index < body_indices[lanes])
+                    )
+                )
+                best_ks[lanes[closer]] = ks[closer]
+                best_distances[lanes[closer]] = distances[closer]
+                body_indices[lanes[closer]] = index
+
+        all_lanes = np.arange(len(points))
+        for index in self._unbounded_body_indices:
+            intersect(index, all_lanes)
+        for items, lanes in self._bvh.iter_leaves(
+            points, directions, (0, None), best_ks
+        ):
+            for index in items:
+                intersect(index, lanes)
+        return best_ks, body_indices
+
+    def _get_points_on_body_colors(self, body: Body, points: np.ndarray) -> ColorBuffer:
+        # batched version of `_get_point_on_body_color`
+        return body.material.get_colors(points) * self._lightning_coeffs(points)
 
     def _get_color(self, point: geometry.Point) -> Color:
         ray = geometry.make_ray(self.camera, point)
         return self._get_color_from_ray(ray, set(), 0)
 
+    def _get_color_and_body_index(self, point: geometry.Point) -> Tuple[Color, int]:
+        # same as `_get_color`, also returns index of the body hit by the
+        # primary ray, -1 if none
+        ray = geometry.make_ray(self.camera, point)
+        if self.max_depth <= 0:
+            return self._sky_color, -1
+        hit = self._get_closest_hit(ray, set())
+        if hit is None:
+            return self._sky_color, -1
+        pob, index = hit
+        if isinstance(pob.body.material, material.Mirror):
+            return self._get_mirror_color(ray, pob, 0), index
+        return self._get_point_on_body_color(pob), index
+
     def _get_color_from_ray(
         self, ray: geometry.Ray, excluded_body_ids: Set[int], depth: int
     ) -> Color:
-        if depth == 5:
+        pob = self._get_final_hit(ray, excluded_body_ids, depth)
+        if pob is None:
             return self._sky_color
-        points_on_bodies = self._get_points_on_bodies(ray, excluded_body_ids)
-        if points_on_bodies:
-            pob = _closest(points_on_bodies, ray.point)
-            if isinstance(pob.body.material, material.Mirror):
-                return self._get_mirror_color(ray, pob, depth)
-            return self._get_point_on_body_color(pob)
+        return self._get_point_on_body_color(pob)
 
-        return self._sky_color
+    def _get_final_hit(
+        self, ray: geometry.Ray, excluded_body_ids: Set[int], depth: int
+    ) -> Optional[PointOnBody]:
+        # the first hit that isn't on a mirror, None if the ray ends in the sky
+        if depth >= self.max_depth:
+            return None
+        stats = performance.active_stats
+        if stats is not None and depth:
+            stats.reflection_rays += 1
+            stats.count_depth(depth)
+        pob = self._get_closest_point_on_body(ray, excluded_body_ids)
+        if pob is None or not isinstance(pob.body.material, material.Mirror):
+            return pob
+        try:
+            reflected = _reflect(ray, pob)
+        except geometry.ImpossibleReflection:
+            return None
+        return self._get_final_hit(reflected, {id(pob.body)}, depth + 1)
 
     def _get_mirror_color(
         self, ray: geometry.Ray, pob: PointOnBody, depth: int
@@ -91,15 +862,219 @@ class Scene:
         point = pob.point
         return body.material.get_color(point) * self._lightning_coeff(point)
 
-    def _get_points_on_bodies(self, ray, excluded_body_ids):
-        points_on_bodies = []
-        for body in self._iter_bodies(excluded_body_ids):
+    def _get_closest_point_on_body(
+        self, ray: geometry.Ray, excluded_body_ids: Set[int]
+    ) -> Optional[PointOnBody]:
+        hit = self._get_closest_hit(ray, excluded_body_ids)
+        return None if hit is None else hit[0]
+
+    def _get_closest_hit(
+        self, ray: geometry.Ray, excluded_body_ids: Set[int]
+    ) -> Optional[Tuple[PointOnBody, int]]:
+        # returns the closest point and index of its body
+        candidates: List[Tuple[float, int, PointOnBody]] = []
+        best = math.inf
+
+        def visit(index: int) -> float:
+            nonlocal best
+            body = self.bodies[index]
+            if id(body) in excluded_body_ids:
+                return best
+            if performance.active_stats is not None:
+                performance.active_stats.count_intersection_tests(body.shape)
             for p in body.shape.intersections(ray):
-                points_on_bodies.append(PointOnBody(p, body))
-        return points_on_bodies
+                distance = np.linalg.norm(p - ray.point)
+                candidates.append((distance, index, PointOnBody(p, body)))
+                best = min(best, distance)
+            return best
+
+        for index in self._unbounded_body_indices:
+            visit(index)
+        self._bvh.visit_closest(ray.point, ray.direction, ray.ks, visit)
+        tracker = incremental.active_tracker
+        if not candidates:
+            if tracker is not None:
+                tracker.add_segment(ray.point, ray.direction, math.inf)
+            return None
+        # ties are resolved in favor of the first body
+        _, index, pob = min(candidates, key=lambda candidate: candidate[:2])
+        if tracker is not None:
+            tracker.add_body(index)
+            tracker.add_segment(ray.point, pob.point - ray.point, 1)
+        return pob, index
+
+    def _get_fast_color(self, point: Vec3) -> Color:
+        # same as `_get_color`, but on `fastpath` primitives
+        ray = fastpath.make_ray(self._fast_camera, point)
+        return self._get_fast_color_from_ray(ray, set(), 0)
+
+    def _get_fast_color_and_body_index(self, point: Vec3) -> Tuple[Color, int]:
+        # same as `_get_color_and_body_index`, but on `fastpath` primitives
+        ray = fastpath.make_ray(self._fast_camera, point)
+        if self.max_depth <= 0:
+            return self._sky_color, -1
+        hit = self._get_fast_closest_point_on_body(ray, set())
+        if hit is None:
+            return self._sky_color, -1
+        point, index = hit
+        return self._get_fast_hit_color(ray, point, index, 0), index
+
+    def _get_fast_color_from_ray(
+        self, ray: fastpath.Ray, excluded_body_ids: Set[int], depth: int
+    ) -> Color:
+        if depth >= self.max_depth:
+            return self._sky_color
+        stats = performance.active_stats
+        if stats is not None and depth:
+            stats.reflection_rays += 1
+            stats.count_depth(depth)
+        hit = self._get_fast_closest_point_on_body(ray, excluded_body_ids)
+        if hit is None:
+            return self._sky_color
+        point, index = hit
+        return self._get_fast_hit_color(ray, point, index, depth)
+
+    def _get_fast_hit_color(
+        self, ray: fastpath.Ray, point: Vec3, index: int, depth: int
+    ) -> Color:
+        body = self.bodies[index]
+        if isinstance(body.material, material.Mirror):
+            try:
+                reflected = fastpath.reflect(ray, point, self._fast_shapes[index])
+            except geometry.ImpossibleReflection:
+                return self._sky_color
+            return self._get_fast_color_from_ray(reflected, {id(body)}, depth + 1)
+        return body.material.get_color(point) * self._fast_lightning_coeff(point)
+
+    def _get_fast_closest_point_on_body(
+        self, ray: fastpath.Ray, excluded_body_ids: Set[int]
+    ) -> Optional[Tuple[Vec3, int]]:
+        # returns the closest point and index of its body
+        closest: Optional[Tuple[float, int, Vec3]] = None
+        best = math.inf
+        stats = performance.active_stats
+
+        def visit(index: int) -> float:
+            nonlocal best, closest
+            if id(self.bodies[index]) in excluded_body_ids:
+                return best
+            shape = self._fast_shapes[index]
+            if stats is not None:
+                stats.count_intersection_tests(self.bodies[index].shape)
+            for p in shape.intersections(ray):
+                distance = (p - ray.point).norm()
+                # ties are resolved in favor of the first body
+                candidate = (distance, index, p)
+                if closest is None or candidate[:2] < closest[:2]:
+                    closest = candidate
+                best = min(best, distance)
+            return best
+
+        for index in self._unbounded_body_indices:
+            visit(index)
+        self._bvh.visit_closest(
+            ray.point.to_tuple(), ray.direction.to_tuple(), ray.ks, visit
+        )
+        tracker = incremental.active_tracker
+        if closest is None:
+            if tracker is not None:
+                tracker.add_segment(
+                    ray.point.to_tuple(), ray.direction.to_tuple(), math.inf
+                )
+            return None
+        _, index, point = closest
+        if tracker is not None:
+            tracker.add_body(index)
+            tracker.add_segment(ray.point.to_tuple(), (point - ray.point).to_tuple(), 1)
+        return point, index
+
+    def _fast_lightning_coeff(self, point: Vec3) -> float:
+        coeffs = []
+        lights = zip(self._fast_lights, self._shadow_maps)
+        for light, shadow_map in lights:
+            if self._fast_in_the_shadow(point, light, shadow_map):
+                coeffs.append(_get_shadow_lightning_coeff())
+            else:
+                coeffs.append(_get_fast_exposed_lightning_coeff(point, light))
+        return max(coeffs, default=1)
+
+    def _fast_in_the_shadow(
+        self,
+        point: Vec3,
+        light: Vec3,
+        shadow_map: Optional[shadowmap.ShadowMap] = None,
+    ) -> bool:
+        stats = performance.active_stats
+        if shadow_map is not None:
+            if stats is not None:
+                stats.shadow_map_lookups += 1
+            return shadow_map.in_the_shadow(point.to_point())
+        if stats is not None:
+            stats.shadow_rays += 1
+        segment = fastpath.make_line_segment(point, light)
+        tracker = incremental.active_tracker
+        if tracker is not None:
+            tracker.add_segment(
+                segment.point.to_tuple(), segment.direction.to_tuple(), 1
+            )
+
+        def blocks(index: int) -> bool:
+            if stats is not None:
+                stats.count_intersection_tests(self.bodies[index].shape)
+            intersections = self._fast_shapes[index].intersections(segment)
+            blocked = any(not _fast_close_points(i, point) for i in intersections)
+            if blocked and tracker is not None:
+                tracker.add_body(index)
+            return blocked
+
+        if any(blocks(index) for index in self._unbounded_body_indices):
+            return True
+        return self._bvh.any_hit(
+            segment.point.to_tuple(), segment.direction.to_tuple(), segment.ks, blocks
+        )
+
+    @functools.cached_property
+    def _fast_shapes(self) -> List[fastpath.Shape]:
+        return [fastpath.from_shape(body.shape) for body in self]
+
+    @functools.cached_property
+    def _fast_camera(self) -> Vec3:
+        return Vec3.from_point(np.asarray(self.camera))
 
-    def _iter_bodies(self, excluded_ids: Set[int]) -> Iterable[Body]:
-        return (body for body in self if id(body) not in excluded_ids)
+    @functools.cached_property
+    def _fast_lights(self) -> List[Vec3]:
+        return [Vec3.from_point(np.asarray(light)) for light in self.lights]
+
+    @functools.cached_property
+    def _bvh(self) -> bvh.Bvh:
+        indices = [i for i, body in enumerate(self) if body.shape.bounds is not None]
+        bounds = [self.bodies[i].shape.bounds for i in indices]
+        lows = np.array([low for low, _ in bounds]).reshape(-1, 3)
+        highs = np.array([high for _, high in bounds]).reshape(-1, 3)
+        return bvh.build(indices, lows, highs)
+
+    @functools.cached_property
+    def _shadow_maps(self) -> List[Optional[shadowmap.ShadowMap]]:
+        if self.shadows is Shadows.EXACT:
+            return [None for _ in self.lights]
+        return [
+            shadowmap.build(light, self._get_distances, shadowmap.DEFAULT_SIZE)
+            for light in self.lights
+        ]
+
+    def _get_distances(self, points: np.ndarray, directions: np.ndarray) -> np.ndarray:
+        ks, _ = self._get_closest_hits(points, directions)
+        return ks * geometry.norm(directions)
+
+    @functools.cached_property
+    def _body_indices(self) -> Dict[int, int]:
+        # id of the body -> its index
+        return {id(body): index for index, body in enumerate(self)}
+
+    @functools.cached_property
+    def _unbounded_body_indices(self) -> List[int]:
+        # unbounded shapes (planes) can't be put into bvh, so they're always tested
+        return [i for i, body in enumerate(self) if body.shape.bounds is None]
 
     @property
     def _sky_color(self):
@@ -107,55 +1082,167 @@ class Scene:
 
     def _lightning_coeff(self, point: geometry.Point) -> float:
         coeffs = []
-        for light in self.lights:
-            if self._in_the_shadow(point, light):
+        for light, shadow_map in zip(self.lights, self._shadow_maps):
+            if self._in_the_shadow(point, light, shadow_map):
                 coeffs.append(_get_shadow_lightning_coeff())
             else:
                 coeffs.append(_get_exposed_lightning_coeff(point, light))
 
         return max(coeffs, default=1)
 
-    def _in_the_shadow(self, point: geometry.Point, light: geometry.Point) -> bool:
+    def _lightning_coeffs(self, points: np.ndarray) -> np.ndarray:
+        # batched version of `_lightning_coeff`
+        coeffs = np.ones(len(points))
+        for i, (light, shadow_map) in enumerate(zip(self.lights, self._shadow_maps)):
+            light_coeffs = np.where(
+                self._in_the_shadows(points, light, shadow_map),
+                _get_shadow_lightning_coeff(),
+                _get_exposed_lightning_coeffs(points, light),
+            )
+            coeffs = light_coeffs if i == 0 else np.maximum(coeffs, light_coeffs)
+        return coeffs
+
+    def _in_the_shadows(
+        self,
+        points: np.ndarray,
+        light: geometry.Point,
+        shadow_map: Optional[shadowmap.ShadowMap] = None,
+    ) -> np.ndarray:
+        # batched version of `_in_the_shadow`
+        stats = performance.active_stats
+        if shadow_map is not None:
+            if stats is not None:
+                stats.shadow_map_lookups += len(points)
+            return shadow_map.in_the_shadows(points)
+        if stats is not None:
+            stats.shadow_rays += len(points)
+        directions = light - points
+        result = np.zeros(len(points), dtype=bool)
+        # lanes that are already in the shadow get negative max k to skip bvh nodes
+        max_ks = np.ones(len(points))
+
+        def block(index: int, lanes: np.ndarray) -> None:
+            segment_points = points[lanes]
+            segment_directions = directions[lanes]
+            shape = self.bodies[index].shape
+            if stats is not None:
+                stats.count_intersection_tests(shape, len(lanes))
+            for ks in shape.intersections_ks(segment_points, segment_directions).T:
+                intersections = geometry.points_at(
+                    segment_points, segment_directions, ks
+                )
+                far = (
+                    geometry.norm(intersections - segment_points)
+                    > _CLOSE_POINTS_TOLERANCE
+                )
+                blocked = lanes[(0 <= ks) & (ks <= 1) & far]
+                result[blocked] = True
+                max_ks[blocked] = -np.inf
+
+        all_lanes = np.arange(len(points))
+        for index in self._unbounded_body_indices:
+            block(index, all_lanes)
+        for items, lanes in self._bvh.iter_leaves(points, directions, (0, 1), max_ks):
+            for index in items:
+                block(index, lanes)
+        return result
+
+    def _in_the_shadow(
+        self,
+        point: geometry.Point,
+        light: geometry.Point,
+        shadow_map: Optional[shadowmap.ShadowMap] = None,
+    ) -> bool:
+        stats = performance.active_stats
+        if shadow_map is not None:
+            if stats is not None:
+                stats.shadow_map_lookups += 1
+            return shadow_map.in_the_shadow(point)
+        if stats is not None:
+            stats.shadow_rays += 1
         segment = geometry.make_line_segment(point, light)
-        for body in self:
-            for intersection in body.shape.intersections(segment):
-                if not _close_points(intersection, point):
-                    return True
-        return False
+        tracker = incremental.active_tracker
+        if tracker is not None:
+            tracker.add_segment(segment.point, segment.direction, 1)
+
+        def blocks(index: int) -> bool:
+            shape = self.bodies[index].shape
+            if stats is not None:
+                stats.count_intersection_tests(shape)
+            intersections = shape.intersections(segment)
+            blocked = any(not _close_points(i, point) for i in intersections)
+            if blocked and tracker is not None:
+                tracker.add_body(index)
+            return blocked
 
-    def _points_on_screen(self) -> List[geometry.Point]:
+        if any(blocks(index) for index in self._unbounded_body_indices):
+            return True
+        return self._bvh.any_hit(segment.point, segment.direction, segment.ks, blocks)
+
+    def _points_on_tile(self, tile: performance.Tile) -> List[geometry.Point]:
         return [
             geometry.make_point(x, y, 0)
-            for x in range(0, self.width)
-            for y in range(0, self.height)
+            for y in range(tile.y, tile.y + tile.height)
+            for x in range(tile.x, tile.x + tile.width)
         ]
 
 
-def _draw(color: Color, image: Image, point: geometry.Point) -> None:
-    x = int(geometry.get_x(point))
-    y = int(geometry.get_y(point))
-    image.set_pixel(x, y, color)
+_CLOSE_POINTS_TOLERANCE = 1e-3
+_PROGRESSIVE_MAX_STEP = 8
+_PROGRESSIVE_CHUNK_SIZE = 1024
+_INCREMENTAL_CHUNK_SIZE = 1024
+_ANIMATION_CHUNK_SIZE = 1024
+_GBUFFER_CHUNK_SIZE = 1024
+_MIN_DISTANCE_TO_DIM = 800
+
+
+def _report_antialiasing(num_rays: int, num_uniform_rays: int) -> None:
+    saved = 1 - num_rays / num_uniform_rays
+    print(
+        f"antialiasing traced {num_rays} rays instead of {num_uniform_rays},"
+        f" saved {saved:.1%}"
+    )
+
+
+def _fill_untraced(pixels: np.ndarray, traced: np.ndarray, step: int) -> np.ndarray:
+    # untraced pixels get the color of the closest traced pixel to the top left,
+    # pixels with coordinates divisible by step should be traced
+    height, width = traced.shape
+    coarse = pixels[::step, ::step].repeat(step, axis=0).repeat(step, axis=1)
+    return np.where(traced[..., np.newaxis], pixels, coarse[:height, :width])
 
 
 def _close_points(a: geometry.Point, b: geometry.Point):
-    return math.isclose(np.linalg.norm(b - a), 0, abs_tol=1e-3)
+    return math.isclose(np.linalg.norm(b - a), 0, abs_tol=_CLOSE_POINTS_TOLERANCE)
 
 
 def _get_exposed_lightning_coeff(point: geometry.Point, light: geometry.Point) -> float:
     d = np.linalg.norm(light - point)
-    min_distance_to_dim = 800
-    if d >= min_distance_to_dim:
-        return min_distance_to_dim / d
+    if d >= _MIN_DISTANCE_TO_DIM:
+        return _MIN_DISTANCE_TO_DIM / d
     return 1
 
 
-def _get_shadow_lightning_coeff() -> float:
-    return 0.5
+def _fast_close_points(a: Vec3, b: Vec3) -> bool:
+    return math.isclose((b - a).norm(), 0, abs_tol=_CLOSE_POINTS_TOLERANCE)
 
 
-def _closest(points_on_bodies: List[PointOnBody], point: geometry.Point) -> PointOnBody:
-    assert points_on_bodies
-    return min(points_on_bodies, key=lambda pb: np.linalg.norm(pb.point - point),)
+def _get_fast_exposed_lightning_coeff(point: Vec3, light: Vec3) -> float:
+    d = (light - point).norm()
+    if d >= _MIN_DISTANCE_TO_DIM:
+        return _MIN_DISTANCE_TO_DIM / d
+    return 1
+
+
+def _get_exposed_lightning_coeffs(
+    points: np.ndarray, light: geometry.Point
+) -> np.ndarray:
+    d = geometry.norm(light - points)
+    return np.where(d >= _MIN_DISTANCE_TO_DIM, _MIN_DISTANCE_TO_DIM / d, 1)
+
+
+def _get_shadow_lightning_coeff() -> float:
+    return 0.5
 
 
 def _reflect(ray: geometry.Ray, point_on_body: PointOnBody) -> geometry.Ray:
@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Union
+
+import numpy as np
+
+from raytracer import geometry
+from raytracer import material
+from raytracer import scene
+from raytracer.color import Color
+
+Path = Union[str, os.PathLike]
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "raytracer",
+    "scenes",
+)
+
+# bump when the compiled format changes, so stale cache entries aren't used
+_VERSION = 1
+
+# compiled bodies are rows of `params`: plane is (a, b, c, d), sphere is (x, y, z, r)
+_PLANE = 0
+_SPHERE = 1
+
+_PROJECTIONS = {
+    "xy": material.Checkered.project_to_local_xy,
+    "xz": material.Checkered.project_to_local_xz,
+    "yz": material.Checkered.project_to_local_yz,
+}
+
+
+class InvalidSceneError(Exception):
+    pass
+
+
+def load(path: Path, cache_dir: Optional[Path] = DEFAULT_CACHE_DIR) -> scene.Scene:
+    # .npz is loaded as is, .json is compiled on the first load and cached by
+    # the hash of its content, so repeat loads skip parsing, cache_dir=None
+    # disables the cache
+    if _is_compiled(path):
+        return load_compiled(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    if cache_dir is None:
+        return from_dict(_parse(data))
+    cached_path = os.path.join(cache_dir, f"{get_hash(data)}.npz")
+    if os.path.exists(cached_path):
+        return load_compiled(cached_path)
+    s = from_dict(_parse(data))
+    os.makedirs(cache_dir, exist_ok=True)
+    # concurrent loads of the same scene shouldn't see a half written file
+    tmp_path = f"{cached_path}.{os.getpid()}.tmp"
+    save_compiled(s, tmp_path)
+    os.replace(tmp_path, cached_path)
+    return s
+
+
+def save(s: scene.Scene, path: Path) -> None:
+    if _is_compiled(path):
+        save_compiled(s, path)
+    else:
+        with open(path, "w") as f:
+            json.dump(to_dict(s), f, indent=2)
+
+
+def get_hash(data: bytes) -> str:
+    return hashlib.sha256(f"{_VERSION}:".encode("ascii") + data).hexdigest()
+
+
+def from_dict(data: Dict[str, Any]) -> scene.Scene:
+    try:
+        materials = {
+            name: _make_material(description)
+            for name, description in data["materials"].items()
+        }
+        bodies = [
+            scene.Body(_make_shape(body["shape"]), materials[body["material"]])
+            for body in data["bodies"]
+        ]
+        return scene.Scene(
+            bodies=bodies,
+            camera=_make_vector(data["camera"], "camera"),
+            lights=[_make_vector(light, "light") for light in data["lights"]],
+            width=_get_positive_int(data["width"], "width"),
+            height=_get_positive_int(data["height"], "height"),
+            shadows=scene.Shadows(data.get("shadows", scene.Shadows.EXACT.value)),
+            max_depth=_get_positive_int(
+                data.get("max_depth", scene.DEFAULT_MAX_DEPTH), "max_depth"
+            ),
+        )
+    except (AttributeError, KeyError, TypeError, ValueError) as exc:
+        raise InvalidSceneError(f"invalid scene: {exc!r}") from exc
+
+
+def to_dict(s: scene.Scene) -> Dict[str, Any]:
+    names = _name_materials(s)
+    return {
+        "width": s.width,
+        "height": s.height,
+        "camera": _to_list(s.camera),
+        "lights": [_to_list(light) for light in s.lights],
+        "shadows": s.shadows.value,
+        "max_depth": s.max_depth,
+        "materials": {name: _describe_material(m) for m, name in names.items()},
+        "bodies": [
+            {"shape": _describe_shape(body.shape), "material": names[body.material]}
+            for body in s
+        ],
+    }
+
+
+def save_compiled(s: scene.Scene, path: Path) -> None:
+    names = _name_materials(s)
+    indices = {m: index for index, m in enumerate(names)}
+    header = {
+        "version": _VERSION,
+        "width": s.width,
+        "height": s.height,
+        "shadows": s.shadows.value,
+        "max_depth": s.max_depth,
+        "materials": [_describe_material(m) for m in names],
+    }
+    kinds = np.empty(len(s.bodies), dtype=np.uint8)
+    params = np.empty((len(s.bodies), 4))
+    for i, body in enumerate(s):
+        kinds[i], params[i] = _compile_shape(body.shape)
+    # file object, because np.savez adds .npz suffix to the paths without it
+    with open(path, "wb") as f:
+        np.savez(
+            f,
+            header=np.array(json.dumps(header)),
+            camera=np.asarray(s.camera, dtype=float),
+            lights=np.array(s.lights, dtype=float).reshape(-1, 3),
+            kinds=kinds,
+            params=params,
+            material_indices=np.array(
+                [indices[body.material] for body in s], dtype=np.int64
+            ),
+        )
+
+
+def load_compiled(path: Path) -> scene.Scene:
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(str(data["header"]))
+        if header["version"] != _VERSION:
+            raise InvalidSceneError(
+                f"{path} has unsupported version {header['version']}"
+            )
+        kinds = data["kinds"].tolist()
+        params = data["params"]
+        material_indices = data["material_indices"].tolist()
+        camera = data["camera"]
+        lights = list(data["lights"])
+    materials = [_make_material(description) for description in header["materials"]]
+    # row views and python floats are much faster to create than new arrays
+    vectors = list(params[:, :3])
+    scalars = params[:, 3].tolist()
+    bodies = []
+    for kind, vector, scalar, index in zip(kinds, vectors, scalars, material_indices):
+        if kind == _PLANE:
+            shape = geometry.Plane(vector, scalar)
+        else:
+            shape = geometry.Sphere(vector, scalar)
+        bodies.append(scene.Body(shape, materials[index]))
+    return scene.Scene(
+        bodies=bodies,
+        camera=camera,
+        lights=lights,
+        width=header["width"],
+        height=header["height"],
+        shadows=scene.Shadows(header["shadows"]),
+        max_depth=header["max_depth"],
+    )
+
+
+def _is_compiled(path: Path) -> bool:
+    return os.fspath(path).lower().endswith(".npz")
+
+
+def _parse(data: bytes) -> Dict[str, Any]:
+    try:
+        return json.loads(data)
+    except ValueError as exc:
+        raise InvalidSceneError(f"invalid scene: {exc}") from exc
+
+
+def _name_materials(s: scene.Scene) -> Dict[material.Material, str]:
+    # equal materials are stored once and shared by bodies after loading
+    names: Dict[material.Material, str] = {}
+    for body in s:
+        names.setdefault(body.material, f"material_{len(names)}")
+    return names
+
+
+def _make_material(description: Dict[str, Any]) -> material.Material:
+    kind = description["type"]
+    if kind == "monochrome":
+        return material.Monochrome(Color(*description["color"]))
+    if kind == "checkered":
+        return material.Checkered(
+            square_width=_get_number(
+                description["square_width"], "square_width", positive=True
+            ),
+            lighter=Color(*description["lighter"]),
+            darker=Color(*description["darker"]),
+            projection=_PROJECTIONS[description["projection"]],
+        )
+    if kind == "mirror":
+        return material.Mirror()
+    raise InvalidSceneError(f"unknown material type {kind!r}")
+
+
+def _describe_material(m: material.Material) -> Dict[str, Any]:
+    if isinstance(m, material.Monochrome):
+        return {"type": "monochrome", "color": _describe_color(m.color)}
+    if isinstance(m, material.Checkered):
+        [projection] = [name for name, fn in _PROJECTIONS.items() if fn == m.projection]
+        return {
+            "type": "checkered",
+            "square_width": _to_number(m.square_width),
+            "lighter": _describe_color(m.lighter),
+            "darker": _describe_color(m.darker),
+            "projection": projection,
+        }
+    if isinstance(m, material.Mirror):
+        return {"type": "mirror"}
+    raise InvalidSceneError(f"can't save material {m!r}")
+
+
+def _make_shape(description: Dict[str, Any]) -> geometry.Shape:
+    kind = description["type"]
+    if kind == "plane":
+        coeffs = _make_vector(description["coeffs"], "plane coeffs")
+        d = _get_number(description["d"], "plane d")
+        return geometry.make_plane(*coeffs.tolist(), d)
+    if kind == "sphere":
+        return geometry.Sphere(
+            _make_vector(description["center"], "sphere center"),
+            _get_number(description["radius"], "sphere radius", positive=True),
+        )
+    raise InvalidSceneError(f"unknown shape type {kind!r}")
+
+
+def _describe_shape(shape: geometry.Shape) -> Dict[str, Any]:
+    if isinstance(shape, geometry.Plane):
+        return {
+            "type": "plane",
+            "coeffs": _to_list(shape.coeffs),
+            "d": _to_number(shape.d),
+        }
+    if isinstance(shape, geometry.Sphere):
+        return {
+            "type": "sphere",
+            "center": _to_list(shape.center),
+            "radius": _to_number(shape.radius),
+        }
+    raise InvalidSceneError(f"can't save shape {shape!r}")
+
+
+def _compile_shape(shape: geometry.Shape) -> tuple:
+    if isinstance(shape, geometry.Plane):
+        return _PLANE, (*shape.coeffs, shape.d)
+    if isinstance(shape, geometry.Sphere):
+        return _SPHERE, (*shape.center, shape.radius)
+    raise InvalidSceneError(f"can't compile shape {shape!r}")
+
+
+def _get_positive_int(value: Any, name: str) -> int:
+    # bool is an int too
+    if type(value) is not int or value <= 0:
+        raise InvalidSceneError(f"{name} should be a positive integer, got {value!r}")
+    return value
+
+
+def _get_number(value: Any, name: str, positive: bool = False) -> float:
+    # nan and inf aren't valid json, but python's json accepts them
+    if type(value) not in (int, float) or not math.isfinite(value):
+        raise InvalidSceneError(f"{name} should be a number, got {value!r}")
+    if positive and value <= 0:
+        raise InvalidSceneError(f"{name} should be positive, got {value!r}")
+    return value
+
+
+def _make_vector(value: Any, name: str) -> geometry.Point:
+    if not (
+        isinstance(value, list)
+        and len(value) == 3
+        and all(type(x) in (int, float) for x in value)
+    ):
+        raise InvalidSceneError(f"{name} should be a list of 3 numbers, got {value!r}")
+    return geometry.make_point(*value)
+
+
+def _describe_color(color: Color) -> List[int]:
+    return [color.r, color.g, color.b]
+
+
+def _to_list(point: geometry.Point) -> List[float]:
+    return np.asarray(point).tolist()
+
+
+def _to_number(number) -> Union[int, float]:
+    # numpy scalars aren't json serializable
+    return number.item() if isinstance(number, np.generic) else number
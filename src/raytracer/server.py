@@ -0,0 +1,423 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import heapq
+import http
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import AsyncIterator
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import PIL.Image
+import numpy as np
+
+from raytracer import performance
+from raytracer import scene
+from raytracer import scenefile
+
+# jobs that wait for a free worker, more jobs are rejected with 503
+DEFAULT_MAX_QUEUED = 64
+# bigger images are rejected with 413
+DEFAULT_MAX_PIXELS = 4096 * 4096
+_MAX_BODY_SIZE = 16 * 1024 * 1024
+_TILE_SIZE = 32
+_RETRY_AFTER_S = 1
+# modules that forkserver imports once, so workers don't import them on start
+_PRELOADED_MODULES = ["raytracer.server"]
+
+# queue of (job id, rendered tiles, all tiles), set in every worker process
+_progress_queue: Optional[Any] = None
+
+
+@dataclass
+class Job:
+    id: int
+    # higher priority jobs are started first, jobs of the same priority are fifo
+    priority: int
+    scene: scene.Scene
+    engine: scene.Engine
+    submitted_at: float = field(default_factory=time.monotonic)
+    # progress events of the job, the last one is "done" or "failed"
+    events: asyncio.Queue = field(default_factory=asyncio.Queue)
+    result: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return -self.priority, self.id
+
+
+@dataclass
+class ServerStats:
+    queued: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+    rejected: int = 0
+
+
+class RenderServer:
+    # renders scenes (json of `scenefile.to_dict`) posted over http,
+    # every render runs on a single core of the shared process pool,
+    # so at most num_workers renders run at once and the others wait
+    # in the priority queue, or are rejected when the queue is full:
+    #   POST /render?priority=0&engine=batch        -> image/png
+    #   POST /render?...&stream=1                   -> ndjson progress events,
+    #                                                  the last one has base64 png
+    #   GET /status                                 -> json stats
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+        max_pixels: int = DEFAULT_MAX_PIXELS,
+    ) -> None:
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_queued = max_queued
+        self.max_pixels = max_pixels
+        self.stats = ServerStats()
+        self._queue: List[Tuple[Tuple[int, int], Job]] = []
+        self._jobs: Dict[int, Job] = {}
+        self._ids = itertools.count()
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._progress_reader: Optional[threading.Thread] = None
+        self._progress_queue: Optional[Any] = None
+
+    async def __aenter__(self) -> RenderServer:
+        loop = asyncio.get_running_loop()
+        # forked workers would inherit sockets of clients that are connected at
+        # the moment, so their connections wouldn't close until workers exit
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(_PRELOADED_MODULES)
+        progress_queue = context.SimpleQueue()
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=context,
+            initializer=_set_progress_queue,
+            initargs=(progress_queue,),
+        )
+        self._progress_reader = threading.Thread(
+            target=self._read_progress, args=(loop, progress_queue), daemon=True
+        )
+        self._progress_reader.start()
+        self._progress_queue = progress_queue
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        # only running jobs are in the executor, queued ones wait in `_queue`,
+        # so there's nothing to cancel (cancel_futures also needs python 3.9),
+        # waiting for running jobs blocks, so it's done off the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        self._progress_queue.put(None)
+        await loop.run_in_executor(None, self._progress_reader.join)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        # port 0 picks a free port, see `server.sockets`
+        return await asyncio.start_server(self._handle, host, port)
+
+    def submit(
+        self,
+        s: scene.Scene,
+        priority: int = 0,
+        engine: scene.Engine = scene.Engine.BATCH,
+    ) -> Job:
+        # raises Rejected when the queue is full or the image is invalid or too big
+        for size in (s.width, s.height):
+            if type(size) is not int or size <= 0:
+                self.stats.rejected += 1
+                raise Rejected(
+                    http.HTTPStatus.BAD_REQUEST, f"invalid image size {size!r}"
+                )
+        if s.width * s.height > self.max_pixels:
+            self.stats.rejected += 1
+            raise Rejected(http.HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "image is too big")
+        if len(self._queue) >= self.max_queued:
+            self.stats.rejected += 1
+            raise Rejected(http.HTTPStatus.SERVICE_UNAVAILABLE, "queue is full")
+        job = Job(next(self._ids), priority, s, engine)
+        self._jobs[job.id] = job
+        heapq.heappush(self._queue, (job.key, job))
+        self.stats.queued = len(self._queue)
+        job.events.put_nowait({"event": "queued", "position": self._get_position(job)})
+        self._schedule()
+        return job
+
+    def _schedule(self) -> None:
+        while self._queue and self.stats.running < self.num_workers:
+            _, job = heapq.heappop(self._queue)
+            self.stats.queued = len(self._queue)
+            self.stats.running += 1
+            asyncio.get_running_loop().create_task(self._run(job))
+
+    async def _run(self, job: Job) -> None:
+        loop = asyncio.get_running_loop()
+        queue_seconds = time.monotonic() - job.submitted_at
+        job.events.put_nowait({"event": "started", "queue_seconds": queue_seconds})
+        try:
+            png, render_seconds = await loop.run_in_executor(
+                self._executor, _render_job, job.id, job.scene, job.engine
+            )
+        except Exception as exc:
+            self.stats.failed += 1
+            job.events.put_nowait({"event": "failed", "error": repr(exc)})
+            job.result.set_exception(exc)
+        else:
+            self.stats.completed += 1
+            job.events.put_nowait(
+                {
+                    "event": "done",
+                    "queue_seconds": queue_seconds,
+                    "render_seconds": render_seconds,
+                    "image": base64.b64encode(png).decode("ascii"),
+                }
+            )
+            job.result.set_result(png)
+        finally:
+            del self._jobs[job.id]
+            self.stats.running -= 1
+            self._schedule()
+
+    def _get_position(self, job: Job) -> int:
+        # number of queued jobs that are started before this one
+        return sum(1 for key, _ in self._queue if key < job.key)
+
+    def _read_progress(self, loop: asyncio.AbstractEventLoop, progress_queue) -> None:
+        # workers report progress through the multiprocessing queue,
+        # events are handed to the event loop from this thread
+        while True:
+            item = progress_queue.get()
+            if item is None:
+                return
+            loop.call_soon_threadsafe(self._on_progress, *item)
+
+    def _on_progress(self, job_id: int, done: int, total: int) -> None:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.events.put_nowait({"event": "progress", "tiles": done, "of": total})
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            try:
+                method, path, query, body = await _read_request(reader)
+                if method == "GET" and path == "/status":
+                    data = json.dumps(self.stats.__dict__).encode()
+                    _write_response(writer, 200, data, "application/json")
+                elif method == "POST" and path == "/render":
+                    await self._handle_render(writer, query, body)
+                else:
+                    raise Rejected(http.HTTPStatus.NOT_FOUND, f"{method} {path}")
+            except Rejected as exc:
+                headers = {}
+                if exc.status == http.HTTPStatus.SERVICE_UNAVAILABLE:
+                    headers["Retry-After"] = str(_RETRY_AFTER_S)
+                _write_response(
+                    writer,
+                    exc.status,
+                    f"{exc.reason}\n".encode(),
+                    "text/plain",
+                    headers,
+                )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_render(
+        self, writer: asyncio.StreamWriter, query: Dict[str, str], body: bytes
+    ) -> None:
+        try:
+            priority = int(query.get("priority", 0))
+            engine = scene.Engine(query.get("engine", scene.Engine.BATCH.value))
+            s = scenefile.from_dict(json.loads(body))
+        except (ValueError, scenefile.InvalidSceneError) as exc:
+            raise Rejected(http.HTTPStatus.BAD_REQUEST, str(exc)) from exc
+        job = self.submit(s, priority, engine)
+        if query.get("stream") == "1":
+            # failures are sent as events and nobody awaits the result,
+            # even if the client disconnects, so asyncio shouldn't log them
+            job.result.add_done_callback(_retrieve_exception)
+            await _write_stream(writer, _iter_events(job))
+            return
+        try:
+            png = await job.result
+        except Exception as exc:
+            raise Rejected(http.HTTPStatus.INTERNAL_SERVER_ERROR, repr(exc)) from exc
+        _write_response(writer, 200, png, "image/png")
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str) -> None:
+        super().__init__(status, reason)
+        self.status = status
+        self.reason = reason
+
+
+def _set_progress_queue(progress_queue) -> None:
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _render_job(
+    job_id: int, s: scene.Scene, engine: scene.Engine
+) -> Tuple[bytes, float]:
+    # runs in the worker process, returns png & render seconds
+    started_at = time.perf_counter()
+    pixels = np.empty((s.height, s.width, 3), dtype=np.uint8)
+    tiles = performance.make_tiles(s.width, s.height, _TILE_SIZE)
+    for done, tile in enumerate(tiles, 1):
+        pixels[tile.y : tile.y + tile.height, tile.x : tile.x + tile.width] = (
+            s._get_tile_colors(tile, engine)
+        )
+        if _progress_queue is not None:
+            _progress_queue.put((job_id, done, len(tiles)))
+    seconds = time.perf_counter() - started_at
+    f = io.BytesIO()
+    PIL.Image.fromarray(pixels).save(f, format="PNG")
+    return f.getvalue(), seconds
+
+
+def _retrieve_exception(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
+
+
+async def _iter_events(job: Job) -> AsyncIterator[Dict[str, Any]]:
+    while True:
+        event = await job.events.get()
+        yield event
+        if event["event"] in ("done", "failed"):
+            return
+
+
+async def _read_request(
+    reader: asyncio.StreamReader,
+) -> Tuple[str, str, Dict[str, str], bytes]:
+    # minimal http/1.1: one request per connection, body needs content-length
+    try:
+        method, target, _ = (await _read_line(reader)).split()
+    except ValueError as exc:
+        raise Rejected(http.HTTPStatus.BAD_REQUEST, "invalid request line") from exc
+    headers = {}
+    while True:
+        line = await _read_line(reader)
+        if line in ("\r\n", "\n", ""):
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    content_length = headers.get("content-length", "0")
+    # int() accepts signs, spaces & underscores
+    if not (content_length.isascii() and content_length.isdigit()):
+        raise Rejected(
+            http.HTTPStatus.BAD_REQUEST, f"invalid content-length {content_length!r}"
+        )
+    size = int(content_length)
+    if size > _MAX_BODY_SIZE:
+        raise Rejected(http.HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "body is too big")
+    body = await reader.readexactly(size)
+    url = urllib.parse.urlsplit(target)
+    return method, url.path, dict(urllib.parse.parse_qsl(url.query)), body
+
+
+async def _read_line(reader: asyncio.StreamReader) -> str:
+    try:
+        return (await reader.readline()).decode("latin-1")
+    except (ValueError, asyncio.LimitOverrunError) as exc:
+        # the line is longer than the limit of the reader
+        raise Rejected(http.HTTPStatus.BAD_REQUEST, "line is too long") from exc
+
+
+def _write_response(
+    writer: asyncio.StreamWriter,
+    status: int,
+    body: bytes,
+    content_type: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> None:
+    headers = {
+        "Content-Type": content_type,
+        "Content-Length": str(len(body)),
+        **(headers or {}),
+    }
+    writer.write(_format_head(status, headers) + body)
+
+
+async def _write_stream(
+    writer: asyncio.StreamWriter, events: AsyncIterator[Dict[str, Any]]
+) -> None:
+    # chunked response with an event per line
+    headers = {"Content-Type": "application/x-ndjson", "Transfer-Encoding": "chunked"}
+    writer.write(_format_head(200, headers))
+    async for event in events:
+        data = json.dumps(event).encode() + b"\n"
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+
+
+def _format_head(status: int, headers: Dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _serve_forever(args: argparse.Namespace) -> None:
+    async with RenderServer(args.workers, args.max_queued) as render_server:
+        server = await render_server.serve(args.host, args.port)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(
+            f"serving on http://{host}:{port} with {render_server.num_workers} workers"
+        )
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    try:
+        asyncio.run(_serve_forever(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="raytracer.server", description="Render scenes posted over http."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--workers", type=int, help="max concurrent renders, cpu count if absent"
+    )
+    parser.add_argument(
+        "--max-queued",
+        type=int,
+        default=DEFAULT_MAX_QUEUED,
+        help="renders that wait for a worker, others are rejected with 503",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
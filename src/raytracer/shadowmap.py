@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Callable
+from typing import Tuple
+
+import numpy as np
+
+from raytracer import geometry
+
+# returns distances from points to the closest bodies along directions (inf if none)
+DistanceFunction = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+DEFAULT_SIZE = 512
+
+# cube faces are (major axis, sign), texel coordinates are the other two axes
+_FACES = [(axis, sign) for axis in range(3) for sign in (1, -1)]
+_MIN_BIAS = 1.0
+_RELATIVE_BIAS = 0.02
+
+
+def build(
+    light: geometry.Point, get_distances: DistanceFunction, size: int
+) -> ShadowMap:
+    texels = (np.arange(size) + 0.5) / size * 2 - 1
+    us, vs = np.meshgrid(texels, texels, indexing="ij")
+    depths = np.empty((len(_FACES), size, size), dtype=np.float32)
+    for face, (axis, sign) in enumerate(_FACES):
+        u_axis, v_axis = _get_texel_axes(axis)
+        directions = np.empty((size * size, 3))
+        directions[:, axis] = sign
+        directions[:, u_axis] = us.ravel()
+        directions[:, v_axis] = vs.ravel()
+        points = np.broadcast_to(light, directions.shape)
+        depths[face] = get_distances(points, directions).reshape(size, size)
+    return ShadowMap(light=light, depths=depths)
+
+
+@dataclass(frozen=True)
+class ShadowMap:
+    # depth cube map: distances from the light to the closest bodies
+    light: geometry.Point
+    depths: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return self.depths.shape[1]
+
+    def in_the_shadows(self, points: np.ndarray) -> np.ndarray:
+        vectors = points - self.light
+        distances = geometry.norm(vectors)
+        faces, rows, columns = self._get_texels(vectors)
+        depths = self.depths[faces, rows, columns]
+        return distances > depths + _get_bias(distances)
+
+    def in_the_shadow(self, point: geometry.Point) -> bool:
+        # same as `in_the_shadows`, but plain floats are much faster for a single point
+        vector = (point - self.light).tolist()
+        axis = max(range(3), key=lambda i: abs(vector[i]))
+        major = vector[axis]
+        face = axis * 2 + (major < 0)
+        u_axis, v_axis = _get_texel_axes(axis)
+        row = self._get_texel_index(vector[u_axis] / abs(major))
+        column = self._get_texel_index(vector[v_axis] / abs(major))
+        distance = math.sqrt(sum(x * x for x in vector))
+        return distance > self.depths[face, row, column] + _get_bias(distance)
+
+    def _get_texels(
+        self, vectors: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        lanes = np.arange(len(vectors))
+        axes = np.argmax(np.abs(vectors), axis=1)
+        majors = vectors[lanes, axes]
+        faces = axes * 2 + (majors < 0)
+        u_axes, v_axes = _get_texel_axes(axes)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            us = vectors[lanes, u_axes] / np.abs(majors)
+            vs = vectors[lanes, v_axes] / np.abs(majors)
+        return faces, self._get_texel_indices(us), self._get_texel_indices(vs)
+
+    def _get_texel_indices(self, coordinates: np.ndarray) -> np.ndarray:
+        indices = np.floor((np.nan_to_num(coordinates) + 1) / 2 * self.size)
+        return np.clip(indices, 0, self.size - 1).astype(int)
+
+    def _get_texel_index(self, coordinate: float) -> int:
+        index = math.floor((coordinate + 1) / 2 * self.size)
+        return min(max(index, 0), self.size - 1)
+
+
+def _get_texel_axes(axis):
+    return (axis + 1) % 3, (axis + 2) % 3
+
+
+def _get_bias(distances):
+    # depth of a texel is sampled at its center, so surfaces at grazing angles
+    # would shadow themselves without bias
+    return np.maximum(_MIN_BIAS, _RELATIVE_BIAS * distances)
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 
 from raytracer import algebra
@@ -25,3 +26,39 @@ def test_solve_quadratic(a, b, c, expected):
 def test_solve_quadratic_failure():
     with pytest.raises(ValueError):
         algebra.solve_quadratic(0, 0, 0)
+
+
+@pytest.mark.parametrize(
+    "a, b, c, expected",
+    [
+        (3, 7, 2, [-2, -1 / 3]),
+        (1, 10, 25, [-5, np.nan]),
+        (1, 0, 4, [np.nan, np.nan]),
+        (0, 2, 4, [-2, np.nan]),
+        (1, 0, -4, [-2, 2]),
+        (1, 0, 0, [0, np.nan]),
+        # not a valid equation
+        (0, 0, 0, [np.nan, np.nan]),
+        (-1, 0, 4, [-2, 2]),
+    ],
+)
+def test_solve_quadratics(a, b, c, expected):
+    roots, valid = algebra.solve_quadratics(np.array([a]), np.array([b]), np.array([c]))
+    assert roots[0] == pytest.approx(expected, nan_ok=True)
+    assert valid[0].tolist() == [not np.isnan(root) for root in expected]
+
+
+def test_solve_quadratics_matches_solve_quadratic():
+    rng = np.random.default_rng(0)
+    a, b, c = rng.uniform(-10, 10, size=(3, 1000))
+    roots, valid = algebra.solve_quadratics(a, b, c)
+    for i in range(len(a)):
+        expected = algebra.solve_quadratic(a[i], b[i], c[i])
+        assert roots[i][valid[i]].tolist() == expected
+
+
+@pytest.mark.parametrize("solve", [algebra.solve_quadratic, algebra.solve_quadratics])
+def test_solve_quadratic_is_stable(solve):
+    # (x - 1e-8)(x - 1e8), textbook formula loses the small root completely
+    roots = solve(np.float64(1), np.float64(-(1e8 + 1e-8)), np.float64(1))
+    assert np.ravel(roots)[0] == pytest.approx(1e-8, rel=1e-12)
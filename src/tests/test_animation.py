@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from raytracer import animation
+from raytracer import geometry
+
+
+def test_reproject():
+    camera = geometry.make_point(0, 0, -10)
+    points = np.array(
+        [
+            # seen through the pixel (1, 1)
+            [2, 2, 10],
+            # also seen through the pixel (1, 1), but closer to the camera
+            [1.5, 1.5, 5],
+            # seen through the pixel (2, 0)
+            [2.2, 0.1, 1],
+            # outside of the screen
+            [100, 0, 10],
+            # behind the camera
+            [1, 1, -20],
+            # sky
+            [np.nan, np.nan, np.nan],
+        ]
+    )
+    colors = np.arange(18, dtype=np.uint8).reshape(6, 3)
+    body_indices = np.arange(6)
+    new_colors, new_body_indices, new_points = animation.reproject(
+        points, colors, body_indices, camera, width=3, height=2
+    )
+    assert new_body_indices.tolist() == [-1, -1, 2, -1, 1, -1]
+    assert new_colors[4].tolist() == colors[1].tolist()
+    assert new_points[2].tolist() == points[2].tolist()
+    assert np.isnan(new_points[0]).all()
+
+
+def test_linear_path():
+    path = animation.linear_path(
+        geometry.make_point(0, 0, 0), geometry.make_point(4, 2, 0), 3
+    )
+    assert [p.tolist() for p in path] == [[0, 0, 0], [2, 1, 0], [4, 2, 0]]
+
+
+@pytest.mark.parametrize(
+    "output, index, expected",
+    [
+        ("fly.png", 0, "fly_0000.png"),
+        ("frames/fly.ppm", 12, "frames/fly_0012.ppm"),
+    ],
+)
+def test_get_frame_path(output, index, expected):
+    assert animation.get_frame_path(output, index) == expected
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from raytracer import antialiasing
+
+
+def test_find_edges():
+    colors = np.zeros((3, 4, 3), dtype=np.uint8)
+    colors[:, 3] = 255
+    body_indices = np.zeros((3, 4), dtype=int)
+    body_indices[0, 0] = 1
+    expected = [
+        [True, True, True, True],
+        [True, False, True, True],
+        [False, False, True, True],
+    ]
+    assert antialiasing.find_edges(colors, body_indices).tolist() == expected
+
+
+def test_find_edges_ignores_small_color_differences():
+    colors = np.zeros((2, 2, 3), dtype=np.uint8)
+    colors[0, 0] = antialiasing.COLOR_THRESHOLD
+    body_indices = np.zeros((2, 2), dtype=int)
+    assert not antialiasing.find_edges(colors, body_indices).any()
+
+
+@pytest.mark.parametrize(
+    "samples, expected",
+    [
+        (1, [[0, 0]]),
+        (4, [[-0.25, -0.25], [0.25, -0.25], [-0.25, 0.25], [0.25, 0.25]]),
+    ],
+)
+def test_get_subpixel_offsets(samples, expected):
+    assert antialiasing.get_subpixel_offsets(samples).tolist() == expected
+
+
+@pytest.mark.parametrize("samples", [0, 2, 3, 5, 8])
+def test_get_subpixel_offsets_not_square(samples):
+    with pytest.raises(ValueError):
+        antialiasing.get_subpixel_offsets(samples)
+
+
+def test_average():
+    colors = np.array([[[0, 10, 255], [1, 20, 255]]])
+    assert antialiasing.average(colors).tolist() == [[0, 15, 255]]
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from raytracer import benchmark
+
+
+@pytest.mark.parametrize(
+    "results, expected",
+    [
+        ({"a.duration_s": 1.05, "a.pixels_per_sec": 95}, []),
+        ({"a.duration_s": 1.2}, ["a.duration_s: 1 -> 1.2 (20% worse)"]),
+        ({"a.duration_s": 0.5, "a.pixels_per_sec": 200}, []),
+        ({"a.pixels_per_sec": 80}, ["a.pixels_per_sec: 100 -> 80 (20% worse)"]),
+        ({"new.duration_s": 100}, []),
+    ],
+)
+def test_find_regressions(results, expected):
+    baseline = {"a.duration_s": 1, "a.pixels_per_sec": 100}
+    assert benchmark.find_regressions(results, baseline, threshold=0.1) == expected
+
+
+def test_append_to_history(tmp_path):
+    path = str(tmp_path / "history.json")
+    benchmark.append_to_history(path, {"a.duration_s": 1})
+    benchmark.append_to_history(path, {"a.duration_s": 2})
+    with open(path) as f:
+        history = json.load(f)
+    assert [run["results"] for run in history] == [
+        {"a.duration_s": 1},
+        {"a.duration_s": 2},
+    ]
+
+
+def test_main_saves_bvh_results(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, "_BVH_BODY_COUNTS", [10])
+    history = str(tmp_path / "history.json")
+    baseline = str(tmp_path / "baseline.json")
+    argv = ["--suites", "bvh", "--history", history, "--baseline", baseline]
+    assert benchmark.main(argv + ["--save-baseline"]) == 0
+    with open(baseline) as f:
+        assert sorted(json.load(f)) == [
+            "bvh.spheres_10.any_hit_us_per_ray",
+            "bvh.spheres_10.batch_closest_hit_us_per_ray",
+            "bvh.spheres_10.build_s",
+            "bvh.spheres_10.closest_hit_us_per_ray",
+        ]
+    with open(history) as f:
+        [run] = json.load(f)
+    assert len(run["results"]) == 4
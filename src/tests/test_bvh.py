@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from raytracer import bvh
+from raytracer import geometry
+from raytracer import scene
+from raytracer.benchmark import make_spheres_scene
+
+
+@pytest.fixture(scope="module")
+def spheres_scene():
+    return make_spheres_scene(200)
+
+
+@pytest.fixture(scope="module")
+def targets():
+    rng = np.random.default_rng(1)
+    return rng.uniform(-1000, 1000, size=(100, 3)) + (0, 0, 2000)
+
+
+def test_closest_hit(spheres_scene, targets):
+    for target in targets:
+        ray = geometry.make_ray(spheres_scene.camera, target)
+        actual = spheres_scene._get_closest_point_on_body(ray, set())
+        expected = _brute_force_closest(spheres_scene, ray)
+        assert (actual is None) == (expected is None)
+        if expected is not None:
+            assert actual.body is expected.body
+            assert np.array_equal(actual.point, expected.point)
+
+
+def test_batch_closest_hit(spheres_scene, targets):
+    directions = targets - spheres_scene.camera
+    points = np.broadcast_to(spheres_scene.camera, directions.shape)
+    _, body_indices = spheres_scene._get_closest_hits(points, directions)
+    for target, index in zip(targets, body_indices):
+        ray = geometry.make_ray(spheres_scene.camera, target)
+        expected = _brute_force_closest(spheres_scene, ray)
+        if expected is None:
+            assert index == -1
+        else:
+            assert spheres_scene.bodies[index] is expected.body
+
+
+def test_any_hit(spheres_scene, targets):
+    light = spheres_scene.lights[0]
+    points = targets + (0, -500, 0)
+    expected = [_brute_force_in_the_shadow(spheres_scene, p, light) for p in points]
+    assert [spheres_scene._in_the_shadow(p, light) for p in points] == expected
+    assert spheres_scene._in_the_shadows(points, light).tolist() == expected
+
+
+def test_iter_leaves_on_empty_bvh():
+    tree = bvh.build([], np.empty((0, 3)), np.empty((0, 3)))
+    points = np.zeros((2, 3))
+    directions = np.ones((2, 3))
+    assert list(tree.iter_leaves(points, directions, (0, None))) == []
+    assert not tree.any_hit(points[0], directions[0], (0, None), lambda item: True)
+
+
+def test_iter_leaves_with_axis_parallel_lines():
+    tree = bvh.build([7], np.array([[0, 0, 0]]), np.array([[1, 1, 1]]))
+    points = np.array([[0.5, 0.5, -5], [0.5, 5, -5], [0.5, 0.5, 5]])
+    directions = np.array([[0, 0, 1], [0, 0, 1], [0, 0, 1]])
+    [(items, lanes)] = tree.iter_leaves(points, directions, (0, None))
+    assert items == [7]
+    assert lanes.tolist() == [0]
+
+
+def _brute_force_closest(s, ray):
+    candidates = [
+        (np.linalg.norm(p - ray.point), i, body, p)
+        for i, body in enumerate(s)
+        for p in body.shape.intersections(ray)
+    ]
+    if not candidates:
+        return None
+    _, _, body, point = min(candidates, key=lambda c: c[:2])
+    return scene.PointOnBody(point, body)
+
+
+def _brute_force_in_the_shadow(s, point, light):
+    segment = geometry.make_line_segment(point, light)
+    return any(
+        np.linalg.norm(i - point) > 1e-3
+        for body in s
+        for i in body.shape.intersections(segment)
+    )
@@ -1,5 +1,7 @@
+import numpy as np
 import pytest
 
+from raytracer.color import ColorBuffer
 from raytracer.image import Color
 
 
@@ -25,3 +27,39 @@ def test_color_mul_failure(mul, exception):
 def test_color_creation_failure(r, g, b):
     with pytest.raises(ValueError):
         Color(r, g, b)
+
+
+@pytest.mark.parametrize(
+    "mul, expected",
+    [
+        (2, [[2, 4, 6], [20, 40, 60]]),
+        (np.array([2, 0.5]), [[2, 4, 6], [5, 10, 15]]),
+        (np.array([200, 0]), [[200, 255, 255], [0, 0, 0]]),
+    ],
+)
+def test_color_buffer_mul(mul, expected):
+    colors = ColorBuffer.from_colors([Color(1, 2, 3), Color(10, 20, 30)])
+    assert (colors * mul).rgbs.tolist() == expected
+
+
+@pytest.mark.parametrize(
+    "mul, exception",
+    [(-1, ValueError), (np.array([1, -1]), ValueError), (1j, TypeError)],
+)
+def test_color_buffer_mul_failure(mul, exception):
+    with pytest.raises(exception):
+        assert ColorBuffer.from_colors([Color(1, 2, 3), Color(10, 20, 30)]) * mul
+
+
+@pytest.mark.parametrize(
+    "rgbs", [np.array([[256, 255, 255]]), np.array([[255, -1, 255]]), np.zeros((2, 2))]
+)
+def test_color_buffer_creation_failure(rgbs):
+    with pytest.raises(ValueError):
+        ColorBuffer(rgbs)
+
+
+def test_color_buffer_filled():
+    colors = ColorBuffer.filled(Color(1, 2, 3), 2)
+    assert len(colors) == 2
+    assert colors[1] == Color(1, 2, 3)
@@ -0,0 +1,92 @@
+import dataclasses
+import multiprocessing
+import socket
+
+import pytest
+
+from raytracer import distributed
+from raytracer import geometry
+from raytracer import main
+from raytracer import scene
+
+
+@pytest.fixture
+def small_scene():
+    return dataclasses.replace(
+        main.make_scene(), camera=geometry.make_point(20, 15, -30), width=40, height=30
+    )
+
+
+def test_render(small_scene):
+    with distributed.Coordinator(small_scene, port=0, tile_size=8) as coordinator:
+        workers = _start_workers(coordinator, 2)
+        image = coordinator.render(timeout=60)
+    _join(workers)
+    expected = small_scene.render(engine=scene.Engine.BATCH, num_processes=1)
+    assert (image.to_array() == expected.to_array()).all()
+    stats = coordinator.node_stats
+    assert sorted(stats) == ["worker_0", "worker_1"]
+    assert sum(node.tiles for node in stats.values()) == 20
+    assert sum(node.pixels for node in stats.values()) == 40 * 30
+    assert all(node.pixels_per_sec > 0 for node in stats.values())
+
+
+@pytest.mark.parametrize("hang", [False, True])
+def test_dead_worker(small_scene, hang):
+    # worker takes tiles and then disconnects or stops sending heartbeats
+    with distributed.Coordinator(
+        small_scene, port=0, tile_size=8, heartbeat_timeout=0.5
+    ) as coordinator:
+        with socket.create_connection(coordinator.address) as conn:
+            distributed.send_message(conn, ("hello", "dead"))
+            assert distributed.recv_message(conn)[0] == "scene"
+            assert distributed.recv_message(conn)[0] == "tile"
+            if not hang:
+                conn.close()
+            workers = _start_workers(coordinator, 1)
+            image = coordinator.render(timeout=60)
+        _join(workers)
+    expected = small_scene.render(engine=scene.Engine.BATCH, num_processes=1)
+    assert (image.to_array() == expected.to_array()).all()
+    dead = coordinator.node_stats["dead"]
+    assert not dead.alive
+    assert dead.tiles == 0
+    assert dead.reassigned_tiles == 2
+    assert coordinator.node_stats["worker_0"].tiles == 20
+
+
+def test_render_timeout(small_scene):
+    with distributed.Coordinator(small_scene, port=0) as coordinator:
+        with pytest.raises(TimeoutError):
+            coordinator.render(timeout=0.1)
+
+
+def test_messages():
+    a, b = socket.socketpair()
+    with a, b:
+        distributed.send_message(a, ("pixels", 1, b"\0" * 100_000, 0.5))
+        distributed.send_message(a, ("done",))
+        assert distributed.recv_message(b) == ("pixels", 1, b"\0" * 100_000, 0.5)
+        assert distributed.recv_message(b) == ("done",)
+        a.close()
+        with pytest.raises(EOFError):
+            distributed.recv_message(b)
+
+
+def _start_workers(coordinator, num_workers):
+    host, port = coordinator.address
+    workers = [
+        multiprocessing.Process(
+            target=distributed.run_worker, args=(host, port, f"worker_{i}")
+        )
+        for i in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def _join(workers):
+    for worker in workers:
+        worker.join(10)
+        assert worker.exitcode == 0
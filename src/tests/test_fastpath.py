@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from raytracer import fastpath
+from raytracer import geometry
+from raytracer.fastpath import Vec3
+
+_SHAPES = [
+    geometry.make_plane(0, 1, 0, -200),
+    geometry.make_plane(1, 0, 0, -350),
+    geometry.Sphere(geometry.make_point(200, 150, 500), 50),
+    geometry.Sphere(geometry.make_point(75.5, 185.25, 400), 15.5),
+]
+
+
+@pytest.fixture(scope="module")
+def rays():
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(-100, 400, size=(200, 3))
+    targets = rng.uniform(-100, 600, size=(200, 3))
+    return [geometry.make_ray(s, t) for s, t in zip(starts, targets)]
+
+
+@pytest.mark.parametrize("shape", _SHAPES)
+def test_intersections(shape, rays):
+    fast_shape = fastpath.from_shape(shape)
+    for ray in rays:
+        expected = [_to_tuple(p) for p in shape.intersections(ray)]
+        actual = [p.to_tuple() for p in fast_shape.intersections(_to_fast_ray(ray))]
+        assert len(actual) == len(expected)
+        for actual_point, expected_point in zip(actual, expected):
+            assert actual_point == _approx(expected_point)
+
+
+@pytest.mark.parametrize("shape", _SHAPES)
+def test_reflect(shape, rays):
+    fast_shape = fastpath.from_shape(shape)
+    for ray in rays:
+        for point in shape.intersections(ray):
+            expected = geometry.reflect(ray, point, shape)
+            actual = fastpath.reflect(_to_fast_ray(ray), _to_vec3(point), fast_shape)
+            assert actual.point.to_tuple() == _approx(_to_tuple(expected.point))
+            assert actual.direction.to_tuple() == _approx(_to_tuple(expected.direction))
+            assert actual.ks == expected.ks
+
+
+def test_same_as_geometry_on_integer_coordinates():
+    # dot products of integers are exact, so there's no rounding to differ in
+    sphere = geometry.Sphere(geometry.make_point(200, 150, 500), 50)
+    ray = geometry.make_ray(geometry.make_point(0, 0, 0), geometry.make_point(4, 3, 10))
+    [point, _] = sphere.intersections(ray)
+    expected = geometry.reflect(ray, point, sphere)
+    actual = fastpath.reflect(
+        _to_fast_ray(ray), _to_vec3(point), fastpath.from_shape(sphere)
+    )
+    assert actual.point == _to_vec3(expected.point)
+    assert actual.direction == _to_vec3(expected.direction)
+
+
+def test_reflect_impossible():
+    sphere = geometry.Sphere(geometry.make_point(0, 0, 10), 1)
+    ray = fastpath.make_ray(Vec3(0, 0, 0), Vec3(0, 0, 1))
+    with pytest.raises(geometry.ImpossibleReflection):
+        fastpath.reflect(ray, Vec3(0, 0, 9), fastpath.from_shape(sphere))
+
+
+@pytest.mark.parametrize(
+    "make_line, ks",
+    [
+        (fastpath.make_ray, [(-0.5, False), (0, True), (10, True)]),
+        (fastpath.make_line_segment, [(-0.5, False), (1, True), (1.5, False)]),
+        (fastpath.make_infinite_line, [(-0.5, True), (10, True)]),
+    ],
+)
+def test_is_mine(make_line, ks):
+    line = make_line(Vec3(0, 0, 0), Vec3(1, 2, 3))
+    assert [line.is_mine(k) for k, _ in ks] == [expected for _, expected in ks]
+
+
+def test_invalid_line():
+    with pytest.raises(geometry.InvalidLineError):
+        fastpath.make_ray(Vec3(1, 2, 3), Vec3(1, 2, 3))
+
+
+def _to_vec3(point):
+    return Vec3.from_point(np.asarray(point, dtype=float))
+
+
+def _to_tuple(point):
+    return tuple(np.asarray(point, dtype=float).tolist())
+
+
+def _approx(expected):
+    # numpy dot may use fused multiply-add, so the last bit can differ
+    return pytest.approx(expected, rel=1e-12, abs=1e-9)
+
+
+def _to_fast_ray(ray):
+    return fastpath.Ray(_to_vec3(ray.point), _to_vec3(ray.direction), *ray.ks)
@@ -0,0 +1,37 @@
+import gc
+
+import numpy as np
+
+from raytracer.color import Palette
+from raytracer.framebuffer import SharedFramebuffer
+from raytracer.performance import Tile
+
+
+def test_shared_framebuffer():
+    with SharedFramebuffer(4, 3) as framebuffer:
+        white = np.full((2, 2, 3), 255, dtype=np.uint8)
+        framebuffer.ref.write(Tile(1, 1, 2, 2), white)
+        image = framebuffer.to_image()
+    assert image.get_pixel(1, 1) == Palette.WHITE
+    assert image.get_pixel(2, 2) == Palette.WHITE
+    assert image.get_pixel(0, 0) == Palette.BLACK
+    assert image.get_pixel(3, 2) == Palette.BLACK
+
+
+def test_shared_framebuffer_outlives_image():
+    with SharedFramebuffer(4, 3) as framebuffer:
+        framebuffer.ref.write(Tile(0, 0, 4, 3), np.full((3, 4, 3), 7, dtype=np.uint8))
+        pixels = framebuffer.to_image().to_array()[1:]
+    del framebuffer
+    gc.collect()
+    assert pixels.shape == (2, 4, 3)
+    assert (pixels == 7).all()
+
+
+def test_shared_framebuffer_with_other_dtype():
+    with SharedFramebuffer(4, 3, channels=1, dtype="float64") as framebuffer:
+        framebuffer.ref.write(Tile(2, 1, 2, 2), np.full((2, 2, 1), 0.5))
+        costs = framebuffer.to_array()[..., 0].copy()
+    assert costs.shape == (3, 4)
+    assert costs.sum() == 2
+    assert costs[2, 3] == 0.5
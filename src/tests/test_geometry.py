@@ -98,6 +98,26 @@ def test_line_intersections(line, shape, expected):
     assert close_intersections(shape.intersections(line), expected)
 
 
+@pytest.mark.parametrize(
+    "line, shape, expected",
+    [
+        (RAY, Plane(1, 0, 0, 0), [1]),
+        (RAY, Plane(0, 0, 1, 0), [np.nan]),
+        (RAY, Sphere(0, 0, 0, radius=0.5), [0.5, 1.5]),
+        (RAY, Sphere(10, 0, 0, radius=0.5), [-9.5, -8.5]),
+        (RAY, Sphere(0, 5, 0, radius=0.5), [np.nan, np.nan]),
+        (RAY, Sphere(0, 0, 0, radius=2), [-1, 3]),
+    ],
+)
+def test_intersections_ks(line, shape, expected):
+    points = np.array([line.point, line.point])
+    directions = np.array([line.direction, line.direction])
+    ks = shape.intersections_ks(points, directions)
+    assert ks.shape == (2, len(expected))
+    for row in ks:
+        np.testing.assert_allclose(row, expected)
+
+
 @pytest.mark.parametrize(
     "ray, other, expected",
     [
@@ -137,6 +157,21 @@ def test_shape_perpendicular(shape, point, expected):
     assert close_lines(shape.perpendicular(point), expected)
 
 
+def test_shape_without_perpendiculars():
+    class Empty(geometry.Shape):
+        def intersections(self, line):
+            return []
+
+        def intersections_ks(self, points, directions):
+            return np.empty((len(points), 0))
+
+        def perpendicular(self, point):
+            raise geometry.InvalidLineError
+
+    with pytest.raises(TypeError):
+        Empty()
+
+
 def test_sphere_perpendicular_failure():
     sphere = Sphere(0, 0, 0, radius=10)
     with pytest.raises(geometry.InvalidLineError):
@@ -157,6 +192,28 @@ def test_mirror(ray, axis, expected):
     assert close_lines(ray.mirror(axis), expected)
 
 
+@pytest.mark.parametrize(
+    "shape, hits",
+    [
+        (Plane(1, 0, 0, -10), [Point(10, 3, 4), Point(10, -5, 0), Point(10, 0, 0)]),
+        (Sphere(5, 0, 0, radius=2), [Point(5, 2, 0), Point(5, 0, -2), Point(3, 0, 0)]),
+    ],
+)
+def test_reflections(shape, hits):
+    # the last ray is along the normal, so it can't be reflected
+    points = np.zeros((len(hits), 3))
+    origins, directions, valid = geometry.reflections(points, np.array(hits), shape)
+    assert valid.tolist() == [True, True, False]
+    for i in range(2):
+        ray = geometry.make_ray(points[i], hits[i])
+        expected = geometry.reflect(ray, hits[i], shape)
+        assert close_lines(
+            geometry.make_ray(origins[i], origins[i] + directions[i]), expected
+        )
+    with pytest.raises(geometry.ImpossibleReflection):
+        geometry.reflect(geometry.make_ray(points[2], hits[2]), hits[2], shape)
+
+
 def close_lines(x: geometry.Line, y: geometry.Line) -> bool:
     same_starts = close_points(x.point, y.point)
     same_directions = close_points(normalize(x.direction), normalize(y.direction))
@@ -190,3 +247,10 @@ def sort_by_distance_to_origin(points: List[geometry.Point]) -> List[geometry.Po
 
 def distance_to_origin(point: geometry.Point) -> float:
     return np.linalg.norm(point)
+
+
+def test_shape_bounds():
+    low, high = Sphere(1, 2, 3, radius=2).bounds
+    assert same_points(low, Point(-1, 0, 1))
+    assert same_points(high, Point(3, 4, 5))
+    assert Plane(1, 0, 0, 0).bounds is None
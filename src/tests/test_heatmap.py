@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from raytracer import heatmap
+from raytracer.color import Palette
+
+
+def test_to_image():
+    costs = np.array([[1.0, 2.0], [3.0, 5.0]])
+    image = heatmap.to_image(costs)
+    assert (image.width, image.height) == (2, 2)
+    assert image.get_pixel(0, 0) == Palette.BLACK
+    assert image.get_pixel(1, 1) == Palette.WHITE
+    pixels = image.to_array().astype(int)
+    # more expensive pixels are brighter
+    assert pixels[0, 0].sum() < pixels[0, 1].sum() < pixels[1, 0].sum()
+
+
+@pytest.mark.parametrize("costs", [np.full((2, 3), 7.0), np.zeros((0, 0))])
+def test_to_image_without_range(costs):
+    pixels = heatmap.to_image(costs).to_array()
+    assert pixels.shape == costs.shape + (3,)
+    assert (pixels == 0).all()
+
+
+def test_heatmap_to_image_before_render():
+    with pytest.raises(AssertionError):
+        heatmap.Heatmap().to_image()
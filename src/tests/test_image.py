@@ -1,3 +1,6 @@
+import numpy as np
+import PIL.Image
+
 from raytracer.color import Palette
 from raytracer.image import Image
 
@@ -6,3 +9,27 @@ def test_image():
     image = Image(300, 200)
     image.set_pixel(5, 10, Palette.BLACK)
     assert image.get_pixel(5, 10) == Palette.BLACK
+
+
+def test_image_from_array():
+    pixels = np.zeros((2, 3, 3), dtype=np.uint8)
+    image = Image.from_array(pixels)
+    assert (image.width, image.height) == (3, 2)
+    image.set_pixel(2, 1, Palette.WHITE)
+    assert pixels[1, 2].tolist() == [255, 255, 255]
+    assert image.to_array() is pixels
+
+
+def test_image_save_ppm(tmp_path):
+    pixels = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+    path = tmp_path / "image.ppm"
+    Image.from_array(pixels).save(path)
+    assert path.read_bytes() == b"P6\n3 2\n255\n" + pixels.tobytes()
+    assert np.array_equal(np.array(PIL.Image.open(path)), pixels)
+
+
+def test_image_save_png(tmp_path):
+    pixels = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+    path = tmp_path / "image.png"
+    Image.from_array(pixels).save(path)
+    assert np.array_equal(np.array(PIL.Image.open(path)), pixels)
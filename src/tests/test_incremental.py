@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from raytracer import geometry
+from raytracer import incremental
+
+_A, _B, _C, _D = object(), object(), object(), object()
+
+
+@pytest.mark.parametrize(
+    "old, new, expected",
+    [
+        ([_A, _B], [_A, _B], ([], {0: 0, 1: 1}, [])),
+        ([_A, _B], [_A, _C], ([1], {0: 0}, [1])),
+        ([_A, _B, _C], [_A, _C], ([1], {0: 0, 2: 1}, [])),
+        ([_A, _B], [_B, _A, _D], ([], {0: 1, 1: 0}, [2])),
+        ([_A, _A], [_A], None),
+    ],
+)
+def test_diff_bodies(old, new, expected):
+    assert incremental.diff_bodies(old, new) == expected
+
+
+def test_get_dirty_pixels():
+    tracker = incremental.Tracker()
+    for pixel in range(3):
+        tracker.pixel = pixel
+        # ray along x axis that hits the body 0 at x == 10
+        tracker.add_body(0)
+        tracker.add_segment((0, pixel * 10, 0), (10, 0, 0), 1)
+    tracker.pixel = 3
+    tracker.add_segment((0, 30, 0), (1, 0, 0), np.inf)
+    dependencies = tracker.to_dependencies()
+    # the first sphere is behind the hit of the pixel 0
+    behind = geometry.Sphere(geometry.make_point(15, 0, 0), 2)
+    crossing = geometry.Sphere(geometry.make_point(5, 10, 0), 3)
+    assert dependencies.get_dirty_pixels([], [behind, crossing]).tolist() == [1]
+    far = geometry.Sphere(geometry.make_point(100, 30, 0), 1)
+    assert dependencies.get_dirty_pixels([], [far]).tolist() == [3]
+    assert dependencies.get_dirty_pixels([0], []).tolist() == [0, 1, 2]
+
+
+def test_dependencies_update():
+    tracker = incremental.Tracker()
+    for pixel, index in enumerate([0, 1, 2]):
+        tracker.pixel = pixel
+        tracker.add_body(index)
+        tracker.add_segment((0, 0, 0), (1, 0, 0), 1)
+    dependencies = tracker.to_dependencies().without_pixels(np.array([1]))
+    assert dependencies.pixels.tolist() == [0, 2]
+    assert dependencies.segment_pixels.tolist() == [0, 2]
+    renumbered = dependencies.with_body_indices({0: 1, 2: 0})
+    assert renumbered.body_indices.tolist() == [1, 0]
+    merged = incremental.Dependencies.concatenate([renumbered, renumbered])
+    assert merged.segment_points.shape == (4, 3)
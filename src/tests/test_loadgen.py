@@ -0,0 +1,34 @@
+import asyncio
+import math
+import socket
+
+from raytracer import loadgen
+
+
+def test_summarize():
+    latencies = [i / 100 for i in range(1, 101)]
+    statuses = [200] * 100 + [503] * 3 + [500]
+    summary = loadgen.summarize(latencies, statuses, duration=10)
+    assert summary["requests"] == 104
+    assert summary["succeeded"] == 100
+    assert summary["rejected"] == 3
+    assert summary["failed"] == 1
+    assert math.isclose(summary["p50_latency_s"], 0.505)
+    assert math.isclose(summary["p99_latency_s"], 0.9901)
+    assert summary["throughput_per_sec"] == 10
+
+
+def test_summarize_without_successes():
+    summary = loadgen.summarize([], [503], duration=1)
+    assert math.isnan(summary["p99_latency_s"])
+    assert summary["throughput_per_sec"] == 0
+
+
+def test_run_without_server():
+    # port of the closed socket refuses connections
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    summary = asyncio.run(loadgen.run("127.0.0.1", port, b"{}", 3, concurrency=2))
+    assert summary["requests"] == summary["failed"] == 3
+    assert summary["succeeded"] == 0
@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+import PIL.Image
+import pytest
+
+from raytracer import main
+from raytracer import scene
+from raytracer import scenefile
+
+
+def test_main(tmp_path):
+    path = tmp_path / "image.ppm"
+    argv = ["--width", "20", "--height", "10", "--workers", "1", "--engine", "batch"]
+    assert main.main(argv + ["--max-depth", "1", str(path)]) == 0
+    assert np.array(PIL.Image.open(path)).shape == (10, 20, 3)
+
+
+def test_main_stats(tmp_path):
+    path = tmp_path / "image.png"
+    argv = ["--width", "20", "--height", "10", "--workers", "1", "--stats"]
+    assert main.main(argv + [str(path)]) == 0
+    with open(tmp_path / "image.stats.json") as f:
+        stats = json.load(f)
+    assert stats["primary_rays"] == 200
+    assert stats["intersection_tests"]["Plane"] > 0
+
+
+def test_main_heatmap(tmp_path):
+    path = tmp_path / "image.png"
+    argv = ["--width", "20", "--height", "10", "--workers", "1", "--heatmap", "tests"]
+    assert main.main(argv + [str(path)]) == 0
+    heatmap = np.array(PIL.Image.open(tmp_path / "image.heatmap.png"))
+    assert heatmap.shape == (10, 20, 3)
+
+
+def test_main_failure(tmp_path):
+    path = tmp_path / "image.unknown"
+    assert main.main(["--width", "2", "--height", "2", str(path)]) == 1
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--width", "0"],
+        ["--engine", "unknown"],
+        ["--workers", "x"],
+        ["--heatmap", "tests"],
+        ["--frames", "2", "image.png"],
+        ["--frames", "2", "--camera-to", "0", "0", "0", "--samples", "4", "a.png"],
+        ["--cache-dir", "cache", "--stats", "a.png"],
+        ["--samples", "2"],
+        ["--samples", "0"],
+    ],
+)
+def test_main_bad_arguments(argv):
+    with pytest.raises(SystemExit) as exc_info:
+        main.main(argv)
+    assert exc_info.value.code != 0
+
+
+def test_main_animation(tmp_path):
+    path = tmp_path / "fly.png"
+    argv = ["--width", "20", "--height", "10", "--workers", "1", "--engine", "fast"]
+    argv += ["--frames", "3", "--camera-to", "152", "101", "-298", str(path)]
+    assert main.main(argv) == 0
+    for index in range(3):
+        frame = np.array(PIL.Image.open(tmp_path / f"fly_000{index}.png"))
+        assert frame.shape == (10, 20, 3)
+
+
+def test_main_cache(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    argv = ["--width", "20", "--height", "10", "--workers", "1", "--engine", "batch"]
+    argv += ["--cache-dir", str(cache_dir)]
+    assert main.main(argv + [str(tmp_path / "first.png")]) == 0
+    assert len(list(cache_dir.iterdir())) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached scene shouldn't be rendered")
+
+    monkeypatch.setattr(scene.Scene, "render", fail)
+    assert main.main(argv + [str(tmp_path / "second.png")]) == 0
+    first = np.array(PIL.Image.open(tmp_path / "first.png"))
+    assert (np.array(PIL.Image.open(tmp_path / "second.png")) == first).all()
+
+
+def test_main_with_scene_file(tmp_path):
+    # compiled scenes aren't cached
+    scene_path = tmp_path / "scene.npz"
+    scenefile.save(main.make_scene(), scene_path)
+    path = tmp_path / "image.png"
+    argv = ["--scene", str(scene_path), "--width", "8", "--workers", "1", str(path)]
+    assert main.main(argv) == 0
+    assert np.array(PIL.Image.open(path)).shape == (200, 8, 3)
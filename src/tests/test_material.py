@@ -41,3 +41,48 @@ def test_checkered_material(point, expected):
         projection=Checkered.project_to_local_xy,
     )
     assert material.get_color(point) == expected
+
+
+def test_checkered_material_get_colors():
+    material = Checkered(
+        square_width=20,
+        lighter=Palette.WHITE,
+        darker=Palette.BLACK,
+        projection=Checkered.project_to_local_xy,
+    )
+    points = np.array([[10, 10, 90], [10, -10, 90], [30, 10, 90]])
+    colors = material.get_colors(points)
+    assert [colors[i] for i in range(len(colors))] == [
+        Palette.WHITE,
+        Palette.BLACK,
+        Palette.BLACK,
+    ]
+
+
+@pytest.mark.parametrize(
+    "projection",
+    [
+        Checkered.project_to_local_xy,
+        Checkered.project_to_local_xz,
+        Checkered.project_to_local_yz,
+        # unknown projections are called
+        lambda point: geometry.make_point(point[2], point[0], 0),
+    ],
+)
+def test_checkered_get_colors_matches_get_color(projection):
+    material = Checkered(
+        square_width=20,
+        lighter=Palette.WHITE,
+        darker=Palette.BLACK,
+        projection=projection,
+    )
+    points = np.random.default_rng(0).uniform(-100, 100, size=(200, 3))
+    colors = material.get_colors(points)
+    assert [colors[i] for i in range(len(points))] == [
+        material.get_color(point) for point in points
+    ]
+
+
+def test_monochrome_get_colors():
+    colors = Monochrome(color=Palette.GRAY).get_colors(np.zeros((3, 3)))
+    assert [colors[i] for i in range(len(colors))] == [Palette.GRAY] * 3
@@ -0,0 +1,101 @@
+import pytest
+
+from raytracer import performance
+from raytracer.performance import Tile
+
+
+@pytest.mark.parametrize(
+    "width, height, tile_size, expected",
+    [
+        (4, 2, 2, [Tile(0, 0, 2, 2), Tile(2, 0, 2, 2)]),
+        (
+            3,
+            3,
+            2,
+            [Tile(0, 0, 2, 2), Tile(2, 0, 1, 2), Tile(0, 2, 2, 1), Tile(2, 2, 1, 1)],
+        ),
+        (2, 2, 10, [Tile(0, 0, 2, 2)]),
+    ],
+)
+def test_make_tiles(width, height, tile_size, expected):
+    assert performance.make_tiles(width, height, tile_size) == expected
+
+
+@pytest.mark.parametrize(
+    "width, height, num_processes, expected",
+    [(300, 200, 6, 25), (10, 10, 6, 8), (4000, 4000, 2, 64)],
+)
+def test_get_tile_size(width, height, num_processes, expected):
+    assert performance.get_tile_size(width, height, num_processes) == expected
+
+
+def test_render_pool():
+    with performance.RenderPool(num_processes=2) as pool:
+        assert sorted(pool.imap_unordered(_add, 10, [1, 2, 3])) == [11, 12, 13]
+        assert sorted(pool.imap_unordered(_add, 20, [1])) == [21]
+
+
+def test_render_pool_broadcasts_object_once():
+    obj = ["scene"]
+    with performance.RenderPool(num_processes=1) as pool:
+        first = set(pool.imap_unordered(_get_id, obj, range(5)))
+        second = set(pool.imap_unordered(_get_id, obj, range(5)))
+    assert len(first) == 1
+    assert first == second
+
+
+def _add(x, y):
+    return x + y
+
+
+def _get_id(obj, _):
+    return id(obj)
+
+
+def test_render_pool_profile():
+    with performance.RenderPool(num_processes=1, profile=True) as pool:
+        assert pool.get_profile() is None
+        assert sorted(pool.imap_unordered(_add, 10, [1, 2])) == [11, 12]
+        functions = {name for _, _, name in pool.get_profile().stats}
+    assert "_add" in functions
+
+
+def test_counting():
+    def count(n):
+        performance.active_stats.primary_rays += n
+        return n
+
+    assert performance.active_stats is None
+    result, stats = performance.counting(count)(3)
+    assert (result, stats.primary_rays) == (3, 3)
+    assert performance.active_stats is None
+
+
+def test_stats_merge():
+    a = performance.Stats(primary_rays=1, max_depth=2)
+    a.count_intersection_tests(Tile(0, 0, 1, 1), 2)
+    b = performance.Stats(primary_rays=2, shadow_rays=3, max_depth=1)
+    b.count_intersection_tests(Tile(0, 0, 1, 1), 5)
+    a.merge(b)
+    assert a.to_dict() == {
+        "primary_rays": 3,
+        "reflection_rays": 0,
+        "shadow_rays": 3,
+        "shadow_map_lookups": 0,
+        "intersection_tests": {"Tile": 7},
+        "max_depth": 2,
+    }
+
+
+def test_nested_counting():
+    def count(n):
+        performance.active_stats.primary_rays += n
+        return n
+
+    def count_twice(n):
+        _, inner = performance.counting(count)(n)
+        count(n)
+        return inner.primary_rays
+
+    result, stats = performance.counting(count_twice)(2)
+    assert (result, stats.primary_rays) == (2, 4)
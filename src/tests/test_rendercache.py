@@ -0,0 +1,104 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+from raytracer import geometry
+from raytracer import main
+from raytracer import material
+from raytracer import rendercache
+from raytracer import scene
+from raytracer import scenefile
+from raytracer.color import Palette
+
+
+def test_render(tmp_path, monkeypatch):
+    s = _make_scene()
+    cache = rendercache.RenderCache(tmp_path)
+    expected = s.render(scene.Engine.BATCH).to_array()
+    assert (cache.render(s, scene.Engine.BATCH).to_array() == expected).all()
+    monkeypatch.setattr(scene.Scene, "render", _fail)
+    # equal scene that is a different object
+    copy = scenefile.from_dict(scenefile.to_dict(s))
+    image = cache.render(copy, scene.Engine.BATCH)
+    assert (image.to_array() == expected).all()
+    # cached pixels are not shared with the caller
+    image.to_array()[:] = 0
+    other = rendercache.RenderCache(tmp_path)
+    assert (other.render(s, scene.Engine.BATCH).to_array() == expected).all()
+    assert (cache.stats.misses, cache.stats.memory_hits) == (1, 1)
+    assert (other.stats.misses, other.stats.disk_hits) == (0, 1)
+    assert cache.stats.hit_rate == other.stats.hit_rate * 0.5 == 0.5
+
+
+@pytest.mark.parametrize(
+    "changes, engine, samples",
+    [
+        ({"width": 12}, scene.Engine.BATCH, 1),
+        ({"camera": geometry.make_point(6, 5, -11)}, scene.Engine.BATCH, 1),
+        ({"lights": []}, scene.Engine.BATCH, 1),
+        ({"max_depth": 2}, scene.Engine.BATCH, 1),
+        ({"shadows": scene.Shadows.MAP}, scene.Engine.BATCH, 1),
+        ({}, scene.Engine.SCALAR, 1),
+        ({}, scene.Engine.BATCH, 4),
+    ],
+)
+def test_get_key(changes, engine, samples):
+    s = _make_scene()
+    key = rendercache.get_key(s, scene.Engine.BATCH, 1)
+    changed = dataclasses.replace(s, **changes)
+    assert rendercache.get_key(changed, engine, samples) != key
+
+
+def test_get_key_of_changed_body():
+    s = _make_scene()
+    key = rendercache.get_key(s, scene.Engine.BATCH, 1)
+    bodies = list(s.bodies)
+    bodies[0] = dataclasses.replace(bodies[0], material=material.Mirror())
+    changed = dataclasses.replace(s, bodies=bodies)
+    assert rendercache.get_key(changed, scene.Engine.BATCH, 1) != key
+
+
+def test_eviction(tmp_path):
+    scenes = [_make_scene(width) for width in (10, 11, 12)]
+    # every image fits, but not two of them
+    cache = rendercache.RenderCache(tmp_path, max_memory_bytes=500, max_disk_bytes=700)
+    for s in scenes:
+        cache.render(s, scene.Engine.BATCH)
+    assert cache.stats.memory_evictions == 2
+    assert cache.stats.disk_evictions == 2
+    [path] = tmp_path.iterdir()
+    key = rendercache.get_key(scenes[-1], scene.Engine.BATCH, 1)
+    assert path.name == f"{key}.npy"
+    cache.render(scenes[-1], scene.Engine.BATCH)
+    cache.render(scenes[0], scene.Engine.BATCH)
+    assert (cache.stats.memory_hits, cache.stats.misses) == (1, 4)
+
+
+def test_uncacheable(tmp_path):
+    s = _make_scene()
+    body = dataclasses.replace(s.bodies[0], material=_CustomMaterial(Palette.WHITE))
+    s = dataclasses.replace(s, bodies=[body, *s.bodies[1:]])
+    cache = rendercache.RenderCache(tmp_path)
+    assert rendercache.get_key(s, scene.Engine.BATCH, 1) is None
+    cache.render(s, scene.Engine.BATCH)
+    assert cache.stats.uncacheable == 1
+    assert not list(tmp_path.iterdir())
+
+
+@dataclasses.dataclass(frozen=True)
+class _CustomMaterial(material.Monochrome):
+    pass
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("cached scene shouldn't be rendered")
+
+
+def _make_scene(width=10):
+    return dataclasses.replace(
+        main.make_scene(),
+        camera=geometry.make_point(5, 5, -10),
+        width=width,
+        height=10,
+    )
@@ -1,14 +1,24 @@
+import dataclasses
 import filecmp
+import math
 import os.path
 
+import numpy as np
+import PIL.Image
 import pytest
 
+from raytracer import animation
+from raytracer import geometry
+from raytracer import heatmap
 from raytracer import main
-
+from raytracer import material
+from raytracer import performance
+from raytracer import scene
+from raytracer.color import Palette
 
 @pytest.mark.skip(reason="slow")
 def test_scene():
-    main.render()._image.save(_full_path("test.png"))
+    PIL.Image.fromarray(main.render().to_array()).save(_full_path("test.png"))
     assert filecmp.cmp(
         _full_path("test.png"), _full_path("raytracer.png"), shallow=False
     )
@@ -17,3 +27,297 @@ def test_scene():
 
 def _full_path(filename):
     return os.path.join(os.path.dirname(__file__), filename)
+
+
+@pytest.mark.parametrize(
+    "engine", [scene.Engine.BATCH, scene.Engine.FAST, scene.Engine.WAVEFRONT]
+)
+def test_engine(engine):
+    s = _make_small_scene()
+    expected = s.render(engine=scene.Engine.SCALAR)
+    actual = s.render(engine=engine)
+    assert _same_images(actual, expected, s.width, s.height)
+
+
+def test_wavefront_engine_impossible_reflections():
+    # the central pixel looks along the normal of the mirror, so its ray can't
+    # be reflected, reflections of other rays bounce between two mirrors
+    mirror = material.Mirror()
+    s = scene.Scene(
+        bodies=[
+            scene.Body(geometry.make_plane(0, 0, 1, -100), mirror),
+            scene.Body(geometry.make_plane(0, 1, 0, -20), mirror),
+            scene.Body(
+                geometry.Sphere(geometry.make_point(5, -5, 50), 8),
+                material.Monochrome(Palette.WHITE),
+            ),
+        ],
+        camera=geometry.make_point(5, 5, -10),
+        lights=[geometry.make_point(5, -50, 0)],
+        width=11,
+        height=11,
+    )
+    expected = s.render(engine=scene.Engine.SCALAR, num_processes=1)
+    actual = s.render(engine=scene.Engine.WAVEFRONT, num_processes=1)
+    assert _same_images(actual, expected, s.width, s.height)
+    assert actual.get_pixel(5, 5) == s._sky_color
+
+
+@pytest.mark.parametrize("shadows", list(scene.Shadows))
+def test_fast_engine_shadows(shadows):
+    s = dataclasses.replace(_make_small_scene(), shadows=shadows)
+    expected = s.render(engine=scene.Engine.SCALAR, num_processes=1)
+    actual = s.render(engine=scene.Engine.FAST, num_processes=1)
+    assert _same_images(actual, expected, s.width, s.height)
+
+
+def test_render_antialiased():
+    s = _make_small_scene()
+    expected = s.render(engine=scene.Engine.BATCH).to_array()
+    actual = s.render(engine=scene.Engine.BATCH, samples=4).to_array()
+    different = (actual != expected).any(axis=2)
+    assert different.any()
+    assert not different.all()
+
+
+@pytest.mark.parametrize(
+    "engine", [scene.Engine.BATCH, scene.Engine.FAST, scene.Engine.WAVEFRONT]
+)
+def test_render_antialiased_engines(engine):
+    s = _make_small_scene()
+    expected = s.render(engine=scene.Engine.SCALAR, samples=4, num_processes=1)
+    actual = s.render(engine=engine, samples=4, num_processes=1)
+    assert _same_images(actual, expected, s.width, s.height)
+
+
+def test_antialiased_tile_traces_primary_rays_once(monkeypatch):
+    s = _make_small_scene()
+    calls = []
+    get_closest_hits = scene.Scene._get_closest_hits
+
+    def counting_get_closest_hits(self, points, *args):
+        calls.append(len(points))
+        return get_closest_hits(self, points, *args)
+
+    monkeypatch.setattr(scene.Scene, "_get_closest_hits", counting_get_closest_hits)
+    tile = performance.Tile(0, 0, s.width, s.height)
+    s._get_antialiased_tile_colors(tile, scene.Engine.BATCH, 4)
+    # primary rays and subpixel rays of the edges
+    assert len(calls) == 2
+    assert calls[0] == s.width * s.height
+
+
+def test_render_progressive():
+    s = _make_small_scene()
+    expected = s.render(engine=scene.Engine.BATCH)
+    images = list(s.render_progressive(deadline=math.inf))
+    assert len(images) == 4
+    assert _same_images(images[-1], expected, s.width, s.height)
+    coarse = images[0]
+    assert coarse.get_pixel(8, 16) == expected.get_pixel(8, 16)
+    assert coarse.get_pixel(9, 17) == expected.get_pixel(8, 16)
+
+
+def test_render_progressive_with_deadline():
+    images = list(_make_small_scene().render_progressive(deadline=0))
+    assert len(images) == 1
+
+
+def test_max_depth():
+    # with a single ray per pixel mirrors show the sky
+    s = dataclasses.replace(_make_small_scene(), max_depth=1)
+    scalar = s.render(engine=scene.Engine.SCALAR, num_processes=1)
+    batch = s.render(engine=scene.Engine.BATCH, num_processes=1)
+    assert _same_images(scalar, batch, s.width, s.height)
+    mirror = s._get_color(geometry.make_point(39, 15, 0))
+    assert mirror == s._sky_color
+
+
+def test_render_stats():
+    s = _make_small_scene()
+    scalar = performance.Stats()
+    batch = performance.Stats()
+    fast = performance.Stats()
+    wavefront = performance.Stats()
+    s.render(engine=scene.Engine.SCALAR, num_processes=1, stats=scalar)
+    s.render(engine=scene.Engine.BATCH, num_processes=2, stats=batch)
+    s.render(engine=scene.Engine.FAST, num_processes=1, stats=fast)
+    s.render(engine=scene.Engine.WAVEFRONT, num_processes=1, stats=wavefront)
+    assert fast == scalar
+    assert wavefront.reflection_rays == scalar.reflection_rays
+    assert wavefront.shadow_rays == scalar.shadow_rays
+    assert wavefront.max_depth == scalar.max_depth
+    assert scalar.primary_rays == batch.primary_rays == s.width * s.height
+    assert scalar.reflection_rays == batch.reflection_rays > 0
+    assert scalar.shadow_rays == batch.shadow_rays > 0
+    assert scalar.max_depth == batch.max_depth == 2
+    assert set(scalar.intersection_tests) == {"Plane", "Sphere"}
+
+
+@pytest.mark.parametrize("engine", list(scene.Engine))
+@pytest.mark.parametrize("cost", list(heatmap.Cost))
+def test_render_heatmap(engine, cost):
+    s = _make_small_scene()
+    h = heatmap.Heatmap(cost)
+    stats = performance.Stats()
+    image = s.render(engine=engine, num_processes=2, heatmap=h, stats=stats)
+    expected = s.render(engine=engine, num_processes=1)
+    assert _same_images(image, expected, s.width, s.height)
+    assert h.costs.shape == (s.height, s.width)
+    assert (h.costs > 0).all()
+    if cost is heatmap.Cost.TESTS:
+        assert h.costs.sum() == sum(stats.intersection_tests.values())
+
+
+def test_render_heatmap_with_antialiasing():
+    with pytest.raises(ValueError):
+        _make_small_scene().render(samples=4, heatmap=heatmap.Heatmap())
+
+
+def test_render_non_square_samples():
+    with pytest.raises(ValueError):
+        _make_small_scene().render(samples=2)
+
+
+@pytest.mark.parametrize("engine", [scene.Engine.SCALAR, scene.Engine.FAST])
+def test_render_incremental(engine):
+    s = _make_small_scene()
+    first = s.render_incremental(engine=engine, num_processes=1)
+    assert first.num_traced_pixels == s.width * s.height
+    moved = _replace_body(
+        s, 4, shape=geometry.Sphere(geometry.make_point(110, 185, 380), 15)
+    )
+    second = moved.render_incremental(first, engine=engine, num_processes=1)
+    expected = moved.render(engine=engine, num_processes=1)
+    assert _same_images(second.image, expected, s.width, s.height)
+    assert 0 < second.num_traced_pixels < s.width * s.height / 4
+    # moved back
+    third = s.render_incremental(second, engine=engine, num_processes=1)
+    assert _same_images(third.image, first.image, s.width, s.height)
+
+
+def test_render_incremental_material():
+    s = _make_small_scene()
+    first = s.render_incremental(num_processes=1)
+    recolored = _replace_body(s, 4, material=material.Monochrome(Palette.WHITE))
+    second = recolored.render_incremental(first, num_processes=1)
+    expected = recolored.render(engine=scene.Engine.FAST, num_processes=1)
+    assert _same_images(second.image, expected, s.width, s.height)
+    assert 0 < second.num_traced_pixels < s.width * s.height / 4
+
+
+@pytest.mark.parametrize(
+    "changes, num_traced_pixels",
+    [
+        ({}, 0),
+        ({"camera": geometry.make_point(20, 15, -40)}, 40 * 30),
+        ({"shadows": scene.Shadows.MAP}, 40 * 30),
+    ],
+)
+def test_render_incremental_view(changes, num_traced_pixels):
+    s = _make_small_scene()
+    first = s.render_incremental(num_processes=1)
+    changed = dataclasses.replace(s, **changes)
+    second = changed.render_incremental(first, num_processes=1)
+    assert second.num_traced_pixels == num_traced_pixels
+    expected = changed.render(engine=scene.Engine.FAST, num_processes=1)
+    assert _same_images(second.image, expected, s.width, s.height)
+
+
+def test_render_incremental_with_shadow_maps():
+    # shadow maps depend on all bodies, so every edit traces all pixels
+    s = dataclasses.replace(_make_small_scene(), shadows=scene.Shadows.MAP)
+    first = s.render_incremental(num_processes=1)
+    recolored = _replace_body(s, 4, material=material.Monochrome(Palette.WHITE))
+    second = recolored.render_incremental(first, num_processes=1)
+    assert second.num_traced_pixels == s.width * s.height
+
+
+def test_render_incremental_batch():
+    with pytest.raises(ValueError):
+        _make_small_scene().render_incremental(engine=scene.Engine.BATCH)
+
+
+def test_render_animation():
+    s = _make_small_scene()
+    cameras = animation.linear_path(s.camera, s.camera + (2, 1, 2), 3)
+    frames = list(s.render_animation(cameras, num_processes=1))
+    assert [frame.index for frame in frames] == [0, 1, 2]
+    assert frames[0].num_traced_pixels == s.width * s.height
+    for frame in frames:
+        expected = dataclasses.replace(s, camera=frame.camera).render(
+            engine=scene.Engine.FAST, num_processes=1
+        )
+        diff = np.abs(frame.image.to_array() - expected.to_array().astype(int))
+        assert diff.max(axis=2).mean() < 0.5
+    assert frames[-1].num_traced_pixels < s.width * s.height
+
+
+def test_render_animation_validated():
+    # every reprojected pixel is validated, so frames are the same as renders
+    s = _make_small_scene()
+    cameras = animation.linear_path(s.camera, s.camera + (2, 1, 2), 2)
+    frames = list(s.render_animation(cameras, num_processes=1, validation_rate=1))
+    expected = dataclasses.replace(s, camera=cameras[-1]).render(
+        engine=scene.Engine.FAST, num_processes=1
+    )
+    assert _same_images(frames[-1].image, expected, s.width, s.height)
+
+
+@pytest.mark.parametrize("shadows", list(scene.Shadows))
+@pytest.mark.parametrize(
+    "lights",
+    [
+        [],
+        [geometry.make_point(20, -100, 0)],
+        [geometry.make_point(300, -500, 200), geometry.make_point(-100, -300, 0)],
+    ],
+)
+def test_relight(lights, shadows):
+    s = _make_small_scene()
+    gbuffer = s.render_gbuffer(num_processes=1)
+    # mirrors show bodies behind them
+    mirror_lanes = np.isin(np.arange(len(s.bodies)), [1, 5])[gbuffer.body_indices]
+    assert not mirror_lanes.any()
+    relit = dataclasses.replace(s, lights=lights, shadows=shadows)
+    expected = relit.render(engine=scene.Engine.BATCH, num_processes=1)
+    assert _same_images(relit.relight(gbuffer), expected, s.width, s.height)
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"camera": geometry.make_point(20, 15, -40)},
+        {"max_depth": 2},
+        {"width": 20},
+    ],
+)
+def test_relight_other_view(changes):
+    s = _make_small_scene()
+    gbuffer = s.render_gbuffer(num_processes=1)
+    with pytest.raises(ValueError):
+        dataclasses.replace(s, **changes).relight(gbuffer)
+    moved = _replace_body(s, 4, shape=geometry.Sphere(geometry.make_point(0, 0, 0), 1))
+    with pytest.raises(ValueError):
+        moved.relight(gbuffer)
+
+
+def _replace_body(s: scene.Scene, index: int, **changes) -> scene.Scene:
+    bodies = list(s.bodies)
+    bodies[index] = dataclasses.replace(bodies[index], **changes)
+    return dataclasses.replace(s, bodies=bodies)
+
+
+def _make_small_scene() -> scene.Scene:
+    # wide angle, so every body of the main scene is visible
+    return dataclasses.replace(
+        main.make_scene(), camera=geometry.make_point(20, 15, -30), width=40, height=30
+    )
+
+
+def _same_images(a, b, width, height) -> bool:
+    return all(
+        a.get_pixel(x, y) == b.get_pixel(x, y)
+        for x in range(width)
+        for y in range(height)
+    )
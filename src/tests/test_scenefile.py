@@ -0,0 +1,131 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+from raytracer import geometry
+from raytracer import main
+from raytracer import scene
+from raytracer import scenefile
+
+
+@pytest.mark.parametrize("filename", ["scene.json", "scene.npz"])
+def test_save_and_load(tmp_path, filename):
+    s = _make_small_scene()
+    path = tmp_path / filename
+    scenefile.save(s, path)
+    loaded = scenefile.load(path, cache_dir=None)
+    assert (loaded.width, loaded.height) == (s.width, s.height)
+    assert [type(body.material) for body in loaded] == [
+        type(body.material) for body in s
+    ]
+    expected = s.render(engine=scene.Engine.BATCH, num_processes=1)
+    actual = loaded.render(engine=scene.Engine.BATCH, num_processes=1)
+    assert np.array_equal(actual.to_array(), expected.to_array())
+
+
+def test_load_shares_materials(tmp_path):
+    # the extra sphere has the floor material
+    path = tmp_path / "scene.json"
+    scenefile.save(_make_small_scene(), path)
+    loaded = scenefile.load(path, cache_dir=None)
+    assert loaded.bodies[3].material is loaded.bodies[-1].material
+
+
+def test_load_uses_cache(tmp_path, monkeypatch):
+    path = tmp_path / "scene.json"
+    cache_dir = tmp_path / "cache"
+    scenefile.save(_make_small_scene(), path)
+    first = scenefile.load(path, cache_dir=cache_dir)
+    [cached] = cache_dir.iterdir()
+    assert cached.name == scenefile.get_hash(path.read_bytes()) + ".npz"
+
+    def fail(data):
+        raise AssertionError("cached scene shouldn't be parsed")
+
+    monkeypatch.setattr(scenefile, "_parse", fail)
+    second = scenefile.load(path, cache_dir=cache_dir)
+    assert len(second.bodies) == len(first.bodies)
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"width": "abc"},
+        {"width": -5},
+        {"height": 1.5},
+        {"height": None},
+        {"width": True},
+        {"camera": [1, 2]},
+        {"camera": [1, 2, "3"]},
+        {"lights": [[0, 0, 400], 5]},
+        {"materials": []},
+        {"max_depth": 0},
+        {"max_depth": "5"},
+    ],
+)
+def test_from_dict_invalid_values(changes):
+    data = {**scenefile.to_dict(_make_small_scene()), **changes}
+    with pytest.raises(scenefile.InvalidSceneError):
+        scenefile.from_dict(data)
+
+
+@pytest.mark.parametrize(
+    "shape",
+    [
+        {"type": "plane", "coeffs": [1, 0], "d": 0},
+        {"type": "plane", "coeffs": None, "d": 0},
+        {"type": "plane", "coeffs": [1, 0, 0], "d": "abc"},
+        {"type": "sphere", "center": [0, 0, [0]], "radius": 1},
+        {"type": "sphere", "center": [0, 0, 0], "radius": "abc"},
+        {"type": "sphere", "center": [0, 0, 0], "radius": -1},
+        {"type": "sphere", "center": [0, 0, 0], "radius": float("nan")},
+    ],
+)
+def test_from_dict_invalid_shape(shape):
+    data = scenefile.to_dict(_make_small_scene())
+    data["bodies"][0]["shape"] = shape
+    with pytest.raises(scenefile.InvalidSceneError):
+        scenefile.from_dict(data)
+
+
+@pytest.mark.parametrize("square_width", [0, -10, "10", None])
+def test_from_dict_invalid_material(square_width):
+    data = scenefile.to_dict(_make_small_scene())
+    for description in data["materials"].values():
+        if description["type"] == "checkered":
+            description["square_width"] = square_width
+    with pytest.raises(scenefile.InvalidSceneError):
+        scenefile.from_dict(data)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        "{",
+        "{}",
+        '{"materials": {"m": {"type": "unknown"}}, "bodies": []}',
+        '{"materials": {}, "bodies": [{"shape": {"type": "plane"}, "material": "m"}]}',
+    ],
+)
+def test_load_invalid_scene(tmp_path, data):
+    path = tmp_path / "scene.json"
+    path.write_text(data)
+    with pytest.raises(scenefile.InvalidSceneError):
+        scenefile.load(path, cache_dir=None)
+
+
+def _make_small_scene() -> scene.Scene:
+    # main scene with an extra sphere, so every body type and material is saved
+    s = main.make_scene()
+    sphere = scene.Body(
+        geometry.Sphere(geometry.make_point(50, 20, 100), 10.5), s.bodies[3].material
+    )
+    return dataclasses.replace(
+        s,
+        bodies=s.bodies + [sphere],
+        camera=geometry.make_point(20, 15, -30),
+        width=40,
+        height=30,
+        max_depth=3,
+    )
@@ -0,0 +1,252 @@
+import asyncio
+import base64
+import dataclasses
+import gc
+import io
+import json
+
+import numpy as np
+import PIL.Image
+import pytest
+
+from raytracer import geometry
+from raytracer import loadgen
+from raytracer import main
+from raytracer import scene
+from raytracer import scenefile
+from raytracer import server
+
+
+def test_render():
+    s = _make_scene(20, 15)
+
+    async def run(render_server, port):
+        return await _post(port, s)
+
+    status, headers, body = _run_server(run)
+    assert status == 200
+    assert headers["content-type"] == "image/png"
+    expected = s.render(engine=scene.Engine.BATCH, num_processes=1).to_array()
+    assert (np.array(PIL.Image.open(io.BytesIO(body))) == expected).all()
+
+
+def test_connection_is_closed():
+    # the first render starts workers, they shouldn't keep the connection open
+    body = json.dumps(scenefile.to_dict(_make_scene(4, 4))).encode()
+
+    async def run(render_server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        head = f"POST /render HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n"
+        writer.write(head.encode("latin-1") + body)
+        try:
+            return await asyncio.wait_for(reader.read(), timeout=10)
+        finally:
+            writer.close()
+
+    response = _run_server(run)
+    assert response.startswith(b"HTTP/1.1 200")
+    assert response.endswith(b"IEND\xaeB`\x82")
+
+
+def test_render_stream():
+    s = _make_scene(64, 64)
+
+    async def run(render_server, port):
+        return await _post(port, s, "stream=1&engine=fast")
+
+    status, _, body = _run_server(run)
+    assert status == 200
+    events = [json.loads(line) for line in body.splitlines()]
+    assert [e["event"] for e in events[:2]] == ["queued", "started"]
+    assert events[0]["position"] == 0
+    assert events[-1]["event"] == "done"
+    progress = [e for e in events if e["event"] == "progress"]
+    # progress that arrives after the render is done is dropped
+    assert [e["tiles"] for e in progress] == list(range(1, len(progress) + 1))
+    assert all(e["of"] == 4 for e in progress)
+    png = base64.b64decode(events[-1]["image"])
+    assert np.array(PIL.Image.open(io.BytesIO(png))).shape == (64, 64, 3)
+
+
+def test_render_stream_failed(monkeypatch, caplog):
+    monkeypatch.setattr(server, "_render_job", _fail_render)
+
+    async def run(render_server, port):
+        response = await _post(port, _make_scene(4, 4), "stream=1")
+        # the job and its result are dropped, asyncio logs unretrieved exceptions
+        gc.collect()
+        return response
+
+    status, _, body = _run_server(run)
+    assert status == 200
+    events = [json.loads(line) for line in body.splitlines()]
+    assert events[-1]["event"] == "failed"
+    assert "never retrieved" not in caplog.text
+
+
+def test_admission_and_priorities():
+    # single worker is busy with the first render, one more render can wait
+    slow = _make_scene(120, 80)
+    fast = _make_scene(4, 4)
+
+    async def run(render_server, port):
+        first = asyncio.create_task(_post(port, slow))
+        await _wait_for(render_server, running=1, queued=0)
+        low = asyncio.create_task(_post(port, fast, "priority=0"))
+        await _wait_for(render_server, running=1, queued=1)
+        rejected = await _post(port, fast)
+        render_server.max_queued = 2
+        high = asyncio.create_task(_post(port, fast, "priority=5"))
+        await _wait_for(render_server, running=1, queued=2)
+        order = []
+        for name, task in [("low", low), ("high", high)]:
+            task.add_done_callback(lambda _, name=name: order.append(name))
+        results = await asyncio.gather(first, low, high)
+        return rejected, results, order
+
+    rejected, results, order = _run_server(run, num_workers=1, max_queued=1)
+    status, headers, _ = rejected
+    assert status == 503
+    assert headers["retry-after"] == "1"
+    assert [status for status, _, _ in results] == [200, 200, 200]
+    assert order == ["high", "low"]
+
+
+@pytest.mark.parametrize(
+    "method, path, body, expected",
+    [
+        ("POST", "/render", b"{", 400),
+        ("POST", "/render?engine=unknown", b"{}", 400),
+        ("GET", "/unknown", b"", 404),
+    ],
+)
+def test_bad_requests(method, path, body, expected):
+    async def run(render_server, port):
+        return await loadgen.request("127.0.0.1", port, method, path, body)
+
+    status, _, _ = _run_server(run)
+    assert status == expected
+
+
+@pytest.mark.parametrize("content_length", ["xyz", "-1", "1_0"])
+def test_bad_content_length(content_length):
+    async def run(render_server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        head = f"POST /render HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n"
+        writer.write(head.encode("latin-1"))
+        try:
+            return await asyncio.wait_for(reader.read(), timeout=10)
+        finally:
+            writer.close()
+
+    assert _run_server(run).startswith(b"HTTP/1.1 400")
+
+
+@pytest.mark.parametrize(
+    "head",
+    [
+        "GET /status\r\n\r\n",
+        "GET / status HTTP/1.1\r\n\r\n",
+        f"GET /{'a' * 70000} HTTP/1.1\r\n\r\n",
+        f"GET /status HTTP/1.1\r\nX-Long: {'a' * 70000}\r\n\r\n",
+    ],
+)
+def test_bad_request_head(head):
+    async def run(render_server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(head.encode("latin-1"))
+        try:
+            return await asyncio.wait_for(reader.read(), timeout=10)
+        finally:
+            writer.close()
+
+    assert _run_server(run).startswith(b"HTTP/1.1 400")
+
+
+@pytest.mark.parametrize(
+    "changes", [{"width": "abc"}, {"width": -5}, {"height": 0}, {"height": None}]
+)
+def test_bad_scene_size(changes):
+    body = json.dumps({**scenefile.to_dict(_make_scene(4, 4)), **changes}).encode()
+
+    async def run(render_server, port):
+        return await loadgen.request("127.0.0.1", port, "POST", "/render", body)
+
+    status, _, _ = _run_server(run)
+    assert status == 400
+
+
+def test_submit_bad_size():
+    async def run():
+        async with server.RenderServer(num_workers=1) as render_server:
+            with pytest.raises(server.Rejected) as exc_info:
+                render_server.submit(dataclasses.replace(_make_scene(4, 4), width=-5))
+            return exc_info.value.status, render_server.stats.rejected
+
+    assert asyncio.run(run()) == (400, 1)
+
+
+def test_exit_does_not_block_loop():
+    async def tick(ticks):
+        while True:
+            await asyncio.sleep(0.01)
+            ticks.append(None)
+
+    async def run():
+        ticks = []
+        async with server.RenderServer(num_workers=1) as render_server:
+            job = render_server.submit(_make_scene(120, 80))
+            while (await job.events.get())["event"] != "started":
+                pass
+            ticker = asyncio.create_task(tick(ticks))
+        # exit waits for the running render
+        await job.result
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(run())
+
+
+def test_too_big():
+    async def run(render_server, port):
+        return await _post(port, _make_scene(20, 20))
+
+    status, _, _ = _run_server(run, max_pixels=100)
+    assert status == 413
+
+
+def _run_server(fn, **kwargs):
+    async def run():
+        async with server.RenderServer(**kwargs) as render_server:
+            http_server = await render_server.serve()
+            port = http_server.sockets[0].getsockname()[1]
+            async with http_server:
+                return await fn(render_server, port)
+
+    return asyncio.run(run())
+
+
+async def _post(port, s, query=""):
+    body = json.dumps(scenefile.to_dict(s)).encode()
+    return await loadgen.request("127.0.0.1", port, "POST", f"/render?{query}", body)
+
+
+async def _wait_for(render_server, running, queued):
+    while (render_server.stats.running, render_server.stats.queued) != (
+        running,
+        queued,
+    ):
+        await asyncio.sleep(0.01)
+
+
+def _fail_render(job_id, s, engine):
+    raise RuntimeError("render failed")
+
+
+def _make_scene(width, height):
+    return dataclasses.replace(
+        main.make_scene(),
+        camera=geometry.make_point(width / 2, height / 2, -width),
+        width=width,
+        height=height,
+    )
@@ -0,0 +1,63 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+from raytracer import geometry
+from raytracer import main
+from raytracer import scene
+from raytracer import shadowmap
+from raytracer.color import Palette
+from raytracer.material import Monochrome
+
+
+@pytest.mark.parametrize(
+    "point, expected",
+    [
+        # shadow of the sphere on the floor is a circle with radius ~63
+        (geometry.make_point(0, 0, 0), True),
+        (geometry.make_point(30, 0, -30), True),
+        (geometry.make_point(0, 0, 50), True),
+        (geometry.make_point(80, 0, 0), False),
+        (geometry.make_point(-200, 0, 300), False),
+        # point on the sphere that looks away from the light
+        (geometry.make_point(0, 50, 0), True),
+        # point on the sphere that looks at the light
+        (geometry.make_point(0, 150, 0), False),
+    ],
+)
+def test_shadow_map(point, expected):
+    s = _make_floor_and_sphere_scene()
+    light = s.lights[0]
+    shadow_map = shadowmap.build(light, s._get_distances, 128)
+    assert s._in_the_shadow(point, light) == expected
+    assert shadow_map.in_the_shadow(point) == expected
+    assert shadow_map.in_the_shadows(point[np.newaxis]).tolist() == [expected]
+
+
+def test_shadow_map_render():
+    exact_scene = dataclasses.replace(
+        main.make_scene(), camera=geometry.make_point(20, 15, -30), width=40, height=30
+    )
+    map_scene = dataclasses.replace(exact_scene, shadows=scene.Shadows.MAP)
+    exact = exact_scene.render(engine=scene.Engine.BATCH)
+    approximate = map_scene.render(engine=scene.Engine.BATCH)
+    num_different = sum(
+        exact.get_pixel(x, y) != approximate.get_pixel(x, y)
+        for x in range(exact_scene.width)
+        for y in range(exact_scene.height)
+    )
+    assert num_different <= 0.01 * exact_scene.width * exact_scene.height
+
+
+def _make_floor_and_sphere_scene() -> scene.Scene:
+    gray = Monochrome(Palette.GRAY)
+    floor = scene.Body(geometry.make_plane(0, 1, 0, 0), gray)
+    sphere = scene.Body(geometry.Sphere(geometry.make_point(0, 100, 0), 50), gray)
+    return scene.Scene(
+        bodies=[floor, sphere],
+        camera=geometry.make_point(0, 100, -300),
+        lights=[geometry.make_point(0, 500, 0)],
+        width=10,
+        height=10,
+    )